@@ -0,0 +1 @@
+"""Benchmarks and local stand-ins for the providers and file hosts."""
@@ -0,0 +1,120 @@
+"""
+Regenerates the provider fixture pages used by the benchmarks.
+
+The pages mirror the markup the providers parse (FileCrypt's `tr.kwj3` rows and
+ViewCrate's `#x_r` blocks) and carry the usual weight of the real sites: scripts,
+stylesheets, fonts, images and ad iframes. Asset URLs use the `{{ORIGIN}}`
+placeholder, which the stand-in server replaces with its own address.
+
+Run with `python -m benchmarks.fixtures.make_fixtures`.
+"""
+
+import os
+import random
+
+FIXTURES_DIR = os.path.dirname(os.path.abspath(__file__))
+SERIES_TITLE = "The.Long.Drama"
+EPISODES = 24
+HOSTS = (("pixeldrain", "pixeldrain.com", "pd"), ("gofile", "gofile.io", "gf"))
+
+
+def _head(title: str, rng: random.Random) -> str:
+    """Builds a heavy `<head>` with stylesheets, fonts and tracking scripts."""
+    lines = [
+        "<!DOCTYPE html>",
+        '<html lang="en">',
+        "<head>",
+        '<meta charset="utf-8">',
+        f"<title>{title}</title>",
+        '<link rel="stylesheet" href="{{ORIGIN}}/static/css/site.css">',
+        '<link rel="preload" as="font" href="{{ORIGIN}}/static/fonts/inter.woff2" crossorigin>',
+        '<script src="{{ORIGIN}}/static/js/analytics.js" async></script>',
+        '<script src="{{ORIGIN}}/static/js/ads.js" async></script>',
+    ]
+    for i in range(40):
+        blob = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(400))
+        lines.append(f'<script>window.__cfg{i} = "{blob}";</script>')
+    lines.append("</head>")
+    return "\n".join(lines)
+
+
+def _chrome(rng: random.Random) -> str:
+    """Builds navigation, banners and overlay iframes around the content."""
+    lines = ['<nav class="top">']
+    lines.extend(f'<a href="/page/{i}" class="nav-item">Section {i}</a>' for i in range(60))
+    lines.append("</nav>")
+    for i in range(12):
+        lines.append(f'<div class="banner"><img src="{{{{ORIGIN}}}}/static/img/banner{i}.jpg" width="728"></div>')
+    lines.append(
+        '<iframe src="{{ORIGIN}}/static/ads/frame.html" style="z-index: 2147483647; position: fixed"></iframe>'
+    )
+    lines.append(f'<div class="footer">{" ".join(str(rng.random()) for _ in range(300))}</div>')
+    return "\n".join(lines)
+
+
+def make_filecrypt(rng: random.Random) -> str:
+    """Builds a FileCrypt container page."""
+    rows: list[str] = []
+    for episode in range(1, EPISODES + 1):
+        for _, label, prefix in HOSTS:
+            filename = f"{SERIES_TITLE}.S01E{episode:02d}.1080p.WEB-DL.x264.mkv"
+            link_id = f"{prefix}-s01e{episode:02d}"
+            rows.append(
+                '<tr class="kwj3">'
+                f'<td title="{filename}"><span class="name">{filename}</span></td>'
+                f'<td><a class="external_link" href="#" onclick="openLink(this)">{label}</a></td>'
+                f"<td>{rng.randint(800, 1600)} MB</td>"
+                '<td><i class="status online"></i></td>'
+                f'<td><button class="download" data-{rng.choice("qxyz")}v="{link_id}">Download</button></td>'
+                "</tr>"
+            )
+    body = "\n".join(
+        [
+            "<body>",
+            _chrome(rng),
+            '<div class="container"><table class="container-table"><tbody>',
+            *rows,
+            "</tbody></table></div>",
+            "</body></html>",
+        ]
+    )
+    return _head(f"{SERIES_TITLE} - FileCrypt", rng) + "\n" + body + "\n"
+
+
+def make_viewcrate(rng: random.Random) -> str:
+    """Builds a rendered ViewCrate page, including the click-to-redirect script."""
+    blocks: list[str] = []
+    for episode in range(1, EPISODES + 1):
+        links: list[str] = []
+        for host, _, prefix in HOSTS:
+            filename = f"{SERIES_TITLE}.S01E{episode:02d}.1080p.WEB-DL.x264.mkv"
+            links.append(
+                f'<div data-host="{host}" class="flex">'
+                f"<span>{filename}</span>"
+                f'<div role="button" data-z="{prefix}-s01e{episode:02d}" class="btn">Get</div>'
+                "</div>"
+            )
+        blocks.append(
+            f'<div data-code="S01E{episode:02d}" class="episode">'
+            f'<h3>Episode {episode}</h3><div class="bg-gray-800">{"".join(links)}</div>'
+            "</div>"
+        )
+    script = (
+        "<script>document.querySelectorAll('div[role=button][data-z]').forEach("
+        "b => b.addEventListener('click', () => { location.href = '/go/' + b.dataset.z; }));</script>"
+    )
+    body = "\n".join(["<body>", _chrome(rng), '<div id="x_r">', *blocks, "</div>", script, "</body></html>"])
+    return _head(f"{SERIES_TITLE} - ViewCrate", rng) + "\n" + body + "\n"
+
+
+def main() -> None:
+    """Writes both fixture pages next to this script."""
+    for name, builder in (("filecrypt_container.html", make_filecrypt), ("viewcrate_container.html", make_viewcrate)):
+        path = os.path.join(FIXTURES_DIR, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(builder(random.Random(name)))
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+"""
+Benchmark harness for the monitor.
+
+Runs every benchmark against the local stand-ins, prints the results, and optionally
+compares them with the recent runs or a committed baseline so a regression fails the run:
+
+    python -m benchmarks.run                                   # run and print
+    python -m benchmarks.run --baseline benchmarks/baseline.json  # fail on regressions
+    python -m benchmarks.run --record benchmarks/history.jsonl    # append to the history
+    python -m benchmarks.run --history benchmarks/history.jsonl   # compare with the recent runs
+    python -m benchmarks.run --only parse download            # run a subset
+
+Absolute timings differ between machines, so the committed baseline only fits the
+machine it was written on. With `--history`, a result is compared with its median
+over the last runs recorded in the history instead, i.e. on the same machine; the
+baseline file is the fallback for results recorded fewer than `MIN_HISTORY_RUNS` times.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import asdict, dataclass
+from typing import Any, Literal
+
+import yaml
+
+from benchmarks.standins import FIXTURES_DIR, StandInConfig, StandInFile, StandIns
+from src.downloaders import DOWNLOADER_REGISTRY
+from src.downloaders.base import BaseDownloader
+from src.downloaders.gofile import GofileDownloader
+from src.downloaders.pixeldrain import PixeldrainDownloader
+from src.providers import PROVIDER_REGISTRY
+from src.providers.base import BaseProvider
+from src.providers.filecrypt import FileCryptProvider
+from src.providers.viewcrate import ViewCrateProvider
+
+GIB = 1024**3
+MIB = 1024**2
+DEFAULT_MAX_REGRESSION = 0.3
+# Recent runs of the history a result is compared with, and how many it needs
+DEFAULT_HISTORY_WINDOW = 10
+MIN_HISTORY_RUNS = 3
+IMPORT_RUNS = 7
+
+
+@dataclass
+class Result:
+    """A single benchmark measurement."""
+
+    name: str
+    value: float
+    unit: str
+    better: Literal["lower", "higher"] = "lower"
+    # Absolute difference from the baseline that is always treated as noise
+    noise: float = 0.0
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark that cannot run in the current environment."""
+
+
+@contextlib.contextmanager
+def quiet() -> Iterator[None]:
+    """Silences the application's progress output while a benchmark runs."""
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+@contextlib.contextmanager
+def registered(
+    providers: list[type[BaseProvider]] | None = None,
+    downloaders: dict[str, type[BaseDownloader]] | None = None,
+) -> Iterator[None]:
+    """Temporarily puts stand-in aware providers and downloaders into the registries."""
+    saved_downloaders = dict(DOWNLOADER_REGISTRY)
+    for provider_class in providers or []:
+        PROVIDER_REGISTRY.register(provider_class, first=True)
+    DOWNLOADER_REGISTRY.update(downloaders or {})
+    try:
+        yield
+    finally:
+        for provider_class in providers or []:
+            PROVIDER_REGISTRY.unregister(provider_class)
+        DOWNLOADER_REGISTRY.clear()
+        DOWNLOADER_REGISTRY.update(saved_downloaders)
+
+
+def local_pixeldrain(standins: StandIns) -> type[PixeldrainDownloader]:
+    """Returns a pixeldrain downloader talking to the stand-in API."""
+    return type(
+        "LocalPixeldrainDownloader",
+        (PixeldrainDownloader,),
+        {
+            "api_file_url": standins.url("/api/file/{file_id}"),
+            "api_info_url": standins.url("/api/file/{file_id}/info"),
+            "api_list_url": standins.url("/api/list/{list_id}"),
+        },
+    )
+
+
+def local_gofile(standins: StandIns) -> type[GofileDownloader]:
+    """Returns a gofile downloader talking to the stand-in API."""
+    return type("LocalGofileDownloader", (GofileDownloader,), {"api_url": standins.url("")})
+
+
+def local_providers(standins: StandIns) -> list[type[BaseProvider]]:
+    """Returns providers that accept the stand-in's container URLs."""
+
+    def handles(prefix: str) -> dict[str, Any]:
+        return {
+            "domains": ("127.0.0.1",),
+            "can_handle_url": classmethod(lambda cls, url: url.startswith(standins.url(prefix))),
+        }
+
+    return [
+        type("LocalFileCryptProvider", (FileCryptProvider,), handles("/Container/")),
+        type("LocalViewCrateProvider", (ViewCrateProvider,), {**handles("/v/"), "render_wait_ms": 500}),
+    ]
+
+
+# --- Benchmarks ---------------------------------------------------------------------------
+
+
+def bench_parse(standins: StandIns) -> list[Result]:
+    """Measures how long parsing a fixture page takes."""
+    results: list[Result] = []
+    cases: list[tuple[str, str, type[BaseProvider], str]] = [
+        ("filecrypt", "filecrypt_container.html", FileCryptProvider, "/Container/bench.html"),
+        ("viewcrate", "viewcrate_container.html", ViewCrateProvider, "/v/bench"),
+    ]
+    for name, fixture, provider, path in cases:
+        with open(os.path.join(FIXTURES_DIR, fixture), encoding="utf-8") as f:
+            html = f.read().replace("{{ORIGIN}}", standins.origin)
+        rounds = 20
+        provider.parse_episodes(html, standins.url(path))
+        start = time.perf_counter()
+        for _ in range(rounds):
+            episodes = provider.parse_episodes(html, standins.url(path))
+        elapsed = time.perf_counter() - start
+        results.append(Result(f"parse.{name}.ms_per_page", elapsed / rounds * 1000, "ms"))
+        results.append(Result(f"parse.{name}.us_per_episode", elapsed / rounds / len(episodes) * 1_000_000, "us"))
+    return results
+
+
+def _download(downloader: BaseDownloader, url: str, output_dir: str, **kwargs: Any) -> tuple[bool, float, float]:
+    """Runs one download and returns (success, wall seconds, CPU seconds)."""
+    wall, cpu = time.perf_counter(), time.process_time()
+    with quiet():
+        ok = downloader.download(url, "Bench", 1, 1, output_dir, retries=1, retry_delay=0, **kwargs)
+    return ok, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def bench_download(standins: StandIns) -> list[Result]:
+    """Measures pixeldrain and gofile transfer throughput, CPU cost and captcha fallback latency."""
+    downloader = local_pixeldrain(standins)(source="pixeldrain")
+    size = next(f.size for f in standins.config.files if f.file_id == "bulk")
+    with tempfile.TemporaryDirectory() as output_dir:
+        ok, wall, cpu = _download(downloader, standins.url("/u/bulk"), output_dir)
+        if not ok:
+            raise RuntimeError("Bulk download from the stand-in failed")
+        results = [
+            Result("download.pixeldrain.throughput_mib_s", size / wall / MIB, "MiB/s", "higher"),
+            Result("download.pixeldrain.cpu_s_per_gib", cpu / (size / GIB), "s/GiB"),
+        ]
+
+        ok, wall, _ = _download(downloader, standins.url("/u/captcha"), output_dir, api_key="bench")
+        if not ok:
+            raise RuntimeError("Captcha fallback download from the stand-in failed")
+        results.append(Result("download.pixeldrain.captcha_fallback_s", wall, "s", noise=0.25))
+
+        gofile = local_gofile(standins)(source="gofile")
+        ok, wall, _ = _download(gofile, standins.url("/d/bulk"), os.path.join(output_dir, "gofile"))
+        if not ok:
+            raise RuntimeError("Bulk download from the gofile stand-in failed")
+        results.append(Result("download.gofile.throughput_mib_s", size / wall / MIB, "MiB/s", "higher"))
+    return results
+
+
+def bench_cycle(standins: StandIns) -> list[Result]:
+    """Measures a full `run_check` cycle in a real browser against the stand-ins."""
+    from playwright.sync_api import Error as PlaywrightError
+
+    from src.app import run_check
+
+    config = {
+        "settings": {
+            "download_retries": 1,
+            "download_retry_delay": 0,
+            "series_delay_seconds": [0, 0],
+            "download_delay_seconds": [0, 0],
+            "download_directory": "downloads",
+            "browser_executable_path": os.environ.get("BENCH_BROWSER_EXECUTABLE"),
+        },
+        "series": [
+            {"name": "FileCrypt Bench", "url": standins.url("/Container/bench.html"), "series": 20},
+            {"name": "ViewCrate Bench", "url": standins.url("/v/bench"), "series": 20},
+        ],
+    }
+    cwd = os.getcwd()
+    downloaders = {
+        **dict.fromkeys(("pixeldrain", "pixeldrain.com"), local_pixeldrain(standins)),
+        **dict.fromkeys(("gofile", "gofile.io"), local_gofile(standins)),
+    }
+    with tempfile.TemporaryDirectory() as workdir, registered(local_providers(standins), downloaders):
+        with open(os.path.join(workdir, "config.yaml"), "w", encoding="utf-8") as f:
+            yaml.dump(config, f)
+        os.chdir(workdir)
+        try:
+            wall, cpu = time.perf_counter(), time.process_time()
+            with quiet():
+                run_check()
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        except PlaywrightError as e:
+            raise SkipBenchmark(f"browser unavailable: {str(e).splitlines()[0]}") from e
+        finally:
+            os.chdir(cwd)
+        downloaded = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(os.path.join(workdir, "downloads"))
+            for name in names
+        )
+    if not downloaded:
+        raise RuntimeError("The cycle did not download anything")
+    return [
+        Result("cycle.e2e.seconds", wall, "s"),
+        Result("cycle.e2e.cpu_s_per_gib", cpu / (downloaded / GIB), "s/GiB"),
+    ]
+
+
+def _measure_load(context: Any, url: str) -> tuple[int, float]:
+    """Loads `url` in a new page and returns (bytes received, seconds until the load event)."""
+    received: list[int] = []
+    context.on("response", lambda response: received.append(int(response.headers.get("content-length", 0))))
+    page = context.new_page()
+    start = time.perf_counter()
+    page.goto(url, wait_until="load")
+    return sum(received), time.perf_counter() - start
+
+
+def bench_browser(standins: StandIns) -> list[Result]:
+    """Measures the bytes and time the lean browsing profile saves per page load."""
+    from playwright.sync_api import Error as PlaywrightError
+    from playwright.sync_api import sync_playwright
+
+    from src.browser import launch_browser, new_context
+
+    settings: dict[str, Any] = {"browser_executable_path": os.environ.get("BENCH_BROWSER_EXECUTABLE")}
+    results: list[Result] = []
+    with sync_playwright() as p:
+        try:
+            browser = launch_browser(p, settings)
+        except PlaywrightError as e:
+            raise SkipBenchmark(f"browser unavailable: {str(e).splitlines()[0]}") from e
+        for name, path in (("filecrypt", "/Container/bench.html"), ("viewcrate", "/v/bench")):
+            loads: dict[bool, tuple[int, float]] = {}
+            for lean in (False, True):
+                url = standins.url(path)
+                context, _ = new_context(browser, url, {**settings, "block_resources": lean})
+                loads[lean] = _measure_load(context, url)
+                context.close()
+            (full_bytes, full_seconds), (lean_bytes, lean_seconds) = loads[False], loads[True]
+            results.append(Result(f"browser.{name}.lean_kib_per_load", lean_bytes / 1024, "KiB"))
+            results.append(
+                Result(f"browser.{name}.saved_kib_per_load", (full_bytes - lean_bytes) / 1024, "KiB", "higher")
+            )
+            results.append(
+                Result(f"browser.{name}.saved_s_per_load", full_seconds - lean_seconds, "s", "higher", noise=0.25)
+            )
+        browser.close()
+    return results
+
+
+def _import_time_ms(module: str) -> float:
+    """Returns the cumulative `python -X importtime` of a module in a fresh interpreter, in ms."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    for line in stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def bench_startup(standins: StandIns) -> list[Result]:
+    """Measures the import time of the CLI entry point and of the check cycle (best of several runs)."""
+    return [
+        Result("startup.import_main_ms", min(_import_time_ms("main") for _ in range(IMPORT_RUNS)), "ms", noise=5),
+        Result("startup.import_app_ms", min(_import_time_ms("src.app") for _ in range(IMPORT_RUNS)), "ms", noise=10),
+    ]
+
+
+BENCHMARKS: dict[str, Callable[[StandIns], list[Result]]] = {
+    "startup": bench_startup,
+    "parse": bench_parse,
+    "browser": bench_browser,
+    "download": bench_download,
+    "cycle": bench_cycle,
+}
+
+
+def standin_config() -> StandInConfig:
+    """The files every benchmark run serves."""
+    return StandInConfig(
+        files=[
+            StandInFile("bulk", 256 * MIB, "bulk.mkv"),
+            StandInFile("captcha", 8 * MIB, "captcha.mkv", captcha=True),
+        ],
+        default_size=8 * MIB,
+    )
+
+
+# --- Reporting ----------------------------------------------------------------------------
+
+
+def compare(results: list[Result], baseline: dict[str, Any], max_regression: float) -> list[str]:
+    """Returns a description of every result that regressed beyond the tolerance."""
+    regressions: list[str] = []
+    for result in results:
+        reference = baseline.get(result.name)
+        if not reference:
+            continue
+        base = float(reference["value"])
+        if abs(result.value - base) <= result.noise:
+            continue
+        if result.better == "lower":
+            regressed = result.value > base * (1 + max_regression)
+        else:
+            regressed = result.value < base * (1 - max_regression)
+        if regressed:
+            regressions.append(f"{result.name}: {result.value:.3f} {result.unit} (baseline {base:.3f})")
+    return regressions
+
+
+def rolling_baseline(history_path: str, window: int = DEFAULT_HISTORY_WINDOW) -> dict[str, Any]:
+    """
+    The median of every result over the last `window` runs of a history, as a baseline.
+
+    Results recorded fewer than `MIN_HISTORY_RUNS` times are left out. A missing
+    history is an empty baseline.
+    """
+    try:
+        with open(history_path, encoding="utf-8") as f:
+            runs = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return {}
+    values: dict[str, list[float]] = {}
+    for run in runs[-window:]:
+        for name, result in run["results"].items():
+            values.setdefault(name, []).append(float(result["value"]))
+    return {
+        name: {"name": name, "value": statistics.median(samples)}
+        for name, samples in values.items()
+        if len(samples) >= MIN_HISTORY_RUNS
+    }
+
+
+def git_commit() -> str:
+    """Returns the current commit hash, or 'unknown' outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Runs the benchmark suite against local stand-ins.")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks.")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against; regressions exit with status 1.")
+    parser.add_argument(
+        "--history",
+        help="Compare against the median of the recent runs in this JSON-lines history; "
+        "regressions exit with status 1. --baseline covers the results with too few runs.",
+    )
+    parser.add_argument(
+        "--window", type=int, default=DEFAULT_HISTORY_WINDOW, help="Recent runs of --history to compare against."
+    )
+    parser.add_argument(
+        "--max-regression", type=float, default=DEFAULT_MAX_REGRESSION, help="Allowed relative slowdown."
+    )
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--record", help="Append the results, tagged with the commit, to this JSON-lines history.")
+    parser.add_argument("--write-baseline", help="Write the results as a new baseline to this file.")
+    args = parser.parse_args()
+
+    baseline: dict[str, Any] = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.history:
+        # Read before this run is recorded, so it is not compared with itself
+        baseline.update(rolling_baseline(args.history, args.window))
+
+    results: list[Result] = []
+    with StandIns(standin_config()) as standins:
+        for name in args.only or BENCHMARKS:
+            try:
+                results.extend(BENCHMARKS[name](standins))
+            except SkipBenchmark as e:
+                print(f"- {name}: skipped, {e}")
+
+    width = max((len(r.name) for r in results), default=0)
+    for result in results:
+        print(f"{result.name:<{width}}  {result.value:>12.3f} {result.unit}")
+
+    by_name = {r.name: asdict(r) for r in results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(by_name, f, indent=2)
+    if args.write_baseline:
+        with open(args.write_baseline, "w", encoding="utf-8") as f:
+            json.dump(by_name, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.record:
+        entry = {"commit": git_commit(), "date": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": by_name}
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    if args.baseline or args.history:
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print("Regressions against the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+"""
+Scale and soak harness for the check cycle.
+
+Runs `run_check` over a synthetic watchlist of thousands of series, against a
+provider and a downloader that only simulate latency and failures, so the scheduler
+can be measured without a browser or network:
+
+    python -m benchmarks.soak                                 # 1000 series, one cycle
+    python -m benchmarks.soak --series 5000 --cycles 5        # soak: new episodes every cycle
+    python -m benchmarks.soak --scan-latency 0.05 --download-latency 0.2 --failure-rate 0.1
+    python -m benchmarks.soak --output soak.json              # keep the results
+
+Every series lives on a host of its own; its episodes are served from a few shared
+file hosts, so failures trip the circuit breakers like a real outage would. Every
+`priority_every`-th series has priority 1. Per cycle the harness reports the cycle
+time, the peak memory of the process, the time to the first finished download and
+the fairness of the queue: the wait of each priority class, Jain's fairness index
+over the mean waits of the priority 0 series, and the priority inversions (a
+download started while an episode of a higher priority was already queued).
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Generator, Sequence
+from dataclasses import asdict, dataclass, field
+from typing import Any, cast
+
+import yaml
+
+from benchmarks.run import Result, quiet, registered
+from src.browser import BrowserSession, ResourceBlocker
+from src.downloaders.base import BaseDownloader
+from src.providers.base import BaseProvider
+from src.providers.types import Episode, EpisodeIndex
+
+SOAK_DOMAIN = "soak.invalid"
+
+
+@dataclass
+class SoakConfig:
+    """The synthetic watchlist and how its fake hosts behave."""
+
+    series: int = 1000
+    # Episodes already published when the soak starts, and how many of them are new
+    episodes: int = 12
+    backlog: int = 2
+    # Episodes published per series before every later cycle
+    new_per_cycle: int = 1
+    cycles: int = 1
+    # Mean seconds of a series page load, a link resolution and a transfer (±50% jitter)
+    scan_latency: float = 0.0
+    resolve_latency: float = 0.0
+    download_latency: float = 0.0
+    # Share of series page loads and of transfers that fail
+    scan_failure_rate: float = 0.0
+    failure_rate: float = 0.0
+    file_hosts: int = 4
+    priority_every: int = 10
+    seed: int = 0
+
+
+@dataclass
+class SoakEvent:
+    """A transfer as seen by the synthetic downloader."""
+
+    series: str
+    episode: int
+    started: float
+    finished: float
+    ok: bool
+
+
+@dataclass
+class SoakState:
+    """What the synthetic provider and downloader share with the harness."""
+
+    config: SoakConfig
+    cycle: int = 0
+    # Series name -> when its page was last loaded, i.e. when its episodes were queued
+    scanned_at: dict[str, float] = field(default_factory=dict[str, float])
+    events: list[SoakEvent] = field(default_factory=list[SoakEvent])
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def latest(self) -> int:
+        """The newest published episode of every series in the current cycle."""
+        return self.config.episodes + self.cycle * self.config.new_per_cycle
+
+    def pause(self, mean: float, key: str) -> None:
+        if mean > 0:
+            time.sleep(mean * self.rng(key).uniform(0.5, 1.5))
+
+    def fails(self, rate: float, key: str) -> bool:
+        return rate > 0 and self.rng(key).random() < rate
+
+    def rng(self, key: str) -> random.Random:
+        # Seeded per call, so the outcome does not depend on thread scheduling
+        return random.Random(f"{self.config.seed}:{self.cycle}:{key}")
+
+
+def series_name(index: int) -> str:
+    return f"Soak {index:05d}"
+
+
+def series_priority(config: SoakConfig, index: int) -> int:
+    return 1 if config.priority_every and index % config.priority_every == 0 else 0
+
+
+def watchlist(config: SoakConfig) -> list[dict[str, Any]]:
+    """The series entries of the synthetic config."""
+    return [
+        {
+            "name": series_name(index),
+            "url": f"https://s{index}.{SOAK_DOMAIN}/series/{index}",
+            "series": config.episodes - config.backlog,
+            "priority": series_priority(config, index),
+        }
+        for index in range(config.series)
+    ]
+
+
+def synthetic_provider(state: SoakState) -> type[BaseProvider]:
+    """Returns a provider serving the synthetic series pages."""
+
+    def get_series_episodes(self: BaseProvider, url: str) -> EpisodeIndex:
+        index = int(url.rsplit("/", 1)[1])
+        name = series_name(index)
+        state.pause(state.config.scan_latency, f"scan:{url}")
+        if state.fails(state.config.scan_failure_rate, f"scan:{url}"):
+            raise ValueError(f"synthetic page failure: {url}")
+        with state.lock:
+            state.scanned_at[name] = time.perf_counter()
+        host = f"h{index % max(1, state.config.file_hosts)}.{SOAK_DOMAIN}"
+        return EpisodeIndex(
+            Episode(1, num, f"https://{host}/link/{index}/{num}", f"{name} - S01E{num:02d}.mkv", "soak")
+            for num in range(1, state.latest() + 1)
+        )
+
+    def get_download_url(self: BaseProvider, episode_link: str) -> str:
+        state.pause(state.config.resolve_latency, f"resolve:{episode_link}")
+        return episode_link.replace("/link/", "/file/")
+
+    def parse_episodes(cls: type[BaseProvider], html_content: str, page_url: str | None = None) -> EpisodeIndex:
+        # The synthetic pages are never fetched as HTML
+        return EpisodeIndex()
+
+    return type(
+        "SyntheticProvider",
+        (BaseProvider,),
+        {
+            "name": "soak",
+            "domains": (SOAK_DOMAIN,),
+            "get_series_episodes": get_series_episodes,
+            "get_download_url": get_download_url,
+            "parse_episodes": classmethod(parse_episodes),
+        },
+    )
+
+
+def synthetic_downloader(state: SoakState) -> type[BaseDownloader]:
+    """Returns a downloader that writes an empty episode file after the simulated transfer."""
+
+    def download(
+        self: BaseDownloader, url: str, series_name: str, season: int, episode: int, output_dir: str, **kwargs: Any
+    ) -> bool:
+        started = time.perf_counter()
+        state.pause(state.config.download_latency, f"download:{url}")
+        ok = not state.fails(state.config.failure_rate, f"download:{url}")
+        if ok:
+            folder = os.path.join(output_dir, series_name)
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, f"{series_name} - S{season:02d}E{episode:02d}.mkv"), "wb"):
+                pass
+        with state.lock:
+            state.events.append(SoakEvent(series_name, episode, started, time.perf_counter(), ok))
+        return ok
+
+    return type("SyntheticDownloader", (BaseDownloader,), {"name": "soak", "download": download})
+
+
+class SoakSession(BrowserSession):
+    """A browser session without a browser: every provider gets a page-less instance."""
+
+    def browser(self, settings: dict[str, Any]) -> Any:
+        return None
+
+    def provider(
+        self, provider_class: type[BaseProvider], series_url: str, settings: dict[str, Any], fresh: bool = False
+    ) -> tuple[BaseProvider, ResourceBlocker | None]:
+        return provider_class(cast(Any, None)), None
+
+    def save_state(self, provider: BaseProvider, series_url: str, settings: dict[str, Any]) -> None:
+        pass
+
+
+def jain_index(values: Sequence[float]) -> float:
+    """Jain's fairness index: 1 when all values are equal, 1/n when one takes everything."""
+    squares = sum(value * value for value in values)
+    return sum(values) ** 2 / (len(values) * squares) if squares else 1.0
+
+
+def priority_inversions(state: SoakState, priorities: dict[str, int]) -> int:
+    """
+    Counts the downloads started while an episode of a higher series priority was queued.
+
+    An episode counts as queued from the scan of its series until its own download
+    started; only series priorities are compared, since the recency and age bonuses
+    never outweigh a priority step.
+    """
+    first_start: dict[tuple[str, int], float] = {}
+    for event in state.events:
+        first_start.setdefault((event.series, event.episode), event.started)
+    inversions = 0
+    for (series, _), started in first_start.items():
+        if any(
+            priorities[other] > priorities[series] and state.scanned_at.get(other, started) < started < other_start
+            for (other, _), other_start in first_start.items()
+        ):
+            inversions += 1
+    return inversions
+
+
+def peak_rss_mib() -> float:
+    """The peak resident memory of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB elsewhere
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def cycle_results(state: SoakState, config: SoakConfig, cycle: int, seconds: float) -> list[Result]:
+    """The measurements of one finished cycle."""
+    priorities = {series_name(index): series_priority(config, index) for index in range(config.series)}
+    start = min(state.scanned_at.values(), default=0.0)
+    done = [event for event in state.events if event.ok]
+    prefix = f"soak.cycle{cycle}"
+    results = [
+        Result(f"{prefix}.seconds", seconds, "s"),
+        Result(f"{prefix}.peak_rss_mib", peak_rss_mib(), "MiB"),
+        Result(f"{prefix}.downloads", len(done), "files", "higher"),
+        Result(f"{prefix}.failed_transfers", len(state.events) - len(done), "transfers"),
+    ]
+    if done:
+        results.append(Result(f"{prefix}.first_download_s", min(e.finished for e in done) - start, "s"))
+        for priority in sorted(set(priorities.values())):
+            waits = [e.finished - state.scanned_at[e.series] for e in done if priorities[e.series] == priority]
+            if waits:
+                results.append(Result(f"{prefix}.priority{priority}.mean_wait_s", sum(waits) / len(waits), "s"))
+                results.append(Result(f"{prefix}.priority{priority}.max_wait_s", max(waits), "s"))
+        waits_by_series: dict[str, list[float]] = {}
+        for event in done:
+            if priorities[event.series] == 0:
+                waits_by_series.setdefault(event.series, []).append(event.finished - state.scanned_at[event.series])
+        mean_waits = [sum(waits) / len(waits) for waits in waits_by_series.values()]
+        if mean_waits:
+            results.append(Result(f"{prefix}.fairness_jain", jain_index(mean_waits), "", "higher"))
+    results.append(Result(f"{prefix}.priority_inversions", priority_inversions(state, priorities), "downloads"))
+    return results
+
+
+@contextlib.contextmanager
+def soak_workdir(config: SoakConfig) -> Generator[str]:
+    """A temporary working directory holding the synthetic config; the cycle runs inside it."""
+    settings = {
+        "download_directory": "downloads",
+        "download_retries": 1,
+        "download_retry_delay": 0,
+        "series_delay_seconds": [0, 0],
+        "download_delay_seconds": [0, 0],
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, "config.yaml"), "w", encoding="utf-8") as f:
+            yaml.dump({"settings": settings, "series": watchlist(config)}, f, allow_unicode=True)
+        os.chdir(workdir)
+        try:
+            yield workdir
+        finally:
+            os.chdir(cwd)
+
+
+def run_soak(config: SoakConfig) -> list[Result]:
+    """Runs the configured cycles and returns the measurements of each."""
+    from src.app import run_check
+
+    state = SoakState(config)
+    results: list[Result] = []
+    downloaders = {"soak": synthetic_downloader(state)}
+    with soak_workdir(config), registered([synthetic_provider(state)], downloaders):
+        session = SoakSession()
+        for cycle in range(config.cycles):
+            state.cycle = cycle
+            state.events.clear()
+            state.scanned_at.clear()
+            start = time.perf_counter()
+            with quiet():
+                run_check(session=session)
+            results.extend(cycle_results(state, config, cycle, time.perf_counter() - start))
+    return results
+
+
+def main() -> int:
+    defaults = SoakConfig()
+    parser = argparse.ArgumentParser(description="Runs check cycles over a large synthetic watchlist.")
+    for name, value in asdict(defaults).items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}", type=float if isinstance(value, float) else int, default=value
+        )
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    args = vars(parser.parse_args())
+    output = args.pop("output")
+    config = SoakConfig(**args)
+
+    results = run_soak(config)
+    width = max((len(r.name) for r in results), default=0)
+    for result in results:
+        print(f"{result.name:<{width}}  {result.value:>12.3f} {result.unit}")
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump({"config": asdict(config), "results": {r.name: asdict(r) for r in results}}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""
+Local stand-ins for FileCrypt, ViewCrate, pixeldrain and gofile.
+
+A single threaded HTTP server answers the routes the application talks to:
+
+- `/Container/<id>.html` and `/v/<id>` serve the FileCrypt and ViewCrate fixture pages.
+- `/Link/<link>.html` and `/go/<link>` redirect to the file host, like the providers do.
+- `/api/file/<id>` mimics pixeldrain's download API (Range, content-disposition,
+  403 captcha responses), `/api/file/<id>/info` its file-info API and `/api/list/<id>`
+  its list API (every declared file is in every list).
+- `/accounts`, `/contents/<id>` and `/download/<id>/<name>` mimic gofile's API.
+- `/static/...` serves the images, fonts, scripts and ad frames the fixture pages reference.
+
+Link ids are `pd-<file id>` for pixeldrain and `gf-<file id>` for gofile. Files not
+declared in the config are served with the default size.
+"""
+
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.connection import Connection
+from typing import Any, Self
+from urllib.parse import unquote
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+CHUNK_SIZE = 64 * 1024
+_BLOCK = random.Random(0).randbytes(1024 * 1024)
+
+
+@dataclass(frozen=True)
+class StandInFile:
+    """A file served by the pixeldrain and gofile stand-ins."""
+
+    file_id: str
+    size: int
+    name: str = ""
+    # Bytes per second per connection, 0 for unthrottled
+    rate: int = 0
+    # Answer unauthenticated downloads with pixeldrain's captcha 403
+    captcha: bool = False
+
+    @property
+    def filename(self) -> str:
+        return self.name or f"{self.file_id}.mkv"
+
+
+@dataclass
+class StandInConfig:
+    """Behaviour of the stand-in server."""
+
+    files: list[StandInFile] = field(default_factory=list[StandInFile])
+    default_size: int = 4 * 1024 * 1024
+    default_rate: int = 0
+    # Extra latency and size of every /static asset, to make page weight measurable
+    asset_delay: float = 0.05
+    asset_size: int = 64 * 1024
+
+    def file(self, file_id: str) -> StandInFile:
+        for spec in self.files:
+            if spec.file_id == file_id:
+                return spec
+        return StandInFile(file_id=file_id, size=self.default_size, rate=self.default_rate)
+
+
+def _read_fixture(name: str, origin: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read().replace("{{ORIGIN}}", origin).encode("utf-8")
+
+
+def _file_body(offset: int, length: int) -> bytes:
+    """Returns `length` deterministic bytes starting at `offset`."""
+    start = offset % len(_BLOCK)
+    out = bytearray()
+    while len(out) < length:
+        piece = _BLOCK[start : start + length - len(out)]
+        out += piece
+        start = 0
+    return bytes(out)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Routes requests to the individual stand-ins."""
+
+    protocol_version = "HTTP/1.1"
+    config: StandInConfig = StandInConfig()
+
+    @property
+    def origin(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Keeps the benchmark output clean."""
+
+    # --- Dispatch -------------------------------------------------------------------------
+
+    def do_GET(self) -> None:
+        self._dispatch(head=False)
+
+    def do_HEAD(self) -> None:
+        self._dispatch(head=True)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        if self.path.split("?", 1)[0] == "/accounts":
+            self._json(200, {"status": "ok", "data": {"id": "standin", "token": "standin-token"}})
+        else:
+            self._json(404, {"status": "error-notFound"})
+
+    def _dispatch(self, head: bool) -> None:
+        path = unquote(self.path.split("?", 1)[0])
+        routes: list[tuple[str, Callable[[re.Match[str]], None]]] = [
+            (r"^/Container/[^/]+\.html$", lambda _: self._page("filecrypt_container.html", head)),
+            (r"^/v/[^/]+$", lambda _: self._page("viewcrate_container.html", head)),
+            (r"^/(?:Link/(?P<a>[^/]+)\.html|go/(?P<b>[^/]+))$", lambda m: self._redirect(m.group("a") or m.group("b"))),
+            (r"^/api/file/(?P<id>[^/]+)/info$", lambda m: self._pixeldrain_info(m.group("id"), head)),
+            (r"^/api/file/(?P<id>[^/]+)$", lambda m: self._pixeldrain_file(m.group("id"), head)),
+            (r"^/api/list/(?P<id>[^/]+)$", lambda m: self._pixeldrain_list(m.group("id"), head)),
+            (r"^/u/(?P<id>[^/]+)$", lambda m: self._html(f"<html><body>pixeldrain file {m.group('id')}</body></html>")),
+            (r"^/d/(?P<id>[^/]+)$", lambda m: self._html(f"<html><body>gofile folder {m.group('id')}</body></html>")),
+            (r"^/contents/(?P<id>[^/]+)$", lambda m: self._gofile_contents(m.group("id"))),
+            (r"^/download/(?P<id>[^/]+)/[^/]+$", lambda m: self._serve_file(self.config.file(m.group("id")), head)),
+            (r"^/static/(?P<path>.+)$", lambda m: self._asset(m.group("path"), head)),
+        ]
+        for pattern, handler in routes:
+            match = re.match(pattern, path)
+            if match:
+                handler(match)
+                return
+        self._json(404, {"success": False, "value": "not_found"})
+
+    # --- Helpers --------------------------------------------------------------------------
+
+    def _send(self, status: int, body: bytes, content_type: str, head: bool = False, **headers: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name.replace("_", "-"), value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _json(self, status: int, payload: dict[str, Any], head: bool = False) -> None:
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json", head)
+
+    def _html(self, html: str) -> None:
+        self._send(200, html.encode("utf-8"), "text/html; charset=utf-8")
+
+    # --- Providers ------------------------------------------------------------------------
+
+    def _page(self, fixture: str, head: bool) -> None:
+        self._send(200, _read_fixture(fixture, self.origin), "text/html; charset=utf-8", head)
+
+    def _redirect(self, link_id: str) -> None:
+        host, _, file_id = link_id.partition("-")
+        target = f"{self.origin}/d/{file_id}" if host == "gf" else f"{self.origin}/u/{file_id}"
+        self.send_response(302)
+        self.send_header("Location", target)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _asset(self, path: str, head: bool) -> None:
+        time.sleep(self.config.asset_delay)
+        content_types = {".css": "text/css", ".js": "application/javascript", ".woff2": "font/woff2"}
+        content_type = content_types.get(os.path.splitext(path)[1], "image/jpeg")
+        if path.endswith(".html"):
+            content_type = "text/html"
+        self._send(200, _file_body(0, self.config.asset_size), content_type, head)
+
+    # --- pixeldrain -----------------------------------------------------------------------
+
+    def _pixeldrain_info(self, file_id: str, head: bool) -> None:
+        spec = self.config.file(file_id)
+        self._json(
+            200,
+            {
+                "id": spec.file_id,
+                "name": spec.filename,
+                "size": spec.size,
+                "mime_type": "video/x-matroska",
+                "hash_sha256": "",
+                "availability": "file_rate_limited_captcha_required" if spec.captcha else "",
+                "can_download": True,
+            },
+            head,
+        )
+
+    def _pixeldrain_list(self, list_id: str, head: bool) -> None:
+        files = [{"id": spec.file_id, "name": spec.filename, "size": spec.size} for spec in self.config.files]
+        self._json(200, {"success": True, "id": list_id, "file_count": len(files), "files": files}, head)
+
+    def _pixeldrain_file(self, file_id: str, head: bool) -> None:
+        spec = self.config.file(file_id)
+        if spec.captcha and "Authorization" not in self.headers:
+            self._json(
+                403,
+                {
+                    "success": False,
+                    "value": "file_rate_limited_captcha_required",
+                    "message": "This file has been rate limited, a captcha is required.",
+                },
+            )
+            return
+        self._serve_file(spec, head)
+
+    # --- gofile ---------------------------------------------------------------------------
+
+    def _gofile_contents(self, content_id: str) -> None:
+        spec = self.config.file(content_id)
+        self._json(
+            200,
+            {
+                "status": "ok",
+                "data": {
+                    "id": content_id,
+                    "type": "folder",
+                    "children": {
+                        spec.file_id: {
+                            "id": spec.file_id,
+                            "type": "file",
+                            "name": spec.filename,
+                            "size": spec.size,
+                            "link": f"{self.origin}/download/{spec.file_id}/{spec.filename}",
+                        }
+                    },
+                },
+            },
+        )
+
+    # --- Byte serving ---------------------------------------------------------------------
+
+    def _serve_file(self, spec: StandInFile, head: bool) -> None:
+        start, end = 0, spec.size - 1
+        status = 200
+        range_header = self.headers.get("Range")
+        match = re.match(r"bytes=(\d*)-(\d*)$", range_header or "")
+        if match:
+            if match.group(1):
+                start = int(match.group(1))
+                end = int(match.group(2)) if match.group(2) else spec.size - 1
+            else:
+                start = max(0, spec.size - int(match.group(2)))
+            end = min(end, spec.size - 1)
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{spec.size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", "video/x-matroska")
+        self.send_header("Content-Disposition", f'attachment; filename="{spec.filename}"')
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{spec.size}")
+        self.end_headers()
+        if head:
+            return
+
+        sent = 0
+        began = time.monotonic()
+        offset = start
+        try:
+            while offset <= end:
+                length = min(CHUNK_SIZE, end - offset + 1)
+                self.wfile.write(_file_body(offset, length))
+                offset += length
+                sent += length
+                if spec.rate:
+                    ahead = sent / spec.rate - (time.monotonic() - began)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class _StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        """Clients dropping connections mid-transfer is expected, not an error."""
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(config: StandInConfig, conn: Connection | None = None, port: int = 0) -> None:
+    """Runs the stand-in server forever, reporting the bound port through `conn`."""
+    handler = type("ConfiguredStandInHandler", (StandInHandler,), {"config": config})
+    server = _StandInServer(("127.0.0.1", port), handler)
+    if conn is not None:
+        conn.send(server.server_address[1])
+        conn.close()
+    server.serve_forever()
+
+
+class StandIns:
+    """
+    Runs the stand-in server in a child process.
+
+    Keeping the server out of the benchmarking process means CPU time measured by
+    the benchmarks belongs to the application code only.
+    """
+
+    def __init__(self, config: StandInConfig | None = None):
+        self.config = config or StandInConfig()
+        self.port = 0
+        self._process: multiprocessing.Process | None = None
+
+    @property
+    def origin(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def url(self, path: str) -> str:
+        return f"{self.origin}{path}"
+
+    def __enter__(self) -> Self:
+        parent, child = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(target=serve, args=(self.config, child), daemon=True)
+        self._process.start()
+        self.port = parent.recv()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Runs the local provider and file host stand-ins.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=int, default=0, help="Throttle file transfers to this many bytes per second.")
+    parser.add_argument("--size", type=int, default=64 * 1024 * 1024, help="Default file size in bytes.")
+    args = parser.parse_args()
+    print(f"Serving stand-ins on http://127.0.0.1:{args.port}")
+    serve(StandInConfig(default_size=args.size, default_rate=args.rate), port=args.port)
@@ -1,57 +1,159 @@
+import argparse
 import sys
+import threading
 import time
 from typing import NoReturn
 
-from src.app import run_check
+from src.config import load_config
+from src.constants import (
+    DEFAULT_CONTROL_HOST,
+    DEFAULT_CONTROL_PORT,
+    DEFAULT_CONTROL_TOKEN_PATH,
+    DEFAULT_METRICS_HOST,
+    DEFAULT_METRICS_PORT,
+    DEFAULT_PROFILE_DIRECTORY,
+)
+from src.control import CONTROL, control_token, start_control_server
+from src.metrics import start_metrics_server
+from src.tracing import TRACER
 from src.utils import log
 
-if sys.platform == "win32":
-    import msvcrt
-else:
-    import select
 
+def watch_stdin() -> None:
+    """Triggers a check of all series whenever Enter is pressed."""
 
-def wait_for_input_or_timeout(timeout_seconds: int) -> bool:
-    """
-    Waits for user input or a timeout, whichever comes first.
+    def read() -> None:
+        for _ in sys.stdin:
+            log("⌨️ Enter нажат. Запускаю проверку...", top=1)
+            CONTROL.request_check()
 
-    Args:
-        timeout_seconds: The timeout in seconds.
+    threading.Thread(target=read, name="stdin", daemon=True).start()
 
-    Returns:
-        True if input was received, False otherwise.
-    """
-    if sys.platform == "win32":
-        start_time = time.time()
-        while time.time() - start_time < timeout_seconds:
-            if msvcrt.kbhit() and msvcrt.getch() == b"\r":
-                return True
-            time.sleep(0.1)
-        return False
 
-    rlist, _, _ = select.select([sys.stdin], [], [], timeout_seconds)
-    if rlist:
-        sys.stdin.readline()
-        return True
-    return False
+def parse_args() -> argparse.Namespace:
+    """Parses the command line arguments."""
+    parser = argparse.ArgumentParser(description="Monitors series pages and downloads new episodes.")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Run without reading stdin (for systemd or containers) and enable the control API.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write a Chrome trace timeline of every check cycle.",
+    )
+    parser.add_argument(
+        "--profile-parse",
+        action="store_true",
+        help="Additionally run the page parsing stages under cProfile (implies --profile).",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=DEFAULT_PROFILE_DIRECTORY,
+        help=f"Directory for the profiling output (default: {DEFAULT_PROFILE_DIRECTORY}).",
+    )
+    return parser.parse_args()
+
+
+def start_metrics_if_enabled() -> None:
+    """Starts the local metrics endpoint if it is enabled in the config."""
+    config_data = load_config() or {}
+    metrics_settings = config_data.get("settings", {}).get("metrics", {})
+    if not metrics_settings.get("enable", False):
+        return
+    try:
+        start_metrics_server(
+            metrics_settings.get("host", DEFAULT_METRICS_HOST),
+            metrics_settings.get("port", DEFAULT_METRICS_PORT),
+        )
+    except OSError as e:
+        log(f"❌ Не удалось запустить сервер метрик: {e}")
+
+
+def start_control_if_enabled(force: bool = False) -> None:
+    """Starts the local control API if it is enabled in the config or `force` is set."""
+    config_data = load_config() or {}
+    control_settings = config_data.get("settings", {}).get("control", {})
+    if not (force or control_settings.get("enable", False)):
+        return
+    try:
+        token = control_token(control_settings.get("token", ""), DEFAULT_CONTROL_TOKEN_PATH)
+        start_control_server(
+            control_settings.get("host", DEFAULT_CONTROL_HOST),
+            control_settings.get("port", DEFAULT_CONTROL_PORT),
+            series_names=lambda: [s["name"] for s in (load_config() or {}).get("series", [])],
+            token=token,
+        )
+        if not control_settings.get("token"):
+            log(f"🔑 Токен API управления лежит в файле {DEFAULT_CONTROL_TOKEN_PATH}")
+    except OSError as e:
+        log(f"❌ Не удалось запустить API управления: {e}")
 
 
 def main() -> NoReturn:
     """The main entry point of the script."""
+    args = parse_args()
+    TRACER.configure(
+        enabled=args.profile or args.profile_parse,
+        profile_parse=args.profile_parse,
+        directory=args.profile_dir,
+    )
+    session = None
     try:
         log("🚀 Мониторинг запущен. Нажмите Ctrl+C для выхода.")
-        log("ℹ️ Нажмите Enter, чтобы запустить проверку немедленно.")
+        if not args.daemon:
+            log("ℹ️ Нажмите Enter, чтобы запустить проверку немедленно.")
+            watch_stdin()
+        start_metrics_if_enabled()
+        start_control_if_enabled(force=args.daemon)
+        # The check cycle pulls in the browser stack; import it after the first log line
+        from src.app import resume_pending_jobs, run_check
+        from src.browser import BrowserSession
+
+        # Finish what an interrupted run left behind before scraping anything
+        resume_pending_jobs()
+        # One browser is kept warm for all checks, scheduled or requested
+        session = BrowserSession()
+        last_check = next_check = time.time()
         while True:
-            interval_minutes = run_check()
+            command = CONTROL.next_command(timeout=next_check - time.time())
+            if command is not None and command.kind == "reload":
+                config_data = load_config() or {}
+                interval_minutes = config_data.get("settings", {}).get("check_interval_minutes", 10)
+                # Browser settings may have changed; the next check relaunches it
+                session.close()
+                next_check = last_check + interval_minutes * 60
+                CONTROL.set_next_check(next_check)
+                minutes_left = max(0, next_check - time.time()) / 60
+                log(f"🔄 Конфиг перезагружен. Следующая проверка через {minutes_left:.0f} минут.")
+                continue
+
+            if command is not None and command.series is not None:
+                log(f"🎛️ Запускаю проверку сериала {command.series}...", top=1)
+                run_check([command.series], session)
+                log("---", top=1)
+                continue
+
+            last_check = time.time()
+            interval_minutes = run_check(session=session)
+            next_check = last_check + interval_minutes * 60
+            CONTROL.set_next_check(next_check)
             log("---", top=1)
             log(f"🕒 Проверка завершена. Следующая проверка через {interval_minutes} минут.")
 
-            if wait_for_input_or_timeout(interval_minutes * 60):
-                log("⌨️ Enter нажат. Запускаю проверку...", top=1)
-
     except KeyboardInterrupt:
         log("🛑 Получен сигнал завершения. Выход.", top=2)
         sys.exit(0)
+    finally:
+        if session is not None:
+            session.close()
+        # Hand this instance's series over to the other instances right away
+        from src.leases import LEASES
+        from src.postprocess import POSTPROCESS
+
+        LEASES.close()
+        POSTPROCESS.shutdown()
 
 
 if __name__ == "__main__":
@@ -1,9 +1,15 @@
+import argparse
 import asyncio
-import sys
+import time
+from urllib.parse import urlparse
 
-from playwright.async_api import async_playwright
+from playwright.async_api import Browser, Request, Route, async_playwright
 from playwright_stealth import Stealth  # type: ignore[reportMissingTypeStubs]
 
+from src.browser import PageLoadStats, ResourceBlocker
+from src.constants import BROWSER_USER_AGENT, BROWSER_VIEWPORT
+from src.providers import find_provider_class
+
 
 def _write_to_file(filename: str, content: str) -> None:
     """Synchronously writes content to a file."""
@@ -11,36 +17,75 @@ def _write_to_file(filename: str, content: str) -> None:
         f.write(content)
 
 
-async def main():
-    if len(sys.argv) < 2:
-        print("Usage: python page-test.py <URL>")
-        return
+async def load_page(browser: Browser, url: str, lean: bool, wait_ms: int) -> tuple[str, PageLoadStats]:
+    """Loads a page in a fresh context and returns its HTML and request accounting."""
+    width, height = BROWSER_VIEWPORT
+    context = await browser.new_context(user_agent=BROWSER_USER_AGENT, viewport={"width": width, "height": height})
+    stealth = Stealth()
+    # Apply stealth patches to the context
+    await stealth.apply_stealth_async(context)
+
+    stats = PageLoadStats()
+    provider_class = find_provider_class(url)
+    blocker = ResourceBlocker(urlparse(url).hostname or "", provider_class.allowed_hosts if provider_class else ())
+
+    async def handle(route: Route, request: Request) -> None:
+        stats.requests += 1
+        is_main_navigation = request.is_navigation_request() and request.frame.parent_frame is None
+        if blocker.should_block(request.url, request.resource_type, is_main_navigation):
+            stats.blocked += 1
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    async def on_finished(request: Request) -> None:
+        sizes = await request.sizes()
+        stats.bytes += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+
+    if lean:
+        await context.route("**/*", handle)
+    context.on("requestfinished", on_finished)
 
-    url = sys.argv[1]
+    page = await context.new_page()
+    start = time.perf_counter()
+    await page.goto(url, wait_until="load")
+    stats.seconds = time.perf_counter() - start
+
+    print(f"Waiting for {wait_ms / 1000:.0f} seconds...")
+    await page.wait_for_timeout(wait_ms)
+    content = await page.content()
+    await context.close()
+    return content, stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Saves a provider page as the scraper sees it.")
+    parser.add_argument("url")
+    parser.add_argument(
+        "--lean", action="store_true", help="Load the page with the headless, resource-blocking profile."
+    )
+    parser.add_argument("--compare", action="store_true", help="Load the page both ways and report the savings.")
+    parser.add_argument("--wait", type=int, default=10000, help="Milliseconds to let the page run its JavaScript.")
+    args = parser.parse_args()
 
     async with async_playwright() as p:
-        browser = await p.chromium.launch(channel="chrome", headless=False)
-        context = await browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/125.0.0.0 Safari/537.36"
-            ),
-            viewport={"width": 1920, "height": 1080},
-        )
-        stealth = Stealth()
-        # Apply stealth patches to the context
-        await stealth.apply_stealth_async(context)
-
-        page = await context.new_page()
-
-        print(f"Navigating to {url}...")
-        await page.goto(url, wait_until="domcontentloaded")
-
-        print("Waiting for 10 seconds...")
-        await page.wait_for_timeout(10000)
+        browser = await p.chromium.launch(channel="chrome", headless=args.lean or args.compare)
+
+        print(f"Navigating to {args.url}...")
+        lean = args.lean and not args.compare
+        content, stats = await load_page(browser, args.url, lean=lean, wait_ms=args.wait)
+        print(f"{'Lean' if lean else 'Full'} load: {stats.requests} requests, {stats.blocked} blocked,")
+        print(f"  {stats.bytes / 1024:.0f} KB in {stats.seconds:.2f}s until the load event")
+
+        if args.compare:
+            _, lean_stats = await load_page(browser, args.url, lean=True, wait_ms=args.wait)
+            saved_bytes = stats.bytes - lean_stats.bytes
+            saved_seconds = stats.seconds - lean_stats.seconds
+            print(f"Lean load: {lean_stats.requests} requests, {lean_stats.blocked} blocked,")
+            print(f"  {lean_stats.bytes / 1024:.0f} KB in {lean_stats.seconds:.2f}s until the load event")
+            print(f"Saved per page load: {saved_bytes / 1024:.0f} KB and {saved_seconds:.2f}s")
 
         print("Saving page content to page-test.html...")
-        content = await page.content()
         await asyncio.to_thread(_write_to_file, "page-test.html", content)
 
         await browser.close()
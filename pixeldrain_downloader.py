@@ -1,152 +1,246 @@
+"""
+Downloads files from pixeldrain in batches.
+
+Accepts file links (`https://pixeldrain.com/u/<id>`), list links
+(`https://pixeldrain.com/l/<id>`) and bare file ids, from the arguments or, without
+arguments, from stdin. The API key, retries and retry delay come from config.yaml.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
 import sys
+import threading
 import time
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import yaml
-
-from src.constants import PIXELDRAIN_API_FILE_URL
+from src.config import load_config
+from src.constants import DEFAULT_MIN_FREE_DISK_MB, PARTIAL_DIRECTORY, PIXELDRAIN_BASE_URL, PIXELDRAIN_BATCH_JOBS
+from src.disk_space import DISK, partial_bytes
+from src.downloaders.transfer_loop import TRANSFER_LOOP
+from src.utils import log
 
+if TYPE_CHECKING:
+    import requests
 
-def load_config() -> dict[str, Any] | None:
-    """Loads the YAML configuration file."""
-    try:
-        with open("config.yaml", encoding="utf-8") as f:
-            return yaml.safe_load(f)
-    except FileNotFoundError:
-        return None
-    except Exception as e:
-        print(f"❌ Ошибка при загрузке config.yaml: {e}")
-        return None
+    from src.downloaders.pixeldrain import PixeldrainDownloader
+    from src.downloaders.transfer import ProgressCallback
+
+
+class BatchProgress:
+    """Aggregates the progress of concurrent downloads into one status line."""
+
+    def __init__(self, total_files: int):
+        self.total_files = total_files
+        self.succeeded = 0
+        self.failed = 0
+        self._present: dict[str, int] = {}
+        self._sizes: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._initial = 0
+        self._stop = threading.Event()
+
+    def callback(self, url: str) -> "ProgressCallback":
+        """Returns the progress callback of one download."""
+
+        def update(present: int, total_size: int) -> None:
+            with self._lock:
+                if url not in self._present:
+                    # Resumed bytes do not count towards the speed
+                    self._initial += present
+                self._present[url] = present
+                self._sizes[url] = total_size
+
+        return update
+
+    def finish(self, url: str, ok: bool) -> None:
+        """Records a finished download."""
+        with self._lock:
+            if ok:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+
+    def summary(self) -> str:
+        with self._lock:
+            present = sum(self._present.values())
+            total_size = sum(self._sizes.values())
+            fetched = present - self._initial
+            finished = self.succeeded + self.failed
+            failed = self.failed
+        speed = fetched / max(time.monotonic() - self._started, 1e-9) / 1024 / 1024
+        return (
+            f"📦 Файлов {finished}/{self.total_files}, {present / 1024 / 1024:.1f}/{total_size / 1024 / 1024:.1f} MB,"
+            f" {speed:.1f} MB/s, ошибок: {failed}"
+        )
+
+    def start(self, interval: float = 1.0) -> None:
+        """Prints the status line every `interval` seconds until `stop` is called."""
+
+        def run() -> None:
+            while not self._stop.wait(interval):
+                log(self.summary(), carriage_return=True)
+
+        threading.Thread(target=run, name="batch-progress", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def parse_args() -> argparse.Namespace:
+    """Parses the command line arguments."""
+    parser = argparse.ArgumentParser(description="Downloads files and lists from pixeldrain.")
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        help="File links, list links or file ids. Read from stdin (one or more per line) if omitted.",
+    )
+    parser.add_argument("-o", "--output-dir", default=".", help="Directory for the downloaded files.")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=PIXELDRAIN_BATCH_JOBS,
+        help=f"Files downloaded at once (default: {PIXELDRAIN_BATCH_JOBS}).",
+    )
+    parser.add_argument("--api-key", help="pixeldrain API key; overrides settings.pixeldrain_api_key.")
+    return parser.parse_args()
+
+
+def read_inputs(args: argparse.Namespace) -> list[str]:
+    """Returns the links and ids from the arguments or stdin, skipping comments."""
+    if args.inputs:
+        return list(args.inputs)
+    if sys.stdin.isatty():
+        log("ℹ️ Вставьте ссылки pixeldrain (по одной или несколько в строке), затем Ctrl+D:")
+    return [token for line in sys.stdin if not line.lstrip().startswith("#") for token in line.split()]
+
+
+def expand_inputs(downloader: "PixeldrainDownloader", inputs: list[str], session: "requests.Session") -> list[str]:
+    """Turns links, list links and ids into file URLs, without duplicates."""
+    import requests
 
+    urls: list[str] = []
+    for item in inputs:
+        item = item.strip().rstrip("/")
+        if "/l/" in item:
+            try:
+                list_urls = downloader.list_file_urls(item, session)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                log(f"❌ Не удалось получить список {item}: {e}")
+                continue
+            log(f"📃 Список {item}: файлов {len(list_urls)}.")
+            urls.extend(list_urls)
+        elif "/" in item:
+            urls.append(item)
+        elif item:
+            urls.append(f"{PIXELDRAIN_BASE_URL}/u/{item}")
+    return list(dict.fromkeys(urls))
+
+
+def main() -> int:
+    """Downloads every given file; returns the exit status."""
+    args = parse_args()
+    settings: dict[str, Any] = (load_config() or {}).get("settings", {})
+    api_key = args.api_key or settings.get("pixeldrain_api_key")
+    retries = settings.get("download_retries", 3)
+    retry_delay = settings.get("download_retry_delay", 5)
+    DISK.configure(settings.get("min_free_disk_mb", DEFAULT_MIN_FREE_DISK_MB) * 1024 * 1024)
+
+    inputs = read_inputs(args)
+    if not inputs:
+        log("❌ Не указано ни одной ссылки.")
+        return 2
 
-def perform_download_attempt(file_id: str, api_key: str | None = None) -> str:
-    """
-    Performs a single download attempt for a file from pixeldrain.
-    Returns 'success', 'low_speed', or 'failed'.
-    """
     import requests
 
-    from src.constants import PIXELDRAIN_MIN_SPEED_NO_API
-
-    download_url = PIXELDRAIN_API_FILE_URL.format(file_id=file_id)
-
-    headers = {}
-    if api_key:
-        import base64
-
-        auth_str = f":{api_key}"
-        headers["Authorization"] = "Basic " + base64.b64encode(auth_str.encode()).decode()
-
-    try:
-        with open(file_id, "wb") as f, requests.get(download_url, headers=headers, stream=True) as r:
-            r.raise_for_status()
-
-            content_disposition = r.headers.get("content-disposition")
-            filename = file_id
-            if content_disposition:
-                parts = content_disposition.split(";")
-                for part in parts:
-                    if part.strip().startswith("filename="):
-                        filename_part = part.split("=")[1].strip()
-                        filename = filename_part.strip('"')
-                        break
-
-            print(f"      📄 Имя файла: {filename}")
-
-            total_size = int(r.headers.get("content-length", 0))
-            downloaded_size = 0
-            start_time = time.time()
-            speed_checked = False
-
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
-                downloaded_size += len(chunk)
-                if total_size > 0:
-                    elapsed_time = time.time() - start_time
-                    speed = downloaded_size / elapsed_time / 1024 if elapsed_time > 0 else 0
-
-                    if not api_key and not speed_checked and elapsed_time > 5:
-                        speed_checked = True
-                        if speed < PIXELDRAIN_MIN_SPEED_NO_API:
-                            print(f"\n      ❌ Низкая скорость скачивания (< {PIXELDRAIN_MIN_SPEED_NO_API} KB/s).")
-                            return "low_speed"
-
-                    progress = downloaded_size / total_size * 100
-                    sys.stdout.write(
-                        f"\r      [pixeldrain] {progress:.1f}% of {total_size / 1024 / 1024:.2f}MB at {speed:.1f} KB/s"
-                    )
-                    sys.stdout.flush()
-        print("\n      ✅ Скачивание успешно завершено.")
-        return "success"
-
-    except requests.exceptions.RequestException as e:
-        print(f"\n      ❌ Ошибка при скачивании: {e}")
-        if e.response and e.response.status_code == 403:
-            try:
-                error_data = e.response.json()
-                if error_data.get("value") == "file_rate_limited_captcha_required":
-                    print("      ❌ Файл требует капчу для скачивания без ключа.")
-                elif error_data.get("value") == "virus_detected_captcha_required":
-                    print("      ❌ В файле обнаружен вирус, требуется капча.")
-            except Exception:
-                pass
-        return "failed"
-    except KeyboardInterrupt:
-        print("\n      🛑 Скачивание прервано пользователем.")
-        raise
-
-
-def main() -> None:
-    """Main function to run the downloader script."""
-    config_data = load_config() or {}
-    settings = config_data.get("settings", {})
-    api_key = settings.get("pixeldrain_api_key")
-    download_retries = settings.get("download_retries", 3)
-    download_retry_delay = settings.get("download_retry_delay", 5)
-
-    url = input("Введите ссылку на файл pixeldrain: ")
-    if not url:
-        print("❌ Ссылка не может быть пустой.")
-        return
-
-    file_id = url.split("/")[-1]
-
-    # --- Phase 1: Download without API Key ---
-    print("\n--- Этап 1: Скачивание без ключа ---")
-    for attempt in range(download_retries):
-        print(f"      Попытка {attempt + 1}/{download_retries}...")
-        status = perform_download_attempt(file_id)
-
-        if status == "success":
-            return
-
-        if status == "low_speed":
-            print("      Низкая скорость. Переход к скачиванию с ключом.")
-            break
-
-        if attempt < download_retries - 1:
-            print(f"      Ошибка. Повтор через {download_retry_delay} секунд...")
-            time.sleep(download_retry_delay)
-
-    # --- Phase 2: Download with API Key ---
-    if not api_key:
-        print("\n      ❌ Не удалось скачать файл без ключа. API ключ не найден.")
-        return
-
-    print("\n--- Этап 2: Скачивание с API ключом ---")
-    for attempt in range(download_retries):
-        print(f"      Попытка {attempt + 1}/{download_retries}...")
-        status = perform_download_attempt(file_id, api_key=api_key)
-
-        if status == "success":
-            return
-
-        if attempt < download_retries - 1:
-            print(f"      Ошибка. Повтор через {download_retry_delay} секунд...")
-            time.sleep(download_retry_delay)
-
-    print("\n      ❌ Не удалось скачать файл после всех попыток.")
+    from src.downloaders.pixeldrain import PixeldrainDownloader
+
+    downloader = PixeldrainDownloader()
+    with requests.Session() as session:
+        urls = expand_inputs(downloader, inputs, session)
+        if not urls:
+            log("❌ Не найдено ни одного файла для скачивания.")
+            return 1
+
+        remote_files = downloader.preflight(urls)
+        pending: list[str] = []
+        for url in urls:
+            remote_file = remote_files.get(url)
+            if remote_file is not None and remote_file.name:
+                existing = os.path.join(args.output_dir, remote_file.name)
+                if os.path.isfile(existing) and os.path.getsize(existing) == remote_file.size:
+                    log(f"✅ Уже скачан: {remote_file.name}")
+                    continue
+            pending.append(url)
+
+        known_size = sum(remote_files[url].size for url in pending if url in remote_files)
+        log(f"🔽 К скачиванию файлов: {len(pending)} ({known_size / 1024 / 1024:.1f} MB), потоков: {args.jobs}.", top=1)
+        progress = BatchProgress(len(pending))
+        failed: list[str] = []
+
+        partial_dir = os.path.join(args.output_dir, PARTIAL_DIRECTORY)
+
+        async def fetch(url: str) -> str | None:
+            remote_file = remote_files.get(url)
+            size = remote_file.size if remote_file is not None else 0
+            file_id = url.rstrip("/").split("/")[-1]
+            reservation = DISK.reserve(
+                size, (partial_dir, args.output_dir), present=partial_bytes(partial_dir, file_id)
+            )
+            if reservation is None:
+                log(f"💾 Недостаточно места на диске для {url} ({size / 1024 / 1024:.0f} MB).", top=1)
+                return None
+            with reservation:
+                return await downloader.download_file_async(
+                    url,
+                    args.output_dir,
+                    retries=retries,
+                    retry_delay=retry_delay,
+                    api_key=api_key,
+                    remote_file=remote_file,
+                    session=session,
+                    progress=progress.callback(url),
+                )
+
+        async def fetch_all() -> None:
+            # The transfers share the transfer loop; `--jobs` of them run at once
+            slots = asyncio.Semaphore(max(1, args.jobs))
+
+            async def run(url: str) -> None:
+                async with slots:
+                    try:
+                        final_path = await fetch(url)
+                    except Exception as e:
+                        log(f"❌ Ошибка при скачивании {url}: {e}", top=1)
+                        final_path = None
+                progress.finish(url, final_path is not None)
+                if final_path is None:
+                    failed.append(url)
+
+            await asyncio.gather(*(run(url) for url in pending))
+
+        progress.start()
+        try:
+            TRANSFER_LOOP.run(fetch_all())
+        except KeyboardInterrupt:
+            progress.stop()
+            # The transfers were cancelled and have written what they received
+            log("🛑 Скачивание прервано. Частично скачанные файлы сохранены и будут продолжены.", top=2)
+            return 130
+        progress.stop()
+
+    # Leave no empty folder of partial files behind
+    with contextlib.suppress(OSError):
+        os.rmdir(partial_dir)
+
+    log(progress.summary(), top=1)
+    for url in failed:
+        log(f"❌ Не удалось скачать: {url}", indent=1)
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,24 +1,63 @@
-import itertools
+import os
 import random
 import time
-from collections.abc import Sequence
-from typing import Any, cast
+from collections.abc import Callable, Collection, Sequence
+from dataclasses import dataclass
+from functools import partial
+from typing import Any
 from urllib.parse import urlparse
 
-import browser_cookie3  # type: ignore
-from playwright.sync_api import Browser, sync_playwright
-from playwright_stealth import Stealth  # type: ignore[reportMissingTypeStubs]
-
+from src.browser import BrowserSession
+from src.circuit import BREAKERS
 from src.config import load_config, save_config
-from src.constants import SOURCE_PRIORITY
+from src.constants import (
+    DEFAULT_BREAKER_COOLDOWN_SECONDS,
+    DEFAULT_BREAKER_FAILURE_THRESHOLD,
+    DEFAULT_BREAKER_MAX_COOLDOWN_SECONDS,
+    DEFAULT_DOWNLOAD_DELAY_SECONDS,
+    DEFAULT_JOURNAL_PATH,
+    DEFAULT_LEASE_DATABASE,
+    DEFAULT_LEASE_SECONDS,
+    DEFAULT_LINK_CACHE_PATH,
+    DEFAULT_LINK_CACHE_TTL_HOURS,
+    DEFAULT_MIN_FREE_DISK_MB,
+    DEFAULT_PREFETCH_TTL_MINUTES,
+    DEFAULT_SERIES_DELAY_SECONDS,
+    PARTIAL_DIRECTORY,
+    PREFETCH_LOOKAHEAD_EPISODES,
+    PRIORITY_PREEMPT_MARGIN,
+)
+from src.control import CONTROL
+from src.disk_space import DISK, Reservation, partial_bytes
+from src.download_index import DownloadIndex
+from src.download_queue import DownloadQueue, QueuedJob, episode_priority, run_in_background
 from src.downloaders import get_downloader
-from src.providers import get_provider
-from src.providers.types import Episode
+from src.downloaders.types import RemoteFile
+from src.journal import Job, Journal
+from src.leases import LEASES
+from src.link_cache import LinkCache
+from src.metrics import BROWSER_RSS_PEAK_BYTES, CYCLE_DURATION
+from src.postprocess import POSTPROCESS, EpisodeFile
+from src.prefetch import Prefetcher
+from src.providers import PROVIDER_REGISTRY, find_provider_class
+from src.providers.base import BaseProvider, ChallengeError, is_host_fault
+from src.providers.types import Episode, EpisodeIndex, source_priority
+from src.tracing import TRACER, span
 from src.utils import log
 
 
-def run_check() -> int:
-    """Runs a single check cycle for all series."""
+def run_check(series_names: Collection[str] | None = None, session: BrowserSession | None = None) -> int:
+    """
+    Runs a single check cycle.
+
+    Args:
+        series_names: Only check the series with these names; None checks all of them.
+        session: A browser session kept warm across cycles. Without one, a browser is
+            launched for this cycle only.
+
+    Returns:
+        The check interval in minutes.
+    """
     config_data = load_config()
     if not config_data:
         log("❌ Файл config.yaml не найден. Пропускаю проверку.")
@@ -26,206 +65,763 @@ def run_check() -> int:
 
     settings = config_data.get("settings", {})
     download_dir = settings.get("download_directory", "downloads")
-    yt_dlp_args = settings.get("yt-dlp_args", [])
-    download_retries = settings.get("download_retries", 3)
-    download_retry_delay = settings.get("download_retry_delay", 5)
-    cookie_settings = settings.get("cookies", {"enable": False})
-    pixeldrain_api_key = settings.get("pixeldrain_api_key")
-    browser_executable_path = settings.get("browser_executable_path")
-    series_list = config_data.get("series", [])
+    all_series = config_data.get("series", [])
+    series_list = [s for s in all_series if series_names is None or s["name"] in series_names]
+    breaker_settings = settings.get("circuit_breaker", {})
+    BREAKERS.configure(
+        breaker_settings.get("failure_threshold", DEFAULT_BREAKER_FAILURE_THRESHOLD),
+        breaker_settings.get("cooldown_seconds", DEFAULT_BREAKER_COOLDOWN_SECONDS),
+        breaker_settings.get("max_cooldown_seconds", DEFAULT_BREAKER_MAX_COOLDOWN_SECONDS),
+    )
+    DISK.configure(settings.get("min_free_disk_mb", DEFAULT_MIN_FREE_DISK_MB) * 1024 * 1024)
+    POSTPROCESS.configure(settings.get("postprocess", {}))
 
     if not series_list:
         log("⚠️ В конфиге не найдено ни одного сериала для отслеживания.")
         return settings.get("check_interval_minutes", 10)
 
-    with sync_playwright() as p:
-        if browser_executable_path:
-            browser = p.chromium.launch(executable_path=browser_executable_path)
-        else:
-            browser = p.chromium.launch(channel="chrome")
-        log("---", top=1)
-        for i, series in enumerate(series_list):
-            if i > 0:
-                delay = random.randint(10, 25)
-                log(f"--- Пауза {delay} секунд перед следующим сериалом ---", indent=1)
+    _configure_leases(settings)
+    if LEASES.enabled:
+        # The share is claimed over the whole watchlist, even when only some series are checked
+        shard = set(LEASES.claim_share("series", [s["name"] for s in all_series]))
+        log(f"🤝 Узел {LEASES.node}: сериалов в работе {len(shard)} из {len(all_series)}, остальные у других узлов.")
+        series_list = [s for s in series_list if s["name"] in shard]
+        if not series_list:
+            return settings.get("check_interval_minutes", 10)
+
+    # Opened only for a cycle with work to do; opening the journal compacts its file
+    link_cache = _open_link_cache(settings)
+    download_index = DownloadIndex(download_dir)
+    journal = _open_journal(settings)
+    own_session = session is None
+    session = session or BrowserSession()
+    priority_settings = settings.get("download_priority", {})
+    cycle = _Cycle(
+        config_data,
+        settings,
+        download_dir,
+        session,
+        DownloadQueue(PRIORITY_PREEMPT_MARGIN if priority_settings.get("preempt", True) else None),
+        link_cache,
+        download_index,
+        journal,
+    )
+    pending_series = iter(series_list)
+    scanned = 0
+
+    def scan_next() -> bool:
+        """Scans the next series and queues its new episodes; False once every series was scanned."""
+        nonlocal scanned
+        series = next(pending_series, None)
+        if series is None:
+            return False
+        if scanned > 0:
+            delay = random.randint(*settings.get("series_delay_seconds", DEFAULT_SERIES_DELAY_SECONDS))
+            log(f"--- Пауза {delay} секунд перед следующим сериалом ---", indent=1)
+            with span("sleep.between_series", category="sleep"):
                 time.sleep(delay)
+        scanned += 1
 
-            log(f"--- Работа с сериалом: {series['name']} ---", top=1)
-            _process_single_series(
-                series,
-                config_data,
-                settings,
-                download_dir,
-                yt_dlp_args,
-                download_retries,
-                download_retry_delay,
-                cookie_settings,
-                pixeldrain_api_key,
-                browser,
-            )
-        browser.close()
+        # No page is in use between scans, so an overgrown browser can be recycled
+        session.maintain(settings)
+        log(f"--- Работа с сериалом: {series['name']} ---", top=1)
+        with span("series", series=series["name"]):
+            try:
+                _scan_series(cycle, series)
+            except Exception as e:
+                # A download may be running meanwhile; one broken series page must not stop it
+                log(f"❌ Ошибка при проверке сериала {series['name']}: {e}", indent=1)
+        if link_cache is not None:
+            link_cache.save()
+        download_index.save()
+        return True
+
+    TRACER.start_cycle()
+    try:
+        with CYCLE_DURATION.time(), span("cycle"):
+            with span("browser.launch"):
+                session.browser(settings)
+            log("---", top=1)
+            # Downloads run highest priority first; the next series are scanned while they run
+            while True:
+                job = cycle.queue.pop()
+                if job is None:
+                    if not scan_next():
+                        break
+                    continue
+                try:
+                    _download_queued(cycle, job, scan_next)
+                finally:
+                    cycle.queue.finish(job)
+                if link_cache is not None:
+                    link_cache.save()
+                download_index.save()
+            if journal is not None:
+                # Episodes postponed because their host was down get another chance
+                # now that the rest of the cycle gave it time to recover
+                _finish_journaled_jobs(journal, config_data, deferred_only=True)
+            session.usage()
+            peak = session.take_peak()
+            if peak.rss_bytes is not None:
+                BROWSER_RSS_PEAK_BYTES.set(peak.rss_bytes)
+            log(f"🧠 Пик браузера за цикл: {peak.summary()}", top=1)
+    finally:
+        CONTROL.set_queue(None, [])
+        if own_session:
+            session.close()
+        # Written for a failed cycle too, whose timeline shows where it stopped
+        TRACER.finish_cycle()
 
     return settings.get("check_interval_minutes", 10)
 
 
 def _process_episodes(
-    episodes: Sequence[Episode],
+    episodes: EpisodeIndex,
     last_downloaded: int,
+    is_owned: Callable[[Episode], bool] | None = None,
 ) -> dict[int, list[Episode]]:
-    """Filters for new episodes, groups them, and sorts by source priority."""
-    new_episodes = [e for e in episodes if e.episode > last_downloaded]
-
-    if not new_episodes:
-        return {}
-
-    episodes_by_num = {k: list(g) for k, g in itertools.groupby(new_episodes, key=lambda x: x.episode)}
-
-    for num, links in episodes_by_num.items():
-        episodes_by_num[num] = sorted(links, key=lambda x: SOURCE_PRIORITY.get(x.source, 999))
-
+    """Picks the new episodes not already on disk, each with its links in source priority order."""
+    episodes_by_num: dict[int, list[Episode]] = {}
+    for (_, num), links in episodes.groups():
+        if num <= last_downloaded or (is_owned and is_owned(links[0])):
+            continue
+        if num in episodes_by_num:
+            # The same episode number in another season; the counter does not tell them apart
+            episodes_by_num[num] = sorted([*episodes_by_num[num], *links], key=source_priority)
+        else:
+            episodes_by_num[num] = list(links)
     return episodes_by_num
 
 
-def _process_single_series(
-    series: dict[str, Any],
-    config_data: dict[str, Any],
-    settings: dict[str, Any],
-    download_dir: str,
-    yt_dlp_args: list[str],
-    download_retries: int,
-    download_retry_delay: int,
-    cookie_settings: dict[str, Any],
-    pixeldrain_api_key: str,
-    browser: Browser,
-) -> None:
-    """Processes a single series, checking for new episodes and initiating downloads."""
-    context = browser.new_context(
-        user_agent=(
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/125.0.0.0 Safari/537.36"
-        ),
-        viewport={"width": 1920, "height": 1080},
-    )
-    stealth = Stealth()
-    stealth.apply_stealth_sync(context)
-
+@dataclass
+class _Cycle:
+    """What the scans and downloads of one check cycle share."""
+
+    config_data: dict[str, Any]
+    settings: dict[str, Any]
+    download_dir: str
+    session: BrowserSession
+    queue: "DownloadQueue[_QueuedEpisode]"
+    link_cache: LinkCache | None
+    download_index: DownloadIndex
+    journal: Journal | None
+
+
+@dataclass
+class _SeriesScan:
+    """A scanned series: its provider and what is known about its new episodes' links."""
+
+    series: dict[str, Any]
+    provider_class: type[BaseProvider]
+    provider_name: str
+    # Initial link -> final download URL, for the links resolved so far
+    resolved: dict[str, str]
+    remote_files: dict[str, RemoteFile]
+    # Link of a new episode -> its episode number
+    episode_of: dict[str, int]
+    # The new episodes not downloaded yet; the series counter never passes one of them
+    outstanding: set[int]
+    prefetcher: Prefetcher | None = None
+
+
+@dataclass
+class _QueuedEpisode:
+    """A new episode waiting in the download queue, with its links best source first."""
+
+    scan: _SeriesScan
+    episode: int
+    links: list[Episode]
+
+
+def _scan_series(cycle: _Cycle, series: dict[str, Any]) -> None:
+    """Checks a series for new episodes, resolves what it can while the page is loaded and queues them."""
+    settings = cycle.settings
+    session = cycle.session
+    link_cache = cycle.link_cache
+    journal = cycle.journal
     series_url = series["url"]
 
-    if cookie_settings.get("enable", False):
-        try:
-            domain: str | None = (cast(Any, urlparse(series_url))).netloc
-            if not domain:
-                log("⚠️ Не удалось извлечь домен из URL серии. Пропускаю загрузку cookies.", indent=1)
-            else:
-                browser_name = cookie_settings.get("browser", "firefox")
-                log(f"🍪 Загрузка cookies для домена '{domain}' из {browser_name}...", indent=1)
-                cj = getattr(browser_cookie3, browser_name)(domain_name=domain)
-                context.add_cookies(
-                    [
-                        {
-                            "name": cookie.name,
-                            "value": cookie.value,
-                            "domain": cookie.domain,
-                            "path": cookie.path,
-                        }
-                        for cookie in cj
-                    ]
-                )
-                log("✅ Cookies успешно загружены.", indent=1)
-        except Exception as e:
-            log(f"❌ Не удалось загрузить cookies: {e}", indent=1)
+    log(f"🔍 Автоматическое определение провайдера для URL: {series_url}", indent=1)
+    provider_class = find_provider_class(series_url)
+    if provider_class is None:
+        log(f"❌ Ошибка при получении информации о сериях: No suitable provider found for URL: {series_url}", indent=1)
+        return
+    if not BREAKERS.allow(series_url):
+        log("⏳ Сайт сериала временно недоступен. Сериал отложен до следующей проверки.", indent=1)
+        return
 
-    page = context.new_page()
+    provider, blocker = session.provider(provider_class, series_url, settings)
 
     try:
-        log(f"🔍 Автоматическое определение провайдера для URL: {series_url}", indent=1)
-        provider = get_provider(series_url, page)
-
         log(f"📄 Загрузка информации о сериях с {series_url}", indent=1)
-        all_episodes: Sequence[Episode] = provider.get_series_episodes(series_url)
+        try:
+            all_episodes = provider.fetch_series_episodes(series_url)
+        except ChallengeError:
+            log("🧩 Сайт показал проверку на бота. Сбрасываю сохраненное состояние браузера...", indent=1)
+            provider, blocker = session.provider(provider_class, series_url, settings, fresh=True)
+            all_episodes = provider.fetch_series_episodes(series_url)
 
     except ValueError as e:
         log(f"❌ Ошибка при получении информации о сериях: {e}", indent=1)
-        context.close()
+        BREAKERS.failure(series_url)
         return
+    BREAKERS.success(series_url)
+    session.save_state(provider, series_url, settings)
+
+    if blocker is not None:
+        log(f"🧹 Страница сериала загружена в облегченном режиме: {blocker.take_stats().summary()}", indent=1)
 
     if not all_episodes:
         log(
             "⚠️ На странице не найдено ни одной серии с поддерживаемым источником.",
             indent=1,
         )
-        context.close()
         return
 
     last_downloaded = series.get("series", 0)
-    episodes_to_download = _process_episodes(all_episodes, last_downloaded)
+    cycle.download_index.refresh(series["name"])
+    is_owned = partial(cycle.download_index.owns, series["name"])
+
+    episodes_to_download = _process_episodes(all_episodes, last_downloaded, is_owned)
 
     if not episodes_to_download:
         log("✅ Новых серий не найдено.", indent=1)
-        context.close()
         return
 
-    download_delay = random.randint(5, 15)
+    now = time.time()
+    queued_at = dict.fromkeys(episodes_to_download, now)
+    if journal is not None:
+        for num, links in episodes_to_download.items():
+            job = Job(series["name"], links[0].season, num, provider.name, links, queued_at=now)
+            journal.add(job)
+            # An episode left over from an earlier cycle keeps its place in the backlog
+            queued_at[num] = job.queued_at
+
+    download_delay = random.randint(*settings.get("download_delay_seconds", DEFAULT_DOWNLOAD_DELAY_SECONDS))
     log(
         f"✨ Найдено {len(episodes_to_download)} новых серий для скачивания."
         f" Пауза {download_delay} секунд перед началом обработки...",
         indent=1,
     )
-    time.sleep(download_delay)
+    with span("sleep.before_downloads", category="sleep"):
+        time.sleep(download_delay)
+
+    # Resolve the primary link of every episode while the series page is still loaded,
+    # skipping the links whose final URL is cached and still alive
+    primaries = [links[0] for links in episodes_to_download.values() if links]
+    resolved: dict[str, str] = {}
+    for episode_data in primaries:
+        cached_url = _cached_download_url(link_cache, provider.name, episode_data)
+        if cached_url:
+            resolved[episode_data.link] = cached_url
+    missing = [episode_data.link for episode_data in primaries if episode_data.link not in resolved]
+    # Providers without a cheap batch path resolve each link only when its episode is due
+    if missing and provider_class.capabilities.batch_resolve:
+        fresh = provider.resolve_download_urls(missing)
+        if link_cache is not None:
+            for link, url in fresh.items():
+                link_cache.put(LinkCache.key(provider.name, link), url)
+        resolved.update(fresh)
+    if journal is not None:
+        for episode_data in primaries:
+            if episode_data.link in resolved:
+                journal.resolved(series["name"], episode_data.episode, episode_data.link, resolved[episode_data.link])
+    log(
+        f"🔗 Заранее получено финальных ссылок: {len(resolved)} из {len(primaries)}"
+        f" (из кэша: {len(primaries) - len(missing)})",
+        indent=1,
+    )
 
-    for episode_num, links in episodes_to_download.items():
-        download_successful = False
-        for episode_data in links:
-            try:
+    # Learn the size and availability of every resolved file before committing bandwidth
+    remote_files = _preflight(primaries, resolved)
+    episodes_to_download = _order_episodes(
+        episodes_to_download, resolved, remote_files, settings.get("download_order", "episode")
+    )
+
+    scan = _SeriesScan(
+        series,
+        provider_class,
+        provider.name,
+        resolved,
+        remote_files,
+        {episode_data.link: num for num, links in episodes_to_download.items() for episode_data in links},
+        set(episodes_to_download),
+    )
+    scan.prefetcher = _open_prefetcher(settings, provider, series_url, partial(_remember, cycle, scan))
+    # The queue is ordered by priority; `download_order` decides between equal priorities
+    latest = max(num for (_, num), _ in all_episodes.groups())
+    for num, links in episodes_to_download.items():
+        priority = episode_priority(series.get("priority", 0), latest - num, now - queued_at[num])
+        cycle.queue.push(_QueuedEpisode(scan, num, links), priority)
+
+
+def _remember(cycle: _Cycle, scan: _SeriesScan, link: str, url: str) -> None:
+    """Stores a resolved link in the link cache and the journal."""
+    if cycle.link_cache is not None:
+        cycle.link_cache.put(LinkCache.key(scan.provider_name, link), url)
+    if cycle.journal is not None:
+        cycle.journal.resolved(scan.series["name"], scan.episode_of[link], link, url)
+
+
+def _download_queued(cycle: _Cycle, job: QueuedJob["_QueuedEpisode"], scan_next: Callable[[], bool]) -> None:
+    """
+    Downloads a queued episode from the first of its links that works.
+
+    The download runs on a worker thread; meanwhile the monitor thread resolves the
+    links needed next and scans the next series with `scan_next`. An episode whose
+    transfer was paused for one of higher priority goes back into the queue.
+    """
+    settings = cycle.settings
+    scan, episode_num, links = job.item.scan, job.item.episode, job.item.links
+    series_name = scan.series["name"]
+    series_url = scan.series["url"]
+    resolved, remote_files, prefetcher = scan.resolved, scan.remote_files, scan.prefetcher
+    job_lease = f"job:{Journal.key(series_name, episode_num)}"
+    if not LEASES.claim(job_lease):
+        # Another instance still finishes it from its journal
+        log(f"🤝 {series_name}, серия {episode_num} уже скачивается другим узлом. Пропускаю.", indent=1)
+        return
+
+    queued = [item for item in cycle.queue.items() if item.scan is scan]
+    CONTROL.set_queue(series_name, [episode_num] + [item.episode for item in queued])
+    CONTROL.wait_while_paused()
+    log(f"--- {series_name}, серия {episode_num} (приоритет {job.priority:.0f}) ---", top=1)
+    download_successful = False
+    deferred = held = False
+    if prefetcher is not None:
+        # This episode's fallbacks, then the primaries of the series' episodes after it
+        upcoming = links[1:] + [item.links[0] for item in queued[:PREFETCH_LOOKAHEAD_EPISODES]]
+        prefetcher.queue(episode_data.link for episode_data in upcoming if episode_data.link not in resolved)
+    for episode_data in links:
+        try:
+            log(
+                f"🔗 Серия {episode_data.episode} ({episode_data.source}): обработка ссылки {episode_data.link}",
+                indent=2,
+            )
+            final_url = (
+                resolved.get(episode_data.link)
+                or (prefetcher.take(episode_data.link) if prefetcher is not None else None)
+                or _cached_download_url(cycle.link_cache, scan.provider_name, episode_data)
+            )
+            if not final_url:
+                if not BREAKERS.allow(series_url):
+                    deferred = True
+                    continue
+                # The pooled page may have been recycled, or moved on to another series, since the scan
+                provider, _ = cycle.session.provider(scan.provider_class, series_url, settings)
+                try:
+                    provider.show_series_page(series_url)
+                    final_url = provider.resolve_download_url(episode_data.link)
+                except Exception as e:
+                    # A link that cannot be resolved says nothing about the provider's host
+                    if is_host_fault(e):
+                        BREAKERS.failure(series_url)
+                    else:
+                        BREAKERS.success(series_url)
+                    raise
+                _remember(cycle, scan, episode_data.link, final_url)
+            log(f"➡️ Финальная ссылка: {final_url}", indent=3)
+            if not BREAKERS.allow(final_url):
+                log("⏳ Хост временно недоступен. Пробую следующий источник...", indent=3)
+                deferred = True
+                continue
+
+            remote_file = remote_files.get(final_url)
+            reservation = _reserve_space(cycle.download_dir, series_name, episode_data, remote_file)
+            if reservation is None:
+                held = True
+                continue
+
+            download = partial(
+                _download_episode,
+                episode_data,
+                url=final_url,
+                series_name=series_name,
+                season=episode_data.season,
+                episode=episode_data.episode,
+                output_dir=cycle.download_dir,
+                yt_dlp_args=settings.get("yt-dlp_args", []),
+                retries=settings.get("download_retries", 3),
+                retry_delay=settings.get("download_retry_delay", 5),
+                api_key=settings.get("pixeldrain_api_key"),
+                remote_file=remote_file,
+                preempted=job.preempted,
+            )
+            with reservation:
+                if prefetcher is not None:
+                    download_successful = prefetcher.run_while(download, idle=scan_next)
+                else:
+                    download_successful = run_in_background(download, scan_next)
+
+            if download_successful:
+                scan.outstanding.discard(episode_num)
+                with span("finalize", episode=episode_data.episode):
+                    downloaded = partial(_is_downloaded, cycle.download_index, series_name, episode_data.season)
+                    if not _save_last_episode(series_name, episode_num, scan.outstanding, downloaded):
+                        continue
+                if cycle.journal is not None:
+                    cycle.journal.done(series_name, episode_data.episode)
+                _post_process(cycle.download_index, cycle.download_dir, series_name, episode_data)
+                break  # Move to the next episode
+            elif job.preempted.is_set():
+                break
+            else:
+                deferred = deferred or not BREAKERS.allow(final_url)
                 log(
-                    f"🔗 Серия {episode_data.episode} ({episode_data.source}): обработка ссылки {episode_data.link}",
-                    indent=2,
+                    f"⚠️ Не удалось скачать с {episode_data.source}. Пробую следующий источник...",
+                    indent=3,
                 )
-                final_url = provider.get_download_url(episode_data.link)
-                log(f"➡️ Финальная ссылка: {final_url}", indent=3)
 
-                downloader = get_downloader(episode_data.source)
-                download_successful = downloader.download(
+        except Exception as e:
+            log(
+                f"❌ Ошибка при обработке серии {episode_data.episode} с источника {episode_data.source}: {e}",
+                indent=2,
+            )
+    LEASES.release(job_lease)
+    if not download_successful and job.preempted.is_set():
+        log(f"⏸️ Серия {episode_num} возвращена в очередь: появилась более важная серия.", indent=1)
+        cycle.queue.requeue(job)
+        return
+    if not download_successful and (deferred or held):
+        if held:
+            log(f"💾 Серия {episode_num} отложена: не хватает места на диске. Продолжаю со следующей.", indent=1)
+        else:
+            log(f"⏳ Серия {episode_num} отложена: ее хосты временно недоступны.", indent=1)
+        if cycle.journal is not None:
+            cycle.journal.defer(series_name, episode_num)
+    elif not download_successful:
+        log(f"❌ Не удалось скачать серию {episode_num} со всех источников.", indent=1)
+    CONTROL.episode_done(episode_num)
+
+
+def resume_pending_jobs() -> None:
+    """
+    Finishes the downloads an interrupted run left in the job journal.
+
+    Jobs whose episode is already counted or on disk are dropped. The others are
+    downloaded from the links that were resolved before the interruption, or that the
+    provider resolves over plain HTTP, without opening a browser; a job with no such
+    link is left to the next check cycle, which queues it again.
+    """
+    config_data = load_config()
+    if not config_data:
+        return
+    journal = _open_journal(config_data.get("settings", {}))
+    if journal is None or not journal.pending():
+        return
+    log(f"📒 В журнале найдено незавершенных заданий: {len(journal.pending())}. Продолжаю скачивание...", top=1)
+    _finish_journaled_jobs(journal, config_data)
+
+
+def _finish_journaled_jobs(journal: Journal, config_data: dict[str, Any], deferred_only: bool = False) -> None:
+    """
+    Downloads pending journal jobs from their resolved links.
+
+    Args:
+        journal: The job journal.
+        config_data: The loaded config.
+        deferred_only: Only take the jobs that were postponed because their hosts
+            were unavailable.
+    """
+    settings = config_data.get("settings", {})
+    download_dir = settings.get("download_directory", "downloads")
+    download_index = DownloadIndex(download_dir)
+    counters = {s["name"]: s.get("series", 0) for s in config_data.get("series", [])}
+    DISK.configure(settings.get("min_free_disk_mb", DEFAULT_MIN_FREE_DISK_MB) * 1024 * 1024)
+    POSTPROCESS.configure(settings.get("postprocess", {}))
+    _configure_leases(settings)
+
+    for job in journal.pending():
+        if deferred_only and not job.deferred:
+            continue
+        # The counter never passes an unfinished episode, so everything up to it is done
+        if job.series not in counters or job.episode <= counters[job.series]:
+            journal.done(job.series, job.episode)
+            continue
+        download_index.refresh(job.series)
+        if download_index.get(job.series, job.season, job.episode) is not None:
+            journal.done(job.series, job.episode)
+            continue
+
+        CONTROL.wait_while_paused()
+        if not LEASES.claim(f"job:{job.key}"):
+            continue
+        try:
+            _finish_journaled_job(job, journal, settings, download_index)
+        finally:
+            LEASES.release(f"job:{job.key}")
+    download_index.save()
+
+
+def _finish_journaled_job(job: Job, journal: Journal, settings: dict[str, Any], download_index: DownloadIndex) -> None:
+    """Downloads one pending journal job from its resolved links."""
+    download_dir = download_index.download_dir
+    attempted = blocked = False
+    provider_class = PROVIDER_REGISTRY.by_name(job.provider)
+    for episode_data in job.links:
+        final_url = job.resolved.get(episode_data.link)
+        if not final_url and provider_class is not None and provider_class.capabilities.http_resolve:
+            final_url = _resolve_over_http(provider_class, episode_data.link)
+            if final_url:
+                journal.resolved(job.series, job.episode, episode_data.link, final_url)
+        if not final_url:
+            continue
+        if not BREAKERS.allow(final_url):
+            blocked = True
+            continue
+        reservation = _reserve_space(download_dir, job.series, episode_data, None)
+        if reservation is None:
+            blocked = True
+            continue
+        attempted = True
+        log(f"🔗 {job.series}, серия {job.episode} ({episode_data.source}): {final_url}", indent=2)
+        try:
+            with reservation:
+                download_successful = _download_episode(
+                    episode_data,
                     url=final_url,
-                    series_name=series["name"],
-                    season=episode_data.season,
-                    episode=episode_data.episode,
+                    series_name=job.series,
+                    season=job.season,
+                    episode=job.episode,
                     output_dir=download_dir,
-                    yt_dlp_args=yt_dlp_args,
-                    retries=download_retries,
-                    retry_delay=download_retry_delay,
-                    api_key=pixeldrain_api_key,
+                    yt_dlp_args=settings.get("yt-dlp_args", []),
+                    retries=settings.get("download_retries", 3),
+                    retry_delay=settings.get("download_retry_delay", 5),
+                    api_key=settings.get("pixeldrain_api_key"),
                 )
+        except Exception as e:
+            log(f"❌ Ошибка при продолжении серии {job.episode} с источника {episode_data.source}: {e}", indent=2)
+            continue
+        # Other unfinished jobs of the series hold the counter back, like the queued episodes of a cycle
+        outstanding = {other.episode for other in journal.pending() if other.series == job.series}
+        outstanding.discard(job.episode)
+        downloaded = partial(_is_downloaded, download_index, job.series, job.season)
+        if download_successful and _save_last_episode(job.series, job.episode, outstanding, downloaded):
+            journal.done(job.series, job.episode)
+            _post_process(download_index, download_dir, job.series, episode_data)
+            break
+        blocked = blocked or not BREAKERS.allow(final_url)
+    else:
+        if attempted and not blocked:
+            # Every host answered and failed; the next cycle queues the episode again if it is still new
+            journal.done(job.series, job.episode)
+
+
+def _post_process(download_index: DownloadIndex, download_dir: str, series_name: str, episode: Episode) -> None:
+    """
+    Hands a finished episode to the post-processing workers, if any are configured.
+
+    The episode is downloaded either way: an error here (e.g. a broken worker pool)
+    is logged and leaves the file as it is.
+    """
+    if not POSTPROCESS.enabled:
+        return
+    download_index.refresh(series_name)
+    indexed = download_index.get(series_name, episode.season, episode.episode)
+    if indexed is None:
+        return
+    path = os.path.join(download_dir, series_name, indexed.name)
+    try:
+        POSTPROCESS.submit(EpisodeFile(path, series_name, episode.season, episode.episode, download_dir))
+    except Exception as e:
+        log(f"❌ Не удалось передать {indexed.name} на постобработку: {e}", indent=3)
 
-                if download_successful:
-                    current_config = load_config()
-                    if current_config is None:
-                        log("❌ Не удалось загрузить конфиг для обновления.", indent=1)
-                        continue
-                    original_series_index = next(
-                        (idx for idx, s in enumerate(current_config["series"]) if s["name"] == series["name"]),
-                        None,
-                    )
-                    if original_series_index is not None:
-                        current_config["series"][original_series_index]["series"] = episode_data.episode
-                        save_config(current_config)
-                        log(
-                            f"💾 Обновлен конфиг: последняя серия {episode_data.episode}.",
-                            indent=3,
-                        )
-                    break  # Move to the next episode
-                else:
-                    log(
-                        f"⚠️ Не удалось скачать с {episode_data.source}. Пробую следующий источник...",
-                        indent=3,
-                    )
 
-            except Exception as e:
-                log(
-                    f"❌ Ошибка при обработке серии {episode_data.episode} с источника {episode_data.source}: {e}",
-                    indent=2,
-                )
-        if not download_successful:
-            log(f"❌ Не удалось скачать серию {episode_num} со всех источников.", indent=1)
+def _resolve_over_http(provider_class: type[BaseProvider], link: str) -> str | None:
+    """Resolves a provider link by following its HTTP redirects, without a browser."""
+    import requests
 
-    context.close()
+    from src.providers.redirects import follow_redirects
+
+    if not BREAKERS.allow(link):
+        return None
+    own_hosts = provider_class.domains + tuple(filter(None, [urlparse(link).hostname]))
+    try:
+        with requests.Session() as http:
+            return follow_redirects(http, link, own_hosts)
+    except requests.exceptions.RequestException as e:
+        if is_host_fault(e):
+            BREAKERS.failure(link)
+        return None
+
+
+def _reserve_space(
+    download_dir: str, series_name: str, episode_data: Episode, remote_file: RemoteFile | None
+) -> Reservation | None:
+    """Reserves disk space for an episode's transfer, logging when it does not fit."""
+    partial_dir = os.path.join(download_dir, PARTIAL_DIRECTORY)
+    base_filename = f"{series_name} - S{episode_data.season:02d}E{episode_data.episode:02d}"
+    size = remote_file.size if remote_file is not None else 0
+    reservation = DISK.reserve(
+        size,
+        (partial_dir, os.path.join(download_dir, series_name)),
+        present=partial_bytes(partial_dir, base_filename),
+    )
+    if reservation is None:
+        log(
+            f"💾 Недостаточно места на диске для {episode_data.source} ({size / 1024 / 1024:.0f} MB)."
+            " Пробую следующий источник...",
+            indent=3,
+        )
+    return reservation
+
+
+def _download_episode(episode_data: Episode, **kwargs: Any) -> bool:
+    """Downloads an episode link with the downloader of its source."""
+    with span("download", source=episode_data.source, episode=episode_data.episode):
+        return get_downloader(episode_data.source).download(**kwargs)
+
+
+def _open_prefetcher(
+    settings: dict[str, Any], provider: BaseProvider, series_url: str, on_resolved: Callable[[str, str], None]
+) -> Prefetcher | None:
+    """Creates the link prefetcher configured in `settings.prefetch`, if enabled."""
+    prefetch_settings = settings.get("prefetch", {})
+    if not prefetch_settings.get("enable", True):
+        return None
+    ttl_seconds = prefetch_settings.get("ttl_minutes", DEFAULT_PREFETCH_TTL_MINUTES) * 60
+    return Prefetcher(provider, series_url, ttl_seconds, on_resolved)
+
+
+def _configure_leases(settings: dict[str, Any]) -> None:
+    """Opens the lease store shared with other instances, if `settings.cluster` is enabled."""
+    cluster = settings.get("cluster", {})
+    LEASES.configure(
+        cluster.get("database", DEFAULT_LEASE_DATABASE) if cluster.get("enable", False) else None,
+        cluster.get("node_id", ""),
+        cluster.get("lease_seconds", DEFAULT_LEASE_SECONDS),
+    )
+
+
+def _open_journal(settings: dict[str, Any]) -> Journal | None:
+    """Opens the job journal configured in `settings.journal`, if enabled."""
+    journal_settings = settings.get("journal", {})
+    if not journal_settings.get("enable", True):
+        return None
+    return Journal(journal_settings.get("path", DEFAULT_JOURNAL_PATH))
+
+
+def _open_link_cache(settings: dict[str, Any]) -> LinkCache | None:
+    """Opens the cache of resolved links configured in `settings.link_cache`, if enabled."""
+    cache_settings = settings.get("link_cache", {})
+    if not cache_settings.get("enable", True):
+        return None
+    return LinkCache(
+        cache_settings.get("path", DEFAULT_LINK_CACHE_PATH),
+        cache_settings.get("ttl_hours", DEFAULT_LINK_CACHE_TTL_HOURS) * 3600,
+    )
+
+
+def _cached_download_url(link_cache: LinkCache | None, provider_name: str, episode: Episode) -> str | None:
+    """Returns the cached final URL of an episode link, unless it expired or its file is gone."""
+    if link_cache is None:
+        return None
+    key = LinkCache.key(provider_name, episode.link)
+    url = link_cache.get(key)
+    if url is None:
+        return None
+    if get_downloader(episode.source).check_link(url) is False:
+        link_cache.discard(key)
+        return None
+    return url
+
+
+def _preflight(episodes: Sequence[Episode], resolved: dict[str, str]) -> dict[str, RemoteFile]:
+    """Looks up the metadata of the resolved files, in one concurrent batch per source."""
+    urls_by_source: dict[str, list[str]] = {}
+    for episode in episodes:
+        url = resolved.get(episode.link)
+        if url:
+            urls_by_source.setdefault(episode.source, []).append(url)
+
+    remote_files: dict[str, RemoteFile] = {}
+    for source, urls in urls_by_source.items():
+        try:
+            remote_files.update(get_downloader(source).preflight(urls))
+        except ValueError:
+            continue
+    return remote_files
+
+
+def _order_episodes(
+    episodes_to_download: dict[int, list[Episode]],
+    resolved: dict[str, str],
+    remote_files: dict[str, RemoteFile],
+    download_order: str,
+) -> dict[int, list[Episode]]:
+    """
+    Orders the new episodes of a series for the queue, which keeps this order between equal priorities.
+
+    An episode whose primary file is reported unavailable tries its other sources
+    first. With `download_order: smallest`, episodes of known size go smallest
+    first; otherwise they stay in episode order.
+    """
+    ordered: dict[int, list[Episode]] = {}
+    for num, links in episodes_to_download.items():
+        primary_file = remote_files.get(resolved.get(links[0].link, ""))
+        if primary_file is not None and not primary_file.available and len(links) > 1:
+            links = links[1:] + links[:1]
+        ordered[num] = links
+    if download_order == "smallest":
+        ordered = dict(sorted(ordered.items(), key=lambda item: _queued_size(item[1][0], resolved, remote_files)))
+    return ordered
+
+
+def _queued_size(episode: Episode, resolved: dict[str, str], remote_files: dict[str, RemoteFile]) -> float:
+    """The known size of an episode's file; unknown sizes sort last."""
+    remote_file = remote_files.get(resolved.get(episode.link, ""))
+    return remote_file.size if remote_file is not None and remote_file.size else float("inf")
+
+
+def _is_downloaded(download_index: DownloadIndex, series_name: str, season: int, episode: int) -> bool:
+    """Checks whether an episode of a series is on disk, re-listing the series folder if it changed."""
+    download_index.refresh(series_name)
+    return download_index.get(series_name, season, episode) is not None
+
+
+def _save_last_episode(
+    series_name: str,
+    episode: int,
+    outstanding: Collection[int] = (),
+    is_downloaded: Callable[[int], bool] | None = None,
+) -> bool:
+    """
+    Advances the counter of a series in the config file past a downloaded episode.
+
+    Episodes finish out of order (see `download_order` and the download priority),
+    but everything up to the counter is skipped for good. So the counter only moves
+    while no earlier episode is outstanding; until then a finished later episode is
+    known by the download index alone. Once it moves, it also passes the following
+    episodes that finished earlier.
+
+    Args:
+        series_name: The name of the series in the config.
+        episode: The downloaded episode.
+        outstanding: The episodes of the series still queued, failed or postponed.
+        is_downloaded: Checks whether an episode is on disk.
+
+    Returns:
+        False if the config could not be loaded.
+    """
+    # Instances sharing the config must not overwrite each other's counters
+    with LEASES.exclusive():
+        current_config = load_config()
+        if current_config is None:
+            log("❌ Не удалось загрузить конфиг для обновления.", indent=1)
+            return False
+        stored = next((s for s in current_config["series"] if s["name"] == series_name), None)
+        if stored is None:
+            return True
+        counter = stored.get("series", 0)
+        if episode <= counter:
+            return True
+        if any(counter < other < episode for other in outstanding):
+            log(f"💾 Серия {episode} скачана; счетчик останется на {counter}, пока не скачаны предыдущие.", indent=3)
+            return True
+        counter = episode
+        while is_downloaded is not None and counter + 1 not in outstanding and is_downloaded(counter + 1):
+            counter += 1
+        stored["series"] = counter
+        save_config(current_config)
+        log(f"💾 Обновлен конфиг: последняя серия {counter}.", indent=3)
+        return True
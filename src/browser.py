@@ -0,0 +1,431 @@
+"""Browser launch and context setup for scraping the providers."""
+
+import contextlib
+import threading
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Literal, cast
+from urllib.parse import urlparse
+
+from src.constants import (
+    BLOCKED_RESOURCE_TYPES,
+    BROWSER_USER_AGENT,
+    BROWSER_VIEWPORT,
+    DEFAULT_BROWSER_MAX_PAGES,
+    DEFAULT_BROWSER_RESTART_RSS_MB,
+    DEFAULT_CONTEXT_RECYCLE_RSS_MB,
+    DEFAULT_STORAGE_STATE_DIRECTORY,
+    DEFAULT_STORAGE_STATE_MAX_AGE_HOURS,
+)
+from src.metrics import (
+    BLOCKED_REQUESTS,
+    BROWSER_PAGES,
+    BROWSER_RECYCLES,
+    BROWSER_RESTARTS,
+    BROWSER_RSS_BYTES,
+    PAGE_BYTES,
+    STORAGE_STATE_CHALLENGES,
+)
+from src.process_memory import browser_rss_bytes
+from src.storage_state import StorageStateStore
+from src.utils import host_matches, log
+
+if TYPE_CHECKING:
+    from playwright.sync_api import Browser, BrowserContext, Playwright, Request, Response, Route
+    from playwright.sync_api._context_manager import PlaywrightContextManager
+
+    from src.providers.base import BaseProvider
+
+
+def launch_browser(playwright: "Playwright", settings: dict[str, Any]) -> "Browser":
+    """
+    Launches the browser used for scraping.
+
+    Args:
+        playwright: The running Playwright instance.
+        settings: The `settings` block of the config.
+
+    Returns:
+        The launched browser.
+    """
+    headless = settings.get("browser_headless", True)
+    executable_path = settings.get("browser_executable_path")
+    if executable_path:
+        return playwright.chromium.launch(executable_path=executable_path, headless=headless)
+    return playwright.chromium.launch(channel="chrome", headless=headless)
+
+
+@dataclass
+class BrowserUsage:
+    """Resources held by the browser at one sample."""
+
+    # Resident memory of the browser's processes, None where it cannot be measured
+    rss_bytes: int | None = None
+    pages: int = 0
+
+    def summary(self) -> str:
+        """A short human-readable summary for the log."""
+        memory = "?" if self.rss_bytes is None else f"{self.rss_bytes / 1024 / 1024:.0f}"
+        return f"{memory} MB, вкладок {self.pages}"
+
+
+def recycle_scope(usage: BrowserUsage, settings: dict[str, Any]) -> Literal["browser", "contexts"] | None:
+    """
+    Decides what the limits of `settings.browser_limits` require to be recycled.
+
+    Returns:
+        "browser" to relaunch the browser, "contexts" to close the pooled contexts,
+        or None if the browser is within its limits.
+    """
+    limits = settings.get("browser_limits", {})
+    if not limits.get("enable", True):
+        return None
+    mb = 1024 * 1024
+    if usage.rss_bytes is not None:
+        if usage.rss_bytes >= limits.get("restart_rss_mb", DEFAULT_BROWSER_RESTART_RSS_MB) * mb:
+            return "browser"
+        if usage.rss_bytes >= limits.get("context_rss_mb", DEFAULT_CONTEXT_RECYCLE_RSS_MB) * mb:
+            return "contexts"
+    if usage.pages > limits.get("max_pages", DEFAULT_BROWSER_MAX_PAGES):
+        return "contexts"
+    return None
+
+
+class BrowserSession:
+    """
+    Keeps one browser running across check cycles.
+
+    Playwright's sync API is bound to the thread that started it, so a session must
+    only be used from the monitor loop's thread.
+    """
+
+    def __init__(self) -> None:
+        self._manager: PlaywrightContextManager | None = None
+        self._playwright: Playwright | None = None
+        self._browser: Browser | None = None
+        # Provider class -> its provider instance and the resource blocker of its context
+        self._providers: dict[type[BaseProvider], tuple[BaseProvider, ResourceBlocker | None]] = {}
+        # Highest usage sampled since the last `take_peak`
+        self._peak = BrowserUsage()
+
+    def browser(self, settings: dict[str, Any]) -> "Browser":
+        """Returns the running browser, (re)launching it if needed."""
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+        # The pooled contexts went away with the old browser
+        self._providers.clear()
+        if self._playwright is None:
+            from playwright.sync_api import sync_playwright
+
+            self._manager = sync_playwright()
+            self._playwright = self._manager.start()
+        self._browser = launch_browser(self._playwright, settings)
+        BROWSER_RESTARTS.inc()
+        return self._browser
+
+    def provider(
+        self, provider_class: "type[BaseProvider]", series_url: str, settings: dict[str, Any], fresh: bool = False
+    ) -> "tuple[BaseProvider, ResourceBlocker | None]":
+        """
+        Returns an instance of a provider on a browser context pooled for it.
+
+        All series of a provider share one context and page, so cookies (a passed
+        challenge, an accepted consent banner) carry over from one series to the next.
+        The page shows whichever series was loaded last: before resolving links of a
+        series, call `BaseProvider.show_series_page` with its URL.
+        The context is set up (first-party host, imported cookies, the storage state
+        saved for the host) for the first series URL it serves.
+
+        Args:
+            provider_class: The provider class.
+            series_url: The URL of the series about to be processed.
+            settings: The `settings` block of the config.
+            fresh: Replace the pooled context with an empty one and forget the host's
+                saved storage state, e.g. after it led to a challenge page.
+
+        Returns:
+            The provider and its context's resource blocker, or None if blocking is disabled.
+        """
+        cached = self._providers.get(provider_class)
+        host = urlparse(series_url).hostname or ""
+        store = open_storage_states(settings)
+        if fresh:
+            STORAGE_STATE_CHALLENGES.inc(provider=provider_class.name)
+            if store is not None:
+                store.discard(host)
+            if cached is not None:
+                with contextlib.suppress(Exception):
+                    cached[0].page.context.close()
+        elif cached is not None and not cached[0].page.is_closed():
+            return cached
+        context, blocker = new_context(
+            self.browser(settings),
+            series_url,
+            settings,
+            provider_class.domains + provider_class.allowed_hosts,
+            provider_class.name,
+            store.load(host) if store is not None and not fresh else None,
+        )
+        cached = (provider_class(context.new_page()), blocker)
+        self._providers[provider_class] = cached
+        return cached
+
+    def save_state(self, provider: "BaseProvider", series_url: str, settings: dict[str, Any]) -> None:
+        """Saves the storage state of a provider's context after its series page loaded fine."""
+        store = open_storage_states(settings)
+        if store is None:
+            return
+        try:
+            state = provider.page.context.storage_state()
+        except Exception as e:
+            log(f"⚠️ Не удалось получить состояние браузера: {e}", indent=1)
+            return
+        store.save(urlparse(series_url).hostname or "", cast(dict[str, Any], state))
+
+    def usage(self) -> BrowserUsage:
+        """Samples the memory and open pages of the browser and raises the high-water mark."""
+        if self._browser is None or not self._browser.is_connected():
+            return BrowserUsage(0, 0)
+        usage = BrowserUsage(browser_rss_bytes(), sum(len(context.pages) for context in self._browser.contexts))
+        if usage.rss_bytes is not None:
+            BROWSER_RSS_BYTES.set(usage.rss_bytes)
+            self._peak.rss_bytes = max(self._peak.rss_bytes or 0, usage.rss_bytes)
+        BROWSER_PAGES.set(usage.pages)
+        self._peak.pages = max(self._peak.pages, usage.pages)
+        return usage
+
+    def take_peak(self) -> BrowserUsage:
+        """Returns the highest usage sampled since the last call and starts a new period."""
+        peak, self._peak = self._peak, BrowserUsage()
+        return peak
+
+    def maintain(self, settings: dict[str, Any]) -> None:
+        """
+        Recycles the browser when it outgrew the limits of `settings.browser_limits`.
+
+        Chromium's renderers keep growing over days of scraping, and pages left open
+        by popups or failed loads pile up. Above the context limits the pooled
+        contexts are closed, so each provider starts over on a new context with its
+        saved storage state; above the browser limit the browser is relaunched.
+        Pages outside the pool are closed on every call. Only call this between
+        jobs, when no page is in use.
+        """
+        if self._browser is None or not self._browser.is_connected():
+            return
+        usage = self.usage()
+        scope = recycle_scope(usage, settings)
+        if scope == "browser":
+            log(f"♻️ Браузер разросся ({usage.summary()}), перезапуск...", indent=1)
+            self._providers.clear()
+            with contextlib.suppress(Exception):
+                self._browser.close()
+            self._browser = None
+        elif scope == "contexts":
+            log(f"♻️ Браузер разросся ({usage.summary()}), контексты сайтов пересоздаются...", indent=1)
+            for provider, _ in self._providers.values():
+                with contextlib.suppress(Exception):
+                    provider.page.context.close()
+            self._providers.clear()
+        else:
+            self._close_stray_pages()
+            return
+        BROWSER_RECYCLES.inc(scope=scope)
+
+    def _close_stray_pages(self) -> None:
+        """Closes the pages that are not the page of a pooled provider."""
+        if self._browser is None:
+            return
+        pooled = {id(provider.page) for provider, _ in self._providers.values()}
+        for context in self._browser.contexts:
+            for page in context.pages:
+                if id(page) not in pooled:
+                    with contextlib.suppress(Exception):
+                        page.close()
+
+    def close(self) -> None:
+        """Closes the browser and stops Playwright."""
+        self._providers.clear()
+        if self._browser is not None:
+            with contextlib.suppress(Exception):
+                self._browser.close()
+            self._browser = None
+        if self._manager is not None:
+            with contextlib.suppress(Exception):
+                self._manager.__exit__(None, None, None)
+            self._manager = None
+            self._playwright = None
+
+
+@dataclass
+class PageLoadStats:
+    """Request accounting for the page loads of one context."""
+
+    requests: int = 0
+    blocked: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        """A short human-readable summary for the log."""
+        return (
+            f"запросов {self.requests}, заблокировано {self.blocked}, "
+            f"загружено {self.bytes / 1024:.0f} KB за {self.seconds:.1f} с"
+        )
+
+
+class ResourceBlocker:
+    """
+    Blocks the requests a scraper never reads in one browser context.
+
+    Images, media and fonts are always dropped. Any other request is only let through
+    if it targets the page's own host or one of the provider's allowed hosts, which
+    removes ads, analytics and overlay frames. Top-level navigations are never blocked,
+    so redirects to the file hosts still resolve.
+    """
+
+    def __init__(self, first_party: str, allowed_hosts: Sequence[str], provider_name: str = ""):
+        self.first_party = first_party
+        self.allowed_hosts = tuple(allowed_hosts)
+        self.provider_name = provider_name
+        self._stats = PageLoadStats()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def should_block(self, url: str, resource_type: str, is_main_navigation: bool) -> bool:
+        """
+        Decides whether a request is blocked.
+
+        Args:
+            url: The request URL.
+            resource_type: Playwright's resource type of the request.
+            is_main_navigation: Whether the request navigates the top-level frame.
+
+        Returns:
+            True if the request should be aborted.
+        """
+        if is_main_navigation:
+            return False
+        if resource_type in BLOCKED_RESOURCE_TYPES:
+            return True
+        if url.startswith(("data:", "blob:")):
+            return False
+        host = urlparse(url).hostname or ""
+        return not (host_matches(host, (self.first_party,)) or host_matches(host, self.allowed_hosts))
+
+    def install(self, context: "BrowserContext") -> None:
+        """Routes every request of the context through the blocker."""
+        context.route("**/*", self._handle)
+        context.on("response", self._on_response)
+
+    def take_stats(self) -> PageLoadStats:
+        """Returns the accounting since the last call and starts a new period."""
+        with self._lock:
+            stats = self._stats
+            stats.seconds = time.perf_counter() - self._started
+            self._stats = PageLoadStats()
+            self._started = time.perf_counter()
+        return stats
+
+    def _handle(self, route: "Route", request: "Request") -> None:
+        is_main_navigation = request.is_navigation_request() and request.frame.parent_frame is None
+        blocked = self.should_block(request.url, request.resource_type, is_main_navigation)
+        with self._lock:
+            self._stats.requests += 1
+            if blocked:
+                self._stats.blocked += 1
+        if blocked:
+            BLOCKED_REQUESTS.inc(provider=self.provider_name, resource_type=request.resource_type)
+            route.abort("blockedbyclient")
+        else:
+            route.continue_()
+
+    def _on_response(self, response: "Response") -> None:
+        size = int(response.headers.get("content-length", 0) or 0)
+        with self._lock:
+            self._stats.bytes += size
+        PAGE_BYTES.inc(size, provider=self.provider_name)
+
+
+def new_context(
+    browser: "Browser",
+    series_url: str,
+    settings: dict[str, Any],
+    allowed_hosts: Sequence[str] = (),
+    provider_name: str = "",
+    storage_state: dict[str, Any] | None = None,
+) -> tuple["BrowserContext", ResourceBlocker | None]:
+    """
+    Creates a stealth browser context for a series page.
+
+    Args:
+        browser: The browser to create the context in.
+        series_url: The URL of the series page, used for cookies and the first-party host.
+        settings: The `settings` block of the config.
+        allowed_hosts: Hosts the provider needs besides the series host.
+        provider_name: The provider name, used in metric labels.
+        storage_state: Cookies and local storage to start the context with, see `StorageStateStore`.
+
+    Returns:
+        The context and its resource blocker, or None if blocking is disabled.
+    """
+    from playwright_stealth import Stealth  # type: ignore[reportMissingTypeStubs]
+
+    width, height = BROWSER_VIEWPORT
+    context = browser.new_context(
+        user_agent=BROWSER_USER_AGENT,
+        viewport={"width": width, "height": height},
+        storage_state=cast(Any, storage_state),
+    )
+    stealth = Stealth()
+    stealth.apply_stealth_sync(context)
+
+    blocker: ResourceBlocker | None = None
+    if settings.get("block_resources", True):
+        blocker = ResourceBlocker(urlparse(series_url).hostname or "", allowed_hosts, provider_name)
+        blocker.install(context)
+
+    cookie_settings = settings.get("cookies", {"enable": False})
+    if cookie_settings.get("enable", False):
+        _load_browser_cookies(context, series_url, cookie_settings)
+
+    return context, blocker
+
+
+def open_storage_states(settings: dict[str, Any]) -> StorageStateStore | None:
+    """Opens the storage state store configured in `settings.storage_state`, if enabled."""
+    state_settings = settings.get("storage_state", {})
+    if not state_settings.get("enable", True):
+        return None
+    return StorageStateStore(
+        state_settings.get("directory", DEFAULT_STORAGE_STATE_DIRECTORY),
+        state_settings.get("max_age_hours", DEFAULT_STORAGE_STATE_MAX_AGE_HOURS) * 3600,
+    )
+
+
+def _load_browser_cookies(context: "BrowserContext", series_url: str, cookie_settings: dict[str, Any]) -> None:
+    """Copies the cookies of the series domain from a local browser into the context."""
+    import browser_cookie3  # type: ignore
+
+    try:
+        domain: str | None = (cast(Any, urlparse(series_url))).netloc
+        if not domain:
+            log("⚠️ Не удалось извлечь домен из URL серии. Пропускаю загрузку cookies.", indent=1)
+        else:
+            browser_name = cookie_settings.get("browser", "firefox")
+            log(f"🍪 Загрузка cookies для домена '{domain}' из {browser_name}...", indent=1)
+            cj = getattr(browser_cookie3, browser_name)(domain_name=domain)
+            context.add_cookies(
+                [
+                    {
+                        "name": cookie.name,
+                        "value": cookie.value,
+                        "domain": cookie.domain,
+                        "path": cookie.path,
+                    }
+                    for cookie in cj
+                ]
+            )
+            log("✅ Cookies успешно загружены.", indent=1)
+    except Exception as e:
+        log(f"❌ Не удалось загрузить cookies: {e}", indent=1)
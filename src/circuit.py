@@ -0,0 +1,154 @@
+"""Per-host circuit breakers and retry backoff shared by the whole run."""
+
+import random
+import threading
+import time
+from typing import Literal
+from urllib.parse import urlparse
+
+from src.constants import (
+    DEFAULT_BREAKER_COOLDOWN_SECONDS,
+    DEFAULT_BREAKER_FAILURE_THRESHOLD,
+    DEFAULT_BREAKER_MAX_COOLDOWN_SECONDS,
+)
+from src.metrics import CIRCUIT_OPEN, CIRCUIT_TRIPS
+from src.utils import log
+
+
+def backoff_delay(attempt: int, base: float, cap: float = DEFAULT_BREAKER_MAX_COOLDOWN_SECONDS) -> float:
+    """
+    Returns the pause before retry number `attempt` (0-based).
+
+    The pause doubles with every attempt up to `cap`, and a random half of it is
+    jittered so that retries of parallel work do not hit a host in lockstep.
+    """
+    delay = min(cap, base * 2**attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CircuitBreaker:
+    """
+    Tracks the health of one host.
+
+    A breaker is closed while requests succeed. `failure_threshold` consecutive
+    failures, or a single failure that signals rate limiting, open it: requests are
+    refused for a cooldown that doubles with every consecutive trip. Once the cooldown
+    elapsed the breaker is half-open and lets requests through again; the first result
+    either closes it or opens it for the next, longer cooldown.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        failure_threshold: int = DEFAULT_BREAKER_FAILURE_THRESHOLD,
+        cooldown_seconds: float = DEFAULT_BREAKER_COOLDOWN_SECONDS,
+        max_cooldown_seconds: float = DEFAULT_BREAKER_MAX_COOLDOWN_SECONDS,
+    ):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self._failures = 0
+        self._trips = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> Literal["closed", "open", "half-open"]:
+        with self._lock:
+            if not self._trips:
+                return "closed"
+            return "open" if time.monotonic() < self._open_until else "half-open"
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets requests through again."""
+        with self._lock:
+            return max(0.0, self._open_until - time.monotonic())
+
+    def allow(self) -> bool:
+        """Checks whether a request to the host may be made now."""
+        return self.state != "open"
+
+    def record_success(self) -> None:
+        """Closes the breaker."""
+        with self._lock:
+            was_tripped = self._trips > 0
+            self._failures = 0
+            self._trips = 0
+            self._open_until = 0.0
+        if was_tripped:
+            CIRCUIT_OPEN.set(0, host=self.host)
+            log(f"🟢 Хост {self.host} снова отвечает.", indent=2)
+
+    def record_failure(self, trip: bool = False) -> None:
+        """
+        Counts a failed request.
+
+        Args:
+            trip: Open the breaker right away, e.g. when the host rate-limits us.
+        """
+        with self._lock:
+            self._failures += 1
+            half_open = self._trips > 0 and time.monotonic() >= self._open_until
+            if not (trip or half_open or self._failures >= self.failure_threshold):
+                return
+            self._trips += 1
+            self._failures = 0
+            cooldown = backoff_delay(self._trips - 1, self.cooldown_seconds, self.max_cooldown_seconds)
+            self._open_until = time.monotonic() + cooldown
+        CIRCUIT_TRIPS.inc(host=self.host)
+        CIRCUIT_OPEN.set(1, host=self.host)
+        log(f"🔴 Хост {self.host} временно отключен на {cooldown:.0f} секунд.", indent=2)
+
+
+class BreakerBoard:
+    """The circuit breakers of all hosts, keyed by host name."""
+
+    def __init__(self) -> None:
+        self.failure_threshold = DEFAULT_BREAKER_FAILURE_THRESHOLD
+        self.cooldown_seconds: float = DEFAULT_BREAKER_COOLDOWN_SECONDS
+        self.max_cooldown_seconds: float = DEFAULT_BREAKER_MAX_COOLDOWN_SECONDS
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        failure_threshold: int = DEFAULT_BREAKER_FAILURE_THRESHOLD,
+        cooldown_seconds: float = DEFAULT_BREAKER_COOLDOWN_SECONDS,
+        max_cooldown_seconds: float = DEFAULT_BREAKER_MAX_COOLDOWN_SECONDS,
+    ) -> None:
+        """Sets the parameters of the breakers; existing breakers keep their state."""
+        with self._lock:
+            self.failure_threshold = failure_threshold
+            self.cooldown_seconds = cooldown_seconds
+            self.max_cooldown_seconds = max_cooldown_seconds
+            for breaker in self._breakers.values():
+                breaker.failure_threshold = failure_threshold
+                breaker.cooldown_seconds = cooldown_seconds
+                breaker.max_cooldown_seconds = max_cooldown_seconds
+
+    def for_url(self, url: str) -> CircuitBreaker:
+        """Returns the breaker of the host a URL points to."""
+        host = (urlparse(url).hostname or url).removeprefix("www.")
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(host, self.failure_threshold, self.cooldown_seconds, self.max_cooldown_seconds)
+                self._breakers[host] = breaker
+            return breaker
+
+    def allow(self, url: str) -> bool:
+        """Checks whether a request to the host of a URL may be made now."""
+        return self.for_url(url).allow()
+
+    def success(self, url: str) -> None:
+        """Records a successful request to the host of a URL."""
+        self.for_url(url).record_success()
+
+    def failure(self, url: str, trip: bool = False) -> None:
+        """Records a failed request to the host of a URL, see `CircuitBreaker.record_failure`."""
+        self.for_url(url).record_failure(trip)
+
+
+BREAKERS = BreakerBoard()
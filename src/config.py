@@ -1,10 +1,11 @@
+import os
 from typing import Any
 
-import yaml
-
 
 def load_config(path: str = "config.yaml") -> dict[str, Any] | None:
     """Loads the configuration from a YAML file."""
+    import yaml
+
     try:
         with open(path, encoding="utf-8") as f:
             return yaml.safe_load(f)
@@ -13,6 +14,10 @@ def load_config(path: str = "config.yaml") -> dict[str, Any] | None:
 
 
 def save_config(data: dict[str, Any], path: str = "config.yaml") -> None:
-    """Saves the data to a YAML file."""
-    with open(path, "w", encoding="utf-8") as f:
+    """Saves the data to a YAML file, replacing it atomically so readers never see a partial file."""
+    import yaml
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
         yaml.dump(data, f, allow_unicode=True, sort_keys=False)
+    os.replace(temp_path, path)
@@ -6,9 +6,35 @@ DEFAULT_USER_AGENT = (
     "(KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0"
 )
 
-# Minimum download speed thresholds (in KB/s)
+# Browser context settings used for scraping the providers
+BROWSER_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
+)
+BROWSER_VIEWPORT = (1920, 1080)
+
+# Text that only shows up on anti-bot challenge and captcha pages (compared lowercased)
+CHALLENGE_PAGE_MARKERS = (
+    "challenge-platform",
+    "cf-challenge",
+    "cf-turnstile",
+    "<title>just a moment...</title>",
+    "g-recaptcha",
+    "h-captcha",
+)
+# How long a challenge page is given to clear by itself before the context is refreshed
+CHALLENGE_WAIT_SECONDS = 10
+
+# Resource types the scraper never reads; blocked in the lean browsing profile
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+# Resolving provider redirect pages over plain HTTP
+REDIRECT_MAX_HOPS = 8
+REDIRECT_SNIFF_BYTES = 256 * 1024
+REDIRECT_TIMEOUT_SECONDS = 20
+REDIRECT_WORKERS = 8
+
+# Minimum speed (in KB/s) of an anonymous pixeldrain transfer before the API key is used
 PIXELDRAIN_MIN_SPEED_NO_API = 1100
-PIXELDRAIN_MIN_SPEED_WITH_API = 1000000
 
 # Default configuration values
 DEFAULT_CHECK_INTERVAL_MINUTES = 10
@@ -16,14 +42,128 @@ DEFAULT_DOWNLOAD_RETRIES = 3
 DEFAULT_RETRY_DELAY = 5
 DEFAULT_DOWNLOAD_DIRECTORY = "downloads"
 
+# Per-host circuit breakers: consecutive failures that open one, and its cooldown
+# (doubled on every consecutive trip, up to the maximum)
+DEFAULT_BREAKER_FAILURE_THRESHOLD = 3
+DEFAULT_BREAKER_COOLDOWN_SECONDS = 60
+DEFAULT_BREAKER_MAX_COOLDOWN_SECONDS = 900
+
+# Index of the episodes present in the download directory, stored inside it
+DOWNLOAD_INDEX_FILENAME = ".drama-index.json"
+# Folder inside the download directory for unfinished transfers, kept to resume them
+PARTIAL_DIRECTORY = ".partial"
+
+# Write-ahead journal of download jobs, replayed on startup
+DEFAULT_JOURNAL_PATH = "journal.jsonl"
+
+# Random pauses (min, max seconds) that pace requests to the providers
+DEFAULT_SERIES_DELAY_SECONDS = (10, 25)
+DEFAULT_DOWNLOAD_DELAY_SECONDS = (5, 15)
+
+# Cache of resolved provider links
+DEFAULT_LINK_CACHE_PATH = "link_cache.json"
+DEFAULT_LINK_CACHE_TTL_HOURS = 24
+
+# Space always left free on the download volumes; transfers that would cut into it are held
+DEFAULT_MIN_FREE_DISK_MB = 1024
+
+# Speculative resolution of the links the download queue needs next
+DEFAULT_PREFETCH_TTL_MINUTES = 10
+# Episodes after the current one whose primary links are resolved ahead
+PREFETCH_LOOKAHEAD_EPISODES = 2
+# Links handed to a provider's batch resolution at once
+PREFETCH_BATCH_SIZE = 4
+
+# Download priority: `priority` of the series in the config times the weight, a bonus
+# for the newest episodes of a series, and a bonus per hour an episode has waited
+PRIORITY_SERIES_WEIGHT = 10
+PRIORITY_RECENT_EPISODES = 2
+PRIORITY_RECENT_BONUS = 5
+PRIORITY_AGE_PER_HOUR = 1
+# How much a new job must outrank the running transfer to pause it
+PRIORITY_PREEMPT_MARGIN = 10
+
+# Post-processing of finished episodes in worker processes
+DEFAULT_POSTPROCESS_WORKERS = 2
+# Episodes waiting for a worker beyond this are left as they were downloaded
+POSTPROCESS_MAX_QUEUED = 100
+POSTPROCESS_STEP_TIMEOUT_SECONDS = 3600
+# Target of the rename step, relative to the download directory
+DEFAULT_RENAME_TEMPLATE = "{series}/{series} - S{season:02d}E{episode:02d}{ext}"
+
+# Browser storage state persisted per provider host
+DEFAULT_STORAGE_STATE_DIRECTORY = "browser_state"
+DEFAULT_STORAGE_STATE_MAX_AGE_HOURS = 24
+
+# Browser limits checked between series: above the context limits the pooled
+# contexts are recycled, above the restart limit the whole browser is relaunched
+DEFAULT_CONTEXT_RECYCLE_RSS_MB = 1536
+DEFAULT_BROWSER_RESTART_RSS_MB = 3072
+DEFAULT_BROWSER_MAX_PAGES = 12
+
+# Leases that shard the watchlist between instances sharing one database; a lease
+# is renewed every third of this period and reclaimed once it lapses
+DEFAULT_LEASE_DATABASE = "leases.sqlite3"
+DEFAULT_LEASE_SECONDS = 120
+
+# Metrics endpoint defaults
+DEFAULT_METRICS_HOST = "127.0.0.1"
+DEFAULT_METRICS_PORT = 9108
+
+# Control API defaults
+DEFAULT_CONTROL_HOST = "127.0.0.1"
+DEFAULT_CONTROL_PORT = 9109
+# Where the generated token of the control API is written when none is configured
+DEFAULT_CONTROL_TOKEN_PATH = "control.token"
+
+# Directory for per-cycle traces written in --profile mode
+DEFAULT_PROFILE_DIRECTORY = "profiles"
+
 # FileCrypt constants
 FILECRYPT_BASE_URL = "https://filecrypt.cc"
 FILECRYPT_CONTAINER_URL_TEMPLATE = f"{FILECRYPT_BASE_URL}/Container/{{container_id}}.html"
-FILECRYPT_LINK_URL_TEMPLATE = f"{FILECRYPT_BASE_URL}/Link/{{link_id}}.html"
+# Link pages live on the same origin (mirror) the container was loaded from
+FILECRYPT_LINK_URL_TEMPLATE = "{base_url}/Link/{link_id}.html"
 
 # PixelDrain constants
 PIXELDRAIN_BASE_URL = "https://pixeldrain.com"
 PIXELDRAIN_API_FILE_URL = f"{PIXELDRAIN_BASE_URL}/api/file/{{file_id}}"
+PIXELDRAIN_API_INFO_URL = f"{PIXELDRAIN_API_FILE_URL}/info"
+PIXELDRAIN_API_LIST_URL = f"{PIXELDRAIN_BASE_URL}/api/list/{{list_id}}"
+PIXELDRAIN_INFO_TIMEOUT_SECONDS = 10
+PIXELDRAIN_INFO_WORKERS = 8
+# Files downloaded at once by pixeldrain_downloader.py
+PIXELDRAIN_BATCH_JOBS = 3
+
+# Gofile constants
+GOFILE_API_URL = "https://api.gofile.io"
+# The token gofile's own web client sends with content requests ("wt"). It is not
+# a secret or tied to an account: it is embedded in the JavaScript of gofile.io and
+# is the same for every visitor. gofile changes it now and then; when the content
+# API starts refusing guest requests for public folders, open a folder on gofile.io
+# with the browser's developer tools and copy the "wt" parameter of its request to
+# api.gofile.io/contents.
+GOFILE_WEBSITE_TOKEN = "4fd6sg89d7s6"
+GOFILE_API_TIMEOUT_SECONDS = 15
+GOFILE_API_WORKERS = 4
+
+# HTTP file transfers (pixeldrain, gofile)
+# Seconds without data before a transfer connection is given up
+TRANSFER_TIMEOUT_SECONDS = 60
+# Large files of known size are fetched over this many ranged connections,
+# each at least TRANSFER_SEGMENT_MIN_BYTES long
+TRANSFER_SEGMENTS = 4
+TRANSFER_SEGMENT_MIN_BYTES = 32 * 1024 * 1024
+# Redirects a transfer request follows before it gives up
+TRANSFER_MAX_REDIRECTS = 10
+# Threads writing the data of all transfers to disk
+TRANSFER_WRITER_THREADS = 4
+# Transfer data is written to disk in blocks of this size; up to TRANSFER_WRITES_IN_FLIGHT
+# blocks of a file may wait for the disk before reading from the network waits
+TRANSFER_WRITE_BYTES = 1024 * 1024
+TRANSFER_WRITES_IN_FLIGHT = 4
+# Seconds an interrupted transfer gets to put its buffered chunks on disk
+TRANSFER_CANCEL_GRACE_SECONDS = 5
 
 # yt-dlp default arguments
 YT_DLP_DEFAULT_ARGS = ["--concurrent-fragments", "4"]
@@ -0,0 +1,251 @@
+"""Control of the running monitor: check triggers, pausing and the local control API."""
+
+import json
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable, Collection
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Literal
+
+from src.constants import DEFAULT_CONTROL_TOKEN_PATH
+from src.utils import log
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+
+@dataclass(frozen=True)
+class Command:
+    """A request for the monitor loop."""
+
+    kind: Literal["check", "reload"]
+    # The series to check, or None for all of them
+    series: str | None = None
+
+
+class Controller:
+    """
+    Connects the monitor loop with whatever controls it (stdin, the control API).
+
+    Commands are queued and executed by the loop on the thread that owns the browser.
+    Pausing is immediate: the loop blocks in `wait_while_paused` before each download
+    until `resume` is called.
+    """
+
+    def __init__(self) -> None:
+        self._commands: queue.Queue[Command] = queue.Queue()
+        self._running = threading.Event()
+        self._running.set()
+        self._lock = threading.Lock()
+        self._current_series: str | None = None
+        self._pending: list[int] = []
+        self._next_check_at: float | None = None
+
+    # --- Commands -------------------------------------------------------------------------
+
+    def request_check(self, series: str | None = None) -> None:
+        """Asks the loop to check one series, or all of them, as soon as possible."""
+        self._commands.put(Command("check", series))
+
+    def request_reload(self) -> None:
+        """Asks the loop to reload the config."""
+        self._commands.put(Command("reload"))
+
+    def next_command(self, timeout: float) -> Command | None:
+        """Waits up to `timeout` seconds for a command; None means the wait timed out."""
+        deadline = time.monotonic() + timeout
+        while True:
+            # Short slices keep the wait interruptible by Ctrl+C on every platform
+            remaining = deadline - time.monotonic()
+            try:
+                return self._commands.get(timeout=min(max(0.0, remaining), 1.0))
+            except queue.Empty:
+                if remaining <= 1.0:
+                    return None
+
+    # --- Pausing --------------------------------------------------------------------------
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    def pause(self) -> None:
+        """Holds downloads before the next one starts."""
+        self._running.clear()
+
+    def resume(self) -> None:
+        """Lets held downloads continue."""
+        self._running.set()
+
+    def wait_while_paused(self) -> None:
+        """Blocks the calling loop while downloads are paused."""
+        if self.paused:
+            log("⏸️ Скачивание приостановлено. Ожидаю команды resume...", indent=2)
+            self._running.wait()
+            log("▶️ Скачивание продолжено.", indent=2)
+
+    # --- Queue state ----------------------------------------------------------------------
+
+    def set_queue(self, series: str | None, episodes: list[int]) -> None:
+        """Publishes the series being processed and its pending episodes."""
+        with self._lock:
+            self._current_series = series
+            self._pending = list(episodes)
+
+    def episode_done(self, episode: int) -> None:
+        """Removes a processed episode from the published queue."""
+        with self._lock:
+            if episode in self._pending:
+                self._pending.remove(episode)
+
+    def set_next_check(self, timestamp: float | None) -> None:
+        """Publishes when the next scheduled check runs."""
+        with self._lock:
+            self._next_check_at = timestamp
+
+    def status(self) -> dict[str, Any]:
+        """A snapshot of the monitor's state for the control API."""
+        with self._lock:
+            next_check = self._next_check_at
+            return {
+                "paused": self.paused,
+                "series": self._current_series,
+                "queue": list(self._pending),
+                "pending_commands": self._commands.qsize(),
+                "next_check_in_seconds": round(max(0.0, next_check - time.time())) if next_check else None,
+            }
+
+
+CONTROL = Controller()
+
+
+def control_token(configured: str = "", path: str = DEFAULT_CONTROL_TOKEN_PATH) -> str:
+    """
+    The token the control API requires: the configured one, or one kept in a file.
+
+    Without a configured token, the token in `path` is used, generated on first use
+    and readable only by its owner, so local clients can read it and web pages cannot.
+    """
+    if configured:
+        return configured
+    import secrets
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            token = f.read().strip()
+        if token:
+            return token
+    except FileNotFoundError:
+        pass
+    token = secrets.token_urlsafe(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token + "\n")
+    return token
+
+
+def start_control_server(
+    host: str = "127.0.0.1",
+    port: int = 9109,
+    controller: Controller = CONTROL,
+    series_names: Callable[[], Collection[str]] | None = None,
+    token: str = "",
+) -> "ThreadingHTTPServer":
+    """
+    Starts the local HTTP control API in a daemon thread.
+
+    Endpoints:
+        GET  /status            The queue, pause state and next check time.
+        POST /check[?series=N]  Checks one series (by name) or all of them now.
+        POST /pause, /resume    Holds or releases downloads.
+        POST /reload            Reloads config.yaml.
+
+    POST requests must carry `Authorization: Bearer <token>`. Requests with an
+    Origin header come from a web page and are refused, so a site open in a local
+    browser cannot drive the API with a cross-site form.
+
+    Args:
+        host: The interface to bind to. Keep it on localhost.
+        port: The port to listen on. Use 0 to pick a free port.
+        controller: The controller the commands go to.
+        series_names: Optional callable returning the configured series names, used to
+            reject checks of unknown series.
+        token: The token of the POST requests, see `control_token`.
+
+    Raises:
+        ValueError: If the token is empty.
+
+    Returns:
+        The running server; call `shutdown()` to stop it.
+    """
+    import hmac
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    if not token:
+        raise ValueError("the control API needs a token")
+    expected = f"Bearer {token}".encode()
+
+    class ControlHandler(BaseHTTPRequestHandler):
+        """Translates HTTP requests into controller calls."""
+
+        def _reply(self, status: int, payload: dict[str, Any]) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _refused(self, needs_token: bool) -> bool:
+            """Replies with an error to a request from a web page, or without the token if it needs one."""
+            if self.headers.get("Origin") is not None:
+                self._reply(403, {"error": "requests from web pages are not allowed"})
+                return True
+            authorization = self.headers.get("Authorization", "").encode()
+            if needs_token and not hmac.compare_digest(authorization, expected):
+                self._reply(401, {"error": "missing or wrong token"})
+                return True
+            return False
+
+        def do_GET(self) -> None:
+            if self._refused(needs_token=False):
+                return
+            if urlparse(self.path).path in ("/status", "/queue", "/"):
+                self._reply(200, controller.status())
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            if self._refused(needs_token=True):
+                return
+            url = urlparse(self.path)
+            if url.path == "/check":
+                series = parse_qs(url.query).get("series", [None])[0]
+                if series is not None and series_names is not None and series not in series_names():
+                    self._reply(404, {"error": f"unknown series: {series}"})
+                    return
+                controller.request_check(series)
+                self._reply(202, {"queued": "check", "series": series})
+            elif url.path == "/pause":
+                controller.pause()
+                self._reply(200, controller.status())
+            elif url.path == "/resume":
+                controller.resume()
+                self._reply(200, controller.status())
+            elif url.path == "/reload":
+                controller.request_reload()
+                self._reply(202, {"queued": "reload"})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def log_message(self, format: str, *args: object) -> None:
+            """Silences the default per-request stderr logging."""
+
+    server = ThreadingHTTPServer((host, port), ControlHandler)
+    thread = threading.Thread(target=server.serve_forever, name="control-server", daemon=True)
+    thread.start()
+    log(f"🎛️ API управления доступно на http://{host}:{server.server_address[1]}/status")
+    return server
@@ -0,0 +1,128 @@
+"""Disk space admission for transfers: space is reserved before a download starts."""
+
+import os
+import shutil
+import threading
+from collections.abc import Callable, Sequence
+from functools import partial
+from types import TracebackType
+
+from src.constants import DEFAULT_MIN_FREE_DISK_MB
+from src.metrics import DISK_ADMISSIONS, DISK_FREE_BYTES, DISK_RESERVED_BYTES
+
+
+class Reservation:
+    """Space held for a running transfer; released on exit."""
+
+    def __init__(self, release: Callable[[], None]):
+        self._release: Callable[[], None] | None = release
+
+    def release(self) -> None:
+        """Gives the space back; releasing twice is harmless."""
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def __enter__(self) -> "Reservation":
+        return self
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, traceback: TracebackType | None
+    ) -> None:
+        self.release()
+
+
+class DiskSpace:
+    """
+    Admits transfers only while their volumes can hold them.
+
+    A transfer needs its file size, minus what its partial files already hold, on
+    every volume it writes to: the staging folder of partial files and, when that
+    sits on another volume, the series folder the finished file is moved to. Space
+    promised to running transfers counts as used, and `min_free_bytes` is always
+    left free. A transfer of unknown size is admitted while the margin is intact.
+    """
+
+    def __init__(self, min_free_bytes: int = DEFAULT_MIN_FREE_DISK_MB * 1024 * 1024):
+        self.min_free_bytes = min_free_bytes
+        # Device id -> bytes promised to running transfers
+        self._reserved: dict[int, int] = {}
+        # Device id -> a folder on it, used as the metric label
+        self._names: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, min_free_bytes: int) -> None:
+        """Sets the space always left free on every volume."""
+        with self._lock:
+            self.min_free_bytes = min_free_bytes
+
+    def reserve(self, size: int, folders: Sequence[str], present: int = 0) -> Reservation | None:
+        """
+        Reserves space for a transfer on the volumes of `folders`.
+
+        Args:
+            size: The size of the file, 0 if unknown.
+            folders: The folders the transfer writes to; they need not exist yet.
+            present: Bytes of the file already in its partial files.
+
+        Returns:
+            The reservation, or None if a volume cannot hold the file.
+        """
+        needed = max(0, size - present)
+        volumes: dict[int, str] = {}
+        for folder in folders:
+            existing = _existing_ancestor(folder)
+            volumes.setdefault(os.stat(existing).st_dev, existing)
+
+        with self._lock:
+            for device, folder in volumes.items():
+                self._names.setdefault(device, folder)
+                free = shutil.disk_usage(folder).free
+                DISK_FREE_BYTES.set(free, volume=self._names[device])
+                if free - self._reserved.get(device, 0) - needed < self.min_free_bytes:
+                    DISK_ADMISSIONS.inc(result="held")
+                    return None
+            for device in volumes:
+                self._reserved[device] = self._reserved.get(device, 0) + needed
+                DISK_RESERVED_BYTES.set(self._reserved[device], volume=self._names[device])
+        DISK_ADMISSIONS.inc(result="admitted")
+        return Reservation(partial(self._release, dict.fromkeys(volumes, needed)))
+
+    def _release(self, devices: dict[int, int]) -> None:
+        with self._lock:
+            for device, size in devices.items():
+                self._reserved[device] = max(0, self._reserved.get(device, 0) - size)
+                DISK_RESERVED_BYTES.set(self._reserved[device], volume=self._names[device])
+
+
+def partial_bytes(partial_dir: str, base_filename: str) -> int:
+    """The bytes of a file already downloaded into `partial_dir`, in any downloader's partial files."""
+    try:
+        names = [name for name in os.listdir(partial_dir) if name.startswith(f"{base_filename}.")]
+    except OSError:
+        return 0
+    total = 0
+    for name in names:
+        path = os.path.join(partial_dir, name)
+        if os.path.isdir(path):
+            # yt-dlp's work folder
+            total += sum(
+                os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(path) for file in files
+            )
+        elif os.path.isfile(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def _existing_ancestor(path: str) -> str:
+    """The nearest folder of `path` (itself included) that exists."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+DISK = DiskSpace()
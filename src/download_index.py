@@ -0,0 +1,124 @@
+"""Index of the episodes already present in the download directory."""
+
+import json
+import os
+import re
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, cast
+
+from src.constants import DOWNLOAD_INDEX_FILENAME
+from src.providers.types import Episode
+from src.utils import log
+
+# Files are saved as "<series> - SxxEyy.<ext>" by every downloader
+EPISODE_FILE_RE = re.compile(r"^(?P<series>.+) - S(?P<season>\d+)E(?P<episode>\d+)(?:\.[^.]+)?$")
+
+
+@dataclass(frozen=True)
+class IndexedFile:
+    """An episode file found in the download directory."""
+
+    name: str
+    size: int
+
+
+class DownloadIndex:
+    """
+    Remembers which episodes of each series exist on disk.
+
+    The index is stored next to the downloads and kept up to date incrementally: a
+    series folder is only listed again when its modification time changed, which
+    happens whenever a file is added, removed or renamed in it. Lookups are dict
+    accesses.
+    """
+
+    def __init__(self, download_dir: str):
+        self.download_dir = download_dir
+        self.path = os.path.join(download_dir, DOWNLOAD_INDEX_FILENAME)
+        # series name -> {"mtime_ns": int, "files": {"SxxEyy": IndexedFile}}
+        self._series: dict[str, dict[str, Any]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def _key(season: int, episode: int) -> str:
+        return f"S{season:02d}E{episode:02d}"
+
+    def refresh(self, series_name: str) -> None:
+        """Re-lists the folder of a series if it changed since the last refresh."""
+        folder = os.path.join(self.download_dir, series_name)
+        try:
+            mtime_ns = os.stat(folder).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+
+        with self._lock:
+            entry = self._series.get(series_name)
+            if entry is not None and entry["mtime_ns"] == mtime_ns:
+                return
+
+        files: dict[str, IndexedFile] = {}
+        if mtime_ns is not None:
+            with os.scandir(folder) as it:
+                for dir_entry in it:
+                    match = EPISODE_FILE_RE.match(dir_entry.name)
+                    if not match or match.group("series") != series_name or not dir_entry.is_file():
+                        continue
+                    key = self._key(int(match.group("season")), int(match.group("episode")))
+                    files[key] = IndexedFile(name=dir_entry.name, size=dir_entry.stat().st_size)
+
+        with self._lock:
+            self._series[series_name] = {"mtime_ns": mtime_ns, "files": files}
+            self._dirty = True
+
+    def get(self, series_name: str, season: int, episode: int) -> IndexedFile | None:
+        """Returns the file of an episode, or None if it is not on disk."""
+        with self._lock:
+            entry = self._series.get(series_name)
+            return entry["files"].get(self._key(season, episode)) if entry is not None else None
+
+    def owns(self, series_name: str, episode: Episode) -> bool:
+        """Checks whether an episode of a series is on disk."""
+        return self.get(series_name, episode.season, episode.episode) is not None
+
+    def save(self) -> None:
+        """Writes the index next to the downloads if it changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                name: {"mtime_ns": entry["mtime_ns"], "files": {k: asdict(f) for k, f in entry["files"].items()}}
+                for name, entry in self._series.items()
+            }
+            self._dirty = False
+
+        temp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(self.download_dir, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            log(f"⚠️ Не удалось сохранить индекс скачанных файлов: {e}", indent=1)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log(f"⚠️ Индекс скачанных файлов поврежден и будет пересоздан: {e}")
+            return
+        try:
+            self._series = {
+                name: {
+                    "mtime_ns": entry["mtime_ns"],
+                    "files": {key: IndexedFile(**file) for key, file in entry["files"].items()},
+                }
+                for name, entry in cast(dict[str, Any], data).items()
+            }
+        except (AttributeError, KeyError, TypeError):
+            self._series = {}
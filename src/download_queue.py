@@ -0,0 +1,149 @@
+"""Priority queue of the episodes a check cycle downloads."""
+
+import heapq
+import itertools
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from src.constants import (
+    PRIORITY_AGE_PER_HOUR,
+    PRIORITY_PREEMPT_MARGIN,
+    PRIORITY_RECENT_BONUS,
+    PRIORITY_RECENT_EPISODES,
+    PRIORITY_SERIES_WEIGHT,
+)
+from src.metrics import PREEMPTIONS, QUEUE_DEPTH
+
+
+def episode_priority(series_priority: int, behind: int, waiting_seconds: float) -> float:
+    """
+    The download priority of an episode; higher goes first.
+
+    Args:
+        series_priority: The `priority` of the series in the config.
+        behind: How many episodes of the series were released after this one.
+        waiting_seconds: How long the episode has been waiting in the queue, across
+            cycles when the journal is enabled; waiting raises the priority, so a
+            backlog is never starved.
+    """
+    recent = PRIORITY_RECENT_BONUS if behind < PRIORITY_RECENT_EPISODES else 0
+    return series_priority * PRIORITY_SERIES_WEIGHT + recent + waiting_seconds / 3600 * PRIORITY_AGE_PER_HOUR
+
+
+@dataclass
+class QueuedJob[T]:
+    """An entry of the queue."""
+
+    item: T
+    priority: float
+    # Position among jobs of equal priority; a requeued job keeps it
+    order: int = 0
+    # Set when a job of clearly higher priority arrived while this one was running
+    preempted: threading.Event = field(default_factory=threading.Event)
+
+
+class DownloadQueue[T]:
+    """
+    The download jobs of a check cycle, highest priority first.
+
+    Jobs of equal priority keep the order they were pushed in. While a job runs, a
+    pushed job whose priority exceeds it by `preempt_margin` sets the running job's
+    `preempted` event: resumable transfers stop and keep their partial files, and
+    the caller puts the job back with `requeue`.
+    """
+
+    def __init__(self, preempt_margin: float | None = PRIORITY_PREEMPT_MARGIN):
+        # None never preempts
+        self.preempt_margin = preempt_margin
+        self._heap: list[tuple[float, int, QueuedJob[T]]] = []
+        self._order = itertools.count()
+        self._running: QueuedJob[T] | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._heap)
+
+    def push(self, item: T, priority: float) -> QueuedJob[T]:
+        """Queues an item, preempting the running job if the item clearly outranks it."""
+        job = QueuedJob(item, priority, next(self._order))
+        self._push(job)
+        return job
+
+    def requeue(self, job: QueuedJob[T]) -> None:
+        """Puts a preempted job back in its place."""
+        job.preempted.clear()
+        self._push(job)
+
+    def pop(self) -> QueuedJob[T] | None:
+        """Takes the job of highest priority and marks it running; None if the queue is empty."""
+        with self._lock:
+            if not self._heap:
+                self._running = None
+                return None
+            _, _, job = heapq.heappop(self._heap)
+            self._running = job
+            QUEUE_DEPTH.set(len(self._heap))
+        return job
+
+    def finish(self, job: QueuedJob[T]) -> None:
+        """Marks a job as no longer running."""
+        with self._lock:
+            if self._running is job:
+                self._running = None
+
+    def items(self) -> list[T]:
+        """The queued items in the order they will run."""
+        with self._lock:
+            return [job.item for _, _, job in sorted(self._heap)]
+
+    def _push(self, job: QueuedJob[T]) -> None:
+        with self._lock:
+            heapq.heappush(self._heap, (-job.priority, job.order, job))
+            QUEUE_DEPTH.set(len(self._heap))
+            running = self._running
+            if (
+                running is not None
+                and self.preempt_margin is not None
+                and job.priority >= running.priority + self.preempt_margin
+                and not running.preempted.is_set()
+            ):
+                running.preempted.set()
+                PREEMPTIONS.inc()
+
+
+def run_in_background[R](work: Callable[[], R], foreground: Callable[[], bool]) -> R:
+    """
+    Runs `work` on a worker thread while this thread keeps calling `foreground`.
+
+    The monitor thread owns the browser, so browser work (resolving links, scanning
+    the next series) is done in `foreground` while the worker downloads. `foreground`
+    returns False once it has nothing left to do; the worker is then awaited, also
+    when `foreground` raised. The worker is a daemon thread, so a second Ctrl+C does
+    not wait for a transfer; its partial file is continued by the next run.
+
+    Returns:
+        The result of `work`; its exception is raised here.
+    """
+    result: list[R] = []
+    error: list[BaseException] = []
+
+    def run() -> None:
+        try:
+            result.append(work())
+        except BaseException as e:
+            error.append(e)
+
+    worker = threading.Thread(target=run, name="download", daemon=True)
+    worker.start()
+    try:
+        while worker.is_alive() and foreground():
+            pass
+    finally:
+        # Short slices keep the wait interruptible by Ctrl+C
+        while worker.is_alive():
+            worker.join(0.5)
+    if error:
+        raise error[0]
+    return result[0]
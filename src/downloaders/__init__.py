@@ -1,16 +1,40 @@
+from importlib import import_module
+
 from src.downloaders.base import BaseDownloader
-from src.downloaders.pixeldrain import PixeldrainDownloader
-from src.downloaders.yt_dlp import YtDlpDownloader
-
-# A registry of all available downloaders
-DOWNLOADER_REGISTRY: dict[str, type[BaseDownloader]] = {
-    "pixeldrain": PixeldrainDownloader,
-    "pixeldrain.com": PixeldrainDownloader,
-    "gofile": YtDlpDownloader,
-    "gofile.io": YtDlpDownloader,
+
+# A registry of all available downloaders. Entries are import paths ("module:Class"),
+# so a downloader and its backend are only imported when it is first used.
+DOWNLOADER_REGISTRY: dict[str, type[BaseDownloader] | str] = {
+    "pixeldrain": "src.downloaders.pixeldrain:PixeldrainDownloader",
+    "pixeldrain.com": "src.downloaders.pixeldrain:PixeldrainDownloader",
+    "gofile": "src.downloaders.gofile:GofileDownloader",
+    "gofile.io": "src.downloaders.gofile:GofileDownloader",
 }
 
 
+def get_downloader_class(downloader_name: str) -> type[BaseDownloader]:
+    """
+    Looks up a downloader class by name, importing it on first use.
+
+    Args:
+        downloader_name: The name of the downloader.
+
+    Returns:
+        The downloader class.
+
+    Raises:
+        ValueError: If the downloader is not found in the registry.
+    """
+    entry = DOWNLOADER_REGISTRY.get(downloader_name)
+    if not entry:
+        raise ValueError(f"Unknown downloader: {downloader_name}")
+    if isinstance(entry, str):
+        module_name, _, class_name = entry.partition(":")
+        entry = getattr(import_module(module_name), class_name)
+        DOWNLOADER_REGISTRY[downloader_name] = entry
+    return entry
+
+
 def get_downloader(downloader_name: str) -> BaseDownloader:
     """
     Factory function to get a downloader instance by name.
@@ -24,7 +48,4 @@ def get_downloader(downloader_name: str) -> BaseDownloader:
     Raises:
         ValueError: If the downloader is not found in the registry.
     """
-    downloader_class = DOWNLOADER_REGISTRY.get(downloader_name)
-    if not downloader_class:
-        raise ValueError(f"Unknown downloader: {downloader_name}")
-    return downloader_class()
+    return get_downloader_class(downloader_name)(source=downloader_name)
@@ -0,0 +1,285 @@
+"""
+A small asyncio HTTP/1.1 client that streams response bodies, for the transfer core.
+
+It covers only what file transfers need: GET requests with streamed bodies, ranges,
+redirects and proxies from the environment. API calls and everything else stay on
+requests.
+"""
+
+import asyncio
+import base64
+import json
+import ssl
+from collections.abc import AsyncGenerator, Mapping
+from http import HTTPStatus
+from typing import Any
+from urllib.parse import SplitResult, urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass
+
+from src.constants import TRANSFER_MAX_REDIRECTS, TRANSFER_TIMEOUT_SECONDS
+from src.metrics import TRANSFER_STREAMS
+
+# Bytes of an error response kept for the caller to inspect (e.g. a JSON error)
+ERROR_BODY_LIMIT = 64 * 1024
+# Read buffer of a connection; reading from the socket pauses at twice this much
+STREAM_BUFFER_BYTES = 256 * 1024
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+_ssl_context: ssl.SSLContext | None = None
+
+
+class HttpError(Exception):
+    """A request failed: no connection, a timeout, a broken response or an error status."""
+
+    def __init__(self, message: str, status: int | None = None, body: bytes = b""):
+        super().__init__(message)
+        # The HTTP status, None if no response was received
+        self.status = status
+        self.body = body
+
+    def json(self) -> Any:
+        """The body of the error response, parsed as JSON."""
+        return json.loads(self.body)
+
+
+class Response:
+    """An HTTP response whose body is read in chunks as they arrive."""
+
+    def __init__(
+        self,
+        url: str,
+        status: int,
+        headers: dict[str, str],
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        read_timeout: float,
+    ):
+        self.url = url
+        self.status = status
+        # Lower-case names; repeated headers are joined with commas
+        self.headers = headers
+        self._reader = reader
+        self._writer = writer
+        self._read_timeout = read_timeout
+        self._closed = False
+        TRANSFER_STREAMS.inc()
+
+    async def __aenter__(self) -> "Response":
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Drops the connection; the body may be left unread."""
+        if not self._closed:
+            self._closed = True
+            TRANSFER_STREAMS.dec()
+        self._writer.close()
+
+    async def raise_for_status(self) -> None:
+        """
+        Raises:
+            HttpError: If the status is an error, with the start of the body.
+        """
+        if self.status < 400:
+            return
+        body = b""
+        try:
+            async for chunk in self.iter_chunks(ERROR_BODY_LIMIT):
+                body += chunk
+                if len(body) >= ERROR_BODY_LIMIT:
+                    break
+        except HttpError:
+            pass
+        try:
+            reason = HTTPStatus(self.status).phrase
+        except ValueError:
+            reason = "Error"
+        raise HttpError(f"{self.status} {reason} for url: {self.url}", self.status, body[:ERROR_BODY_LIMIT])
+
+    async def iter_chunks(self, size: int) -> AsyncGenerator[bytes]:
+        """
+        Yields the body in chunks of at most `size` bytes as they arrive.
+
+        Raises:
+            HttpError: If the connection stalls for the timeout or closes before the
+                end of the body.
+        """
+        try:
+            if "chunked" in self.headers.get("transfer-encoding", "").lower():
+                async for chunk in self._iter_chunked(size):
+                    yield chunk
+                return
+            length = self.headers.get("content-length")
+            remaining = int(length) if length is not None else None
+            while remaining is None or remaining > 0:
+                async with asyncio.timeout(self._read_timeout):
+                    chunk = await self._reader.read(size if remaining is None else min(size, remaining))
+                if not chunk:
+                    if remaining is not None:
+                        raise HttpError(f"the connection closed {remaining} bytes before the end: {self.url}")
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            raise HttpError(f"{type(e).__name__} while reading {self.url}: {e}") from e
+
+    async def _iter_chunked(self, size: int) -> AsyncGenerator[bytes]:
+        """Decodes the chunked transfer encoding."""
+        while True:
+            async with asyncio.timeout(self._read_timeout):
+                line = await self._reader.readline()
+            chunk_size = int(line.split(b";", 1)[0].strip(), 16)
+            if chunk_size == 0:
+                # Trailers, up to the blank line
+                async with asyncio.timeout(self._read_timeout):
+                    while (await self._reader.readline()).strip():
+                        pass
+                return
+            while chunk_size > 0:
+                async with asyncio.timeout(self._read_timeout):
+                    chunk = await self._reader.readexactly(min(size, chunk_size))
+                chunk_size -= len(chunk)
+                yield chunk
+            async with asyncio.timeout(self._read_timeout):
+                await self._reader.readexactly(2)
+
+
+async def open_stream(
+    url: str, headers: Mapping[str, str] | None = None, read_timeout: float = TRANSFER_TIMEOUT_SECONDS
+) -> Response:
+    """
+    Sends a GET request and returns the response once its headers arrived.
+
+    Redirects are followed; the Authorization header is only sent to the host it
+    was meant for. The proxies of the environment (HTTP_PROXY, HTTPS_PROXY,
+    NO_PROXY) are used like `requests` does. Bodies are requested without content
+    encoding, so byte ranges are ranges of the file.
+
+    Args:
+        url: The http or https URL.
+        headers: Extra request headers.
+        read_timeout: Seconds to wait for the connection and for every read.
+
+    Raises:
+        HttpError: If the server could not be reached or answered with no valid response.
+    """
+    headers = dict(headers or {})
+    for _ in range(TRANSFER_MAX_REDIRECTS + 1):
+        response = await _request(url, headers, read_timeout)
+        location = response.headers.get("location")
+        if response.status not in REDIRECT_STATUSES or not location:
+            return response
+        response.close()
+        target = urljoin(url, location)
+        if urlsplit(target).hostname != urlsplit(url).hostname:
+            headers = {name: value for name, value in headers.items() if name.lower() != "authorization"}
+        url = target
+    raise HttpError(f"more than {TRANSFER_MAX_REDIRECTS} redirects: {url}")
+
+
+async def _request(url: str, headers: dict[str, str], read_timeout: float) -> Response:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise HttpError(f"unsupported URL: {url}")
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    host_header = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+    target = parts.path or "/"
+    if parts.query:
+        target += f"?{parts.query}"
+    request_headers = {"User-Agent": _user_agent(), "Accept": "*/*"}
+    request_headers.update(headers)
+    request_headers.update({"Host": host_header, "Accept-Encoding": "identity", "Connection": "close"})
+
+    writer: asyncio.StreamWriter | None = None
+    try:
+        async with asyncio.timeout(read_timeout):
+            proxy = _proxy_for(parts)
+            if proxy is None:
+                reader, writer = await asyncio.open_connection(
+                    parts.hostname, port, ssl=_tls() if secure else None, limit=STREAM_BUFFER_BYTES
+                )
+            else:
+                reader, writer = await asyncio.open_connection(
+                    proxy.hostname, proxy.port or 80, limit=STREAM_BUFFER_BYTES
+                )
+                authorization = _proxy_authorization(proxy)
+                if secure:
+                    tunnel = f"CONNECT {parts.hostname}:{port} HTTP/1.1\r\nHost: {parts.hostname}:{port}\r\n"
+                    if authorization:
+                        tunnel += f"Proxy-Authorization: {authorization}\r\n"
+                    writer.write(f"{tunnel}\r\n".encode("latin-1"))
+                    status, _ = await _read_head(reader)
+                    if status != 200:
+                        raise HttpError(f"the proxy refused a tunnel to {parts.hostname}: {status}", status)
+                    await writer.start_tls(_tls(), server_hostname=parts.hostname)
+                else:
+                    target = url
+                    if authorization:
+                        request_headers["Proxy-Authorization"] = authorization
+            head = f"GET {target} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in request_headers.items())
+            writer.write(f"{head}\r\n".encode("latin-1"))
+            await writer.drain()
+            status, response_headers = await _read_head(reader)
+    except HttpError:
+        if writer is not None:
+            writer.close()
+        raise
+    except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+        if writer is not None:
+            writer.close()
+        raise HttpError(f"{type(e).__name__} requesting {url}: {e}") from e
+    return Response(url, status, response_headers, reader, writer, read_timeout)
+
+
+async def _read_head(reader: asyncio.StreamReader) -> tuple[int, dict[str, str]]:
+    """Reads the status line and headers of a response."""
+    status_line = (await reader.readline()).decode("latin-1")
+    version, _, rest = status_line.partition(" ")
+    if not version.startswith("HTTP/"):
+        raise ValueError(f"not an HTTP response: {status_line.strip()!r}")
+    status = int(rest.split(" ", 1)[0])
+    headers: dict[str, str] = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if not line:
+            raise ValueError("the connection closed inside the response headers")
+        if not line.strip():
+            return status, headers
+        name, _, value = line.partition(":")
+        name, value = name.strip().lower(), value.strip()
+        headers[name] = f"{headers[name]}, {value}" if name in headers else value
+
+
+def _proxy_for(parts: SplitResult) -> SplitResult | None:
+    proxy = getproxies().get(parts.scheme)
+    if not proxy or proxy_bypass(parts.hostname or ""):
+        return None
+    return urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+
+
+def _proxy_authorization(proxy: SplitResult) -> str:
+    if not proxy.username:
+        return ""
+    credentials = f"{proxy.username}:{proxy.password or ''}".encode()
+    return "Basic " + base64.b64encode(credentials).decode()
+
+
+def _tls() -> ssl.SSLContext:
+    global _ssl_context
+    if _ssl_context is None:
+        # The certificate bundle `requests` verifies against
+        import certifi
+
+        _ssl_context = ssl.create_default_context(cafile=certifi.where())
+    return _ssl_context
+
+
+def _user_agent() -> str:
+    # The user agent of the `requests` calls to the same hosts
+    import requests
+
+    return requests.utils.default_user_agent()
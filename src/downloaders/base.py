@@ -1,10 +1,20 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from collections.abc import Sequence
+from typing import Any, ClassVar
+
+from src.downloaders.types import RemoteFile
+from src.metrics import DOWNLOAD_BYTES, DOWNLOAD_RETRIES, DOWNLOAD_THROUGHPUT, DOWNLOADS, LOW_SPEED_FALLBACKS
 
 
 class BaseDownloader(ABC):
     """Abstract base class for a downloader."""
 
+    # Short downloader name used in logs and as the default metric label
+    name: ClassVar[str] = "base"
+
+    def __init__(self, source: str | None = None):
+        self.source = source or self.name
+
     @abstractmethod
     def download(
         self,
@@ -30,3 +40,48 @@ class BaseDownloader(ABC):
             True if the download was successful, False otherwise.
         """
         pass
+
+    def check_link(self, url: str) -> bool | None:
+        """
+        Checks cheaply whether a download URL is still alive, without downloading it.
+
+        Args:
+            url: The download URL for the episode.
+
+        Returns:
+            True if the file is available, False if it is gone, or None if the
+            downloader cannot tell.
+        """
+        return None
+
+    def preflight(self, urls: Sequence[str]) -> dict[str, RemoteFile]:
+        """
+        Looks up the metadata of many files up front, without downloading them.
+
+        Args:
+            urls: The download URLs.
+
+        Returns:
+            A mapping of URL to file metadata. URLs the host could not describe are
+            left out; the default describes none.
+        """
+        return {}
+
+    def record_transfer(self, num_bytes: int, seconds: float) -> None:
+        """Records a completed transfer in the metrics registry."""
+        DOWNLOAD_BYTES.inc(num_bytes, source=self.source)
+        DOWNLOADS.inc(source=self.source, result="success")
+        if seconds > 0:
+            DOWNLOAD_THROUGHPUT.observe(num_bytes / seconds, source=self.source)
+
+    def record_failure(self) -> None:
+        """Records a download that failed after all attempts."""
+        DOWNLOADS.inc(source=self.source, result="failed")
+
+    def record_retry(self) -> None:
+        """Records a retry of a failed attempt."""
+        DOWNLOAD_RETRIES.inc(source=self.source)
+
+    def record_low_speed(self) -> None:
+        """Records a transfer abandoned because of low speed."""
+        LOW_SPEED_FALLBACKS.inc(source=self.source)
@@ -0,0 +1,213 @@
+import os
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, ClassVar
+
+import requests
+
+from src.circuit import BREAKERS
+from src.constants import (
+    GOFILE_API_TIMEOUT_SECONDS,
+    GOFILE_API_URL,
+    GOFILE_API_WORKERS,
+    GOFILE_WEBSITE_TOKEN,
+    PARTIAL_DIRECTORY,
+)
+from src.downloaders.transfer import Transfer, TransferDownloader
+from src.downloaders.transfer_loop import TRANSFER_LOOP
+from src.downloaders.types import RemoteFile
+from src.downloaders.yt_dlp import YtDlpDownloader
+from src.tracing import span
+from src.utils import log
+
+
+class ApiUnavailableError(ValueError):
+    """Raised while the circuit breaker of gofile is open."""
+
+
+@dataclass(frozen=True)
+class _Content:
+    """The file behind a gofile folder link."""
+
+    remote_file: RemoteFile
+    file_id: str = ""
+    link: str = ""
+    # The account token the direct link must be requested with
+    token: str = ""
+
+
+class GofileDownloader(TransferDownloader):
+    """
+    Downloader for gofile.io links.
+
+    The content API turns a folder link into the direct link of its file, which is
+    streamed with a guest account token like any other HTTP transfer. When the API
+    cannot describe the folder (password, premium-only content, API changes) or every
+    attempt fails, the episode is handed to yt-dlp, unless gofile itself is down.
+
+    API failures count against the breaker of the folder links' host, the one the
+    download loop checks before handing a gofile link over.
+    """
+
+    name = "gofile"
+
+    # Base URL of the API, overridable for local stand-ins
+    api_url = GOFILE_API_URL
+
+    # The guest account token, shared by all downloads of the run
+    _token: ClassVar[str | None] = None
+    _token_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def download(
+        self,
+        url: str,
+        series_name: str,
+        season: int,
+        episode: int,
+        output_dir: str,
+        **kwargs: Any,
+    ) -> bool:
+        """Streams an episode from its direct link, falling back to yt-dlp."""
+        retries = kwargs.get("retries", 3)
+        retry_delay = kwargs.get("retry_delay", 5)
+        label = f"серии {episode}"
+
+        try:
+            content = self._resolve(url)
+        except ApiUnavailableError:
+            # yt-dlp would ask the same host; the episode waits for the breaker instead
+            log(f"⏳ [gofile] Хост временно недоступен. Серия {episode} отложена.", indent=3)
+            return False
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            log(f"⚠️ [gofile] Не удалось получить прямую ссылку: {e}. Переход к yt-dlp.", indent=3)
+            return self._fallback(url, series_name, season, episode, output_dir, **kwargs)
+        if not content.remote_file.available:
+            log(f"❌ [gofile] Файл {label} недоступен для скачивания.", indent=3)
+            self.record_failure()
+            return False
+
+        download_url = content.link
+        transfer = Transfer(
+            download_url=download_url,
+            file_id=content.file_id,
+            folder=os.path.join(output_dir, series_name),
+            partial_dir=os.path.join(output_dir, PARTIAL_DIRECTORY),
+            base_filename=f"{series_name} - S{season:02d}E{episode:02d}",
+            label=label,
+            remote_file=content.remote_file,
+            preempted=kwargs.get("preempted"),
+        )
+        headers = {"Cookie": f"accountToken={content.token}"}
+        log(f"🔽 --- [gofile] Скачивание {label} ---", indent=3)
+        status = TRANSFER_LOOP.run(self._attempts(transfer, headers, retries, retry_delay))
+        if status == "success":
+            return True
+        if status in ("preempted", "deferred"):
+            return False
+
+        log(f"❌ [gofile] Не удалось скачать {label} напрямую. Переход к yt-dlp.", indent=3, top=1)
+        return self._fallback(url, series_name, season, episode, output_dir, **kwargs)
+
+    def check_link(self, url: str) -> bool | None:
+        """Asks gofile's content API whether the folder still exists."""
+        try:
+            return self._resolve(url).remote_file.available
+        except (requests.exceptions.RequestException, ValueError, KeyError):
+            return None
+
+    def preflight(self, urls: Sequence[str]) -> dict[str, RemoteFile]:
+        """Fetches the file metadata of all folder links concurrently."""
+        if not urls:
+            return {}
+        with (
+            span("download.preflight", source=self.source, files=len(urls)),
+            requests.Session() as session,
+            ThreadPoolExecutor(max_workers=min(GOFILE_API_WORKERS, len(urls))) as pool,
+        ):
+            infos = list(pool.map(partial(self._fetch_info, session), urls))
+        return {url: info for url, info in zip(urls, infos, strict=True) if info is not None}
+
+    def _fetch_info(self, session: requests.Session, url: str) -> RemoteFile | None:
+        try:
+            return self._resolve(url, session).remote_file
+        except (requests.exceptions.RequestException, ValueError, KeyError):
+            return None
+
+    def _resolve(self, url: str, session: requests.Session | None = None) -> _Content:
+        """
+        Looks up the file behind a folder link.
+
+        Returns:
+            The file; a folder that no longer exists is returned as an unavailable file.
+
+        Raises:
+            ApiUnavailableError: If the circuit breaker of gofile is open.
+            requests.exceptions.RequestException: If the API could not be reached.
+            ValueError: If the API refused the request or the folder has no file.
+        """
+        content_id = url.rstrip("/").split("/")[-1]
+        contents_url = f"{self.api_url}/contents/{content_id}"
+        if not BREAKERS.allow(url):
+            raise ApiUnavailableError("gofile is temporarily unavailable")
+        try:
+            token = self._guest_token(session)
+            r = (session or requests).get(
+                contents_url,
+                params={"wt": GOFILE_WEBSITE_TOKEN},
+                headers={"Authorization": f"Bearer {token}", "X-Website-Token": GOFILE_WEBSITE_TOKEN},
+                timeout=GOFILE_API_TIMEOUT_SECONDS,
+            )
+            # A missing folder is described in the body of the 404
+            if r.status_code != 404:
+                r.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            status_code = e.response.status_code if e.response is not None else None
+            # Like a transfer, an answer about this one folder (a 4xx) is no fault of the host
+            if status_code is not None and status_code < 500 and status_code != 429:
+                BREAKERS.success(url)
+            else:
+                BREAKERS.failure(url, trip=status_code == 429)
+            raise
+        BREAKERS.success(url)
+        payload = r.json()
+        status = payload.get("status")
+        if status == "error-notFound":
+            return _Content(RemoteFile(name="", size=0, available=False))
+        if status != "ok":
+            if status in ("error-token", "error-auth"):
+                type(self)._token = None
+            raise ValueError(f"gofile API answered {status}")
+
+        data = payload["data"]
+        files = [data] if data.get("type") == "file" else list(data.get("children", {}).values())
+        files = [file for file in files if file.get("type") == "file" and file.get("link")]
+        if not files:
+            raise ValueError("the folder contains no downloadable file")
+        # A folder holds one episode; extras such as subtitles or samples are smaller
+        file = max(files, key=lambda file: int(file.get("size", 0)))
+        return _Content(
+            RemoteFile(name=file["name"], size=int(file.get("size", 0))),
+            file_id=str(file.get("id", content_id)),
+            link=file["link"],
+            token=token,
+        )
+
+    def _guest_token(self, session: requests.Session | None) -> str:
+        """Returns the guest account token, creating the account on first use."""
+        cls = type(self)
+        with cls._token_lock:
+            if cls._token is None:
+                r = (session or requests).post(f"{self.api_url}/accounts", timeout=GOFILE_API_TIMEOUT_SECONDS)
+                r.raise_for_status()
+                payload = r.json()
+                if payload.get("status") != "ok":
+                    raise ValueError(f"gofile API answered {payload.get('status')}")
+                cls._token = str(payload["data"]["token"])
+            return cls._token
+
+    def _fallback(self, url: str, series_name: str, season: int, episode: int, output_dir: str, **kwargs: Any) -> bool:
+        """Downloads the episode with yt-dlp instead."""
+        return YtDlpDownloader(source=self.source).download(url, series_name, season, episode, output_dir, **kwargs)
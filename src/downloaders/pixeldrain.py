@@ -1,24 +1,40 @@
 import base64
 import os
-import shutil
-import tempfile
-import time
-from typing import Any, Literal
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any
 
 import requests
 
 from src.constants import (
+    PARTIAL_DIRECTORY,
     PIXELDRAIN_API_FILE_URL,
+    PIXELDRAIN_API_INFO_URL,
+    PIXELDRAIN_API_LIST_URL,
+    PIXELDRAIN_BASE_URL,
+    PIXELDRAIN_INFO_TIMEOUT_SECONDS,
+    PIXELDRAIN_INFO_WORKERS,
     PIXELDRAIN_MIN_SPEED_NO_API,
-    PIXELDRAIN_MIN_SPEED_WITH_API,
 )
-from src.downloaders.base import BaseDownloader
+from src.downloaders.aio_http import HttpError
+from src.downloaders.transfer import AttemptStatus, Transfer, TransferDownloader
+from src.downloaders.transfer_loop import TRANSFER_LOOP
+from src.downloaders.types import RemoteFile
+from src.tracing import span
 from src.utils import log
 
 
-class PixeldrainDownloader(BaseDownloader):
+class PixeldrainDownloader(TransferDownloader):
     """Downloader for pixeldrain.com links."""
 
+    name = "pixeldrain"
+
+    # Template of the file API URL, overridable for mirrors and local stand-ins
+    api_file_url = PIXELDRAIN_API_FILE_URL
+    api_info_url = PIXELDRAIN_API_INFO_URL
+    api_list_url = PIXELDRAIN_API_LIST_URL
+
     def download(
         self,
         url: str,
@@ -28,162 +44,197 @@ class PixeldrainDownloader(BaseDownloader):
         output_dir: str,
         **kwargs: Any,
     ) -> bool:
-        """Downloads a file from pixeldrain with a robust two-phase retry logic."""
+        """Downloads an episode into the folder of its series, see `download_file`."""
+        final_path = self.download_file(
+            url,
+            os.path.join(output_dir, series_name),
+            partial_dir=os.path.join(output_dir, PARTIAL_DIRECTORY),
+            base_filename=f"{series_name} - S{season:02d}E{episode:02d}",
+            label=f"серии {episode}",
+            **kwargs,
+        )
+        return final_path is not None
+
+    def download_file(
+        self,
+        url: str,
+        folder: str,
+        partial_dir: str | None = None,
+        base_filename: str | None = None,
+        label: str = "",
+        **kwargs: Any,
+    ) -> str | None:
+        """Downloads a file from pixeldrain on the transfer loop, see `download_file_async`."""
+        return TRANSFER_LOOP.run(self.download_file_async(url, folder, partial_dir, base_filename, label, **kwargs))
+
+    async def download_file_async(
+        self,
+        url: str,
+        folder: str,
+        partial_dir: str | None = None,
+        base_filename: str | None = None,
+        label: str = "",
+        **kwargs: Any,
+    ) -> str | None:
+        """
+        Downloads a file from pixeldrain with a robust two-phase retry logic.
+
+        The file is first fetched without the API key; when that is too slow or keeps
+        failing, it is fetched with the key. Unfinished data is kept in a partial file and
+        continued by the next attempt or run. Large files of known size are fetched over
+        several ranged connections at once.
+
+        Args:
+            url: A pixeldrain file URL or file id.
+            folder: The folder of the finished file.
+            partial_dir: The folder of the partial files; defaults to `.partial` in `folder`.
+            base_filename: The name of the finished file without extension; None keeps
+                the name from pixeldrain.
+            label: What is being downloaded, in the genitive for the log.
+            **kwargs: `retries`, `retry_delay`, `api_key`, `remote_file` (the file info
+                from `preflight`), `session` (a requests session whose headers and
+                cookies are sent), `progress` (a `ProgressCallback` replacing the
+                progress line in the log) and
+                `preempted` (an event that pauses the transfer, see `Transfer`).
+
+        Returns:
+            The path of the finished file, or None if the download failed.
+        """
         retries = kwargs.get("retries", 3)
         retry_delay = kwargs.get("retry_delay", 5)
         api_key = kwargs.get("api_key")
-
-        file_id = url.split("/")[-1]
-        download_url = PIXELDRAIN_API_FILE_URL.format(file_id=file_id)
+        remote_file: RemoteFile | None = kwargs.get("remote_file")
+
+        file_id = url.rstrip("/").split("/")[-1]
+        transfer = Transfer(
+            download_url=self.api_file_url.format(file_id=file_id),
+            file_id=file_id,
+            folder=folder,
+            partial_dir=partial_dir or os.path.join(folder, PARTIAL_DIRECTORY),
+            base_filename=base_filename,
+            label=label or f"файла {file_id}",
+            remote_file=remote_file,
+            session=kwargs.get("session"),
+            progress=kwargs.get("progress"),
+            preempted=kwargs.get("preempted"),
+        )
+
+        if remote_file is not None and not remote_file.available:
+            log(f"❌ [pixeldrain] Файл {transfer.label} недоступен для скачивания.", indent=3)
+            self.record_failure()
+            return None
 
         # --- Phase 1: Download without API Key ---
-        log(f"🔽 --- [pixeldrain] Этап 1: Скачивание серии {episode} без ключа ---", indent=3)
-        for attempt in range(retries):
-            log(f"🔄 Попытка {attempt + 1}/{retries}...", indent=3)
-            status = self._perform_download(download_url, series_name, season, episode, output_dir, headers={})
-
-            if status == "success":
-                return True
-
-            if status == "low_speed":
-                log("🐌 Низкая скорость. Переход к скачиванию с ключом.", indent=3)
-                break
-
-            if attempt < retries - 1:
-                log(f"❌ Ошибка. Повтор через {retry_delay} секунд...", indent=3)
-                time.sleep(retry_delay)
+        # Skipped when the file info already says an anonymous download needs a captcha
+        skip_anonymous = remote_file is not None and remote_file.captcha
+        if skip_anonymous:
+            log("🚫 Файл требует капчу для скачивания без ключа. Пропускаю этап 1.", indent=3)
+        else:
+            log(f"🔽 --- [pixeldrain] Этап 1: Скачивание {transfer.label} без ключа ---", indent=3)
+        status = await self._attempts(
+            transfer, {}, 0 if skip_anonymous else retries, retry_delay, give_up=("low_speed", "captcha")
+        )
+        if status == "success":
+            return transfer.final_path
+        if status in ("preempted", "deferred"):
+            return None
+        if status == "low_speed":
+            log("🐌 Низкая скорость. Переход к скачиванию с ключом.", indent=3)
+            self.record_low_speed()
 
         # --- Phase 2: Download with API Key ---
         if not api_key:
             log(
-                f"❌ [pixeldrain] Не удалось скачать серию {episode} без ключа. API ключ не найден.",
+                f"❌ [pixeldrain] Не удалось завершить скачивание {transfer.label} без ключа. API ключ не найден.",
                 indent=3,
                 top=1,
             )
-            return False
+            self.record_failure()
+            return None
 
-        log(f"🔽 --- [pixeldrain] Этап 2: Скачивание серии {episode} с ключом ---", indent=3, top=1)
+        log(f"🔽 --- [pixeldrain] Этап 2: Скачивание {transfer.label} с ключом ---", indent=3, top=1)
         auth_str = f":{api_key}"
         headers = {"Authorization": "Basic " + base64.b64encode(auth_str.encode()).decode()}
-        for attempt in range(retries):
-            log(f"🔄 Попытка {attempt + 1}/{retries}...", indent=3)
-            status = self._perform_download(
-                download_url,
-                series_name,
-                season,
-                episode,
-                output_dir,
-                headers=headers,
-            )
-
-            if status == "success":
-                return True
-
-            if attempt < retries - 1:
-                log(f"❌ Ошибка. Повтор через {retry_delay} секунд...", indent=3)
-                time.sleep(retry_delay)
-
-        log(f"❌ [pixeldrain] Не удалось скачать серию {episode} после всех попыток.", indent=3, top=1)
-        return False
-
-    def _perform_download(
-        self,
-        download_url: str,
-        series_name: str,
-        season: int,
-        episode: int,
-        output_dir: str,
-        headers: dict[str, str],
-    ) -> Literal["success", "low_speed", "failed"]:
+        status = await self._attempts(transfer, headers, retries, retry_delay)
+        if status == "success":
+            return transfer.final_path
+        if status in ("preempted", "deferred"):
+            return None
+
+        log(f"❌ [pixeldrain] Не удалось завершить скачивание {transfer.label} после всех попыток.", indent=3, top=1)
+        self.record_failure()
+        return None
+
+    def check_link(self, url: str) -> bool | None:
+        """Asks pixeldrain's file-info API whether the file still exists."""
+        file_id = url.split("/")[-1]
+        try:
+            r = requests.head(self.api_info_url.format(file_id=file_id), timeout=PIXELDRAIN_INFO_TIMEOUT_SECONDS)
+        except requests.exceptions.RequestException:
+            return None
+        if r.status_code == 404:
+            return False
+        return True if r.ok else None
+
+    def preflight(self, urls: Sequence[str]) -> dict[str, RemoteFile]:
+        """Fetches the file info of all URLs concurrently."""
+        if not urls:
+            return {}
+        with (
+            span("download.preflight", source=self.source, files=len(urls)),
+            requests.Session() as session,
+            ThreadPoolExecutor(max_workers=min(PIXELDRAIN_INFO_WORKERS, len(urls))) as pool,
+        ):
+            infos = list(pool.map(partial(self._fetch_info, session), urls))
+        return {url: info for url, info in zip(urls, infos, strict=True) if info is not None}
+
+    def list_file_urls(self, list_url: str, session: requests.Session | None = None) -> list[str]:
         """
-        Helper function to perform a single download attempt from pixeldrain.
-        Returns 'success', 'low_speed', or 'failed'.
+        Returns the file URLs of a pixeldrain list (album).
+
+        Raises:
+            requests.exceptions.RequestException: If the list could not be fetched.
+            ValueError: If the answer is not a list description.
         """
-        temp_path: str = ""
+        list_id = list_url.rstrip("/").split("/")[-1]
+        r = (session or requests).get(
+            self.api_list_url.format(list_id=list_id), timeout=PIXELDRAIN_INFO_TIMEOUT_SECONDS
+        )
+        r.raise_for_status()
+        return [f"{PIXELDRAIN_BASE_URL}/u/{file['id']}" for file in r.json().get("files", [])]
+
+    def _fetch_info(self, session: requests.Session, url: str) -> RemoteFile | None:
+        """Fetches the file info of one URL from pixeldrain's file-info API."""
+        file_id = url.split("/")[-1]
         try:
-            with requests.get(download_url, headers=headers, stream=True) as r:
-                r.raise_for_status()
-
-                base_filename = f"{series_name} - S{season:02d}E{episode:02d}"
-                extension = ""
-
-                content_disposition = r.headers.get("content-disposition")
-                if content_disposition:
-                    parts = content_disposition.split(";")
-                    for part in parts:
-                        if part.strip().startswith("filename="):
-                            server_filename = part.split("=")[1].strip().strip('"')
-                            _, extension = os.path.splitext(server_filename)
-                            break
-
-                if not extension:
-                    content_type = r.headers.get("content-type")
-                    if content_type:
-                        mime_map = {"video/mp4": ".mp4", "video/x-matroska": ".mkv"}
-                        extension = mime_map.get(content_type.split(";")[0], "")
-
-                filename = f"{base_filename}{extension}"
-
-                with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                    temp_path = temp_file.name
-                    total_size = int(r.headers.get("content-length", 0))
-                    downloaded_size = 0
-                    start_time = time.time()
-                    speed_checked = False
-
-                    for chunk in r.iter_content(chunk_size=8192):
-                        temp_file.write(chunk)
-                        downloaded_size += len(chunk)
-                        if total_size > 0:
-                            elapsed_time = time.time() - start_time
-                            speed = downloaded_size / elapsed_time / 1024 if elapsed_time > 0 else 0
-
-                            if not headers and not speed_checked and elapsed_time > 5:
-                                speed_checked = True
-                                min_speed = (
-                                    PIXELDRAIN_MIN_SPEED_NO_API if not headers else PIXELDRAIN_MIN_SPEED_WITH_API
-                                )
-                                if speed < min_speed:
-                                    log(
-                                        f"❌ [pixeldrain] Низкая скорость скачивания (< {min_speed} KB/s).",
-                                        indent=3,
-                                        top=1,
-                                    )
-                                    return "low_speed"
-                            progress = downloaded_size / total_size * 100
-                            log(
-                                f"[pixeldrain] {progress:.1f}% of {total_size / 1024 / 1024:.2f}MB at {speed:.1f} KB/s",
-                                indent=3,
-                                carriage_return=True,
-                            )
-                    log("")
-
-            log("⌛ [pixeldrain] Перемещение файла...", indent=3, top=1)
-            series_folder = os.path.join(output_dir, series_name)
-            os.makedirs(series_folder, exist_ok=True)
-            final_path = os.path.join(series_folder, filename)
-            shutil.move(temp_path, final_path)
-            log(
-                f"✅ [pixeldrain] Скачивание и перемещение серии {episode} успешно завершено.",
-                indent=3,
-                top=1,
-            )
-            return "success"
-
-        except requests.exceptions.RequestException as e:
-            log(f"❌ [pixeldrain] Ошибка при скачивании серии {episode}: {e}", indent=3, top=1)
-            if e.response and e.response.status_code == 403:
-                try:
-                    error_data = e.response.json()
-                    if error_data.get("value") == "file_rate_limited_captcha_required":
-                        log("🚫 Файл требует капчу для скачивания без ключа.", indent=3)
-                except Exception:
-                    pass
-            return "failed"
-        except KeyboardInterrupt:
-            log("🛑 Скачивание прервано пользователем.", indent=3, top=1)
-            raise
-        finally:
-            if temp_path and os.path.exists(temp_path):
-                os.remove(temp_path)
-        return "failed"
+            r = session.get(self.api_info_url.format(file_id=file_id), timeout=PIXELDRAIN_INFO_TIMEOUT_SECONDS)
+            if r.status_code == 404:
+                return RemoteFile(name="", size=0, available=False)
+            r.raise_for_status()
+            info = r.json()
+        except (requests.exceptions.RequestException, ValueError):
+            return None
+        return RemoteFile(
+            name=info.get("name", ""),
+            size=int(info.get("size", 0)),
+            available=info.get("can_download", True),
+            captcha=str(info.get("availability", "")).endswith("captcha_required"),
+            sha256=info.get("hash_sha256", ""),
+        )
+
+    def _min_speed(self, headers: dict[str, str]) -> float | None:
+        """Anonymous transfers below the minimum speed are retried with the API key."""
+        return None if headers else PIXELDRAIN_MIN_SPEED_NO_API
+
+    def _error_status(self, transfer: Transfer, e: HttpError) -> AttemptStatus:
+        """Logs a failed request and classifies it, recognizing pixeldrain's captcha answer."""
+        status = super()._error_status(transfer, e)
+        if e.status == 403:
+            try:
+                error_data = e.json()
+                if error_data.get("value") == "file_rate_limited_captcha_required":
+                    log("🚫 Файл требует капчу для скачивания без ключа.", indent=3)
+                    return "captcha"
+            except Exception:
+                pass
+        return status
@@ -0,0 +1,448 @@
+import asyncio
+import contextlib
+import os
+import shutil
+import threading
+import time
+import urllib.request
+from collections.abc import Callable, Collection
+from dataclasses import dataclass
+from typing import Literal
+
+import requests
+
+from src.circuit import BREAKERS, backoff_delay
+from src.constants import TRANSFER_SEGMENT_MIN_BYTES, TRANSFER_SEGMENTS
+from src.downloaders.aio_http import HttpError, open_stream
+from src.downloaders.base import BaseDownloader
+from src.downloaders.transfer_loop import TRANSFER_LOOP, FileWriter
+from src.downloaders.types import RemoteFile
+from src.tracing import span
+from src.utils import log
+
+# Receives the bytes of a file present so far and its total size (0 if unknown)
+ProgressCallback = Callable[[int, int], None]
+
+# "failed" is a fault of the host (no connection, a timeout, a 5xx, a broken transfer);
+# "rejected" is an answer about this one file (a 4xx such as 404 or 410);
+# "write_failed" is a fault of the local disk (e.g. full), none of the host's
+AttemptStatus = Literal[
+    "success", "low_speed", "captcha", "rate_limited", "failed", "rejected", "write_failed", "preempted"
+]
+
+CHUNK_SIZE = 256 * 1024
+
+
+@dataclass
+class Transfer:
+    """A file being downloaded and where it goes."""
+
+    download_url: str
+    file_id: str
+    # Folder of the finished file and folder of its partial files
+    folder: str
+    partial_dir: str
+    # Name of the finished file without extension; None keeps the name from the host
+    base_filename: str | None
+    # What is being downloaded, in the genitive for the log ("серии 5", "файла abc")
+    label: str
+    remote_file: RemoteFile | None = None
+    # Its headers and cookies are sent with every request of the transfer
+    session: requests.Session | None = None
+    progress: ProgressCallback | None = None
+    # Set to stop the transfer for a download of higher priority; its partial file is kept
+    preempted: threading.Event | None = None
+    final_path: str = ""
+
+    @property
+    def is_preempted(self) -> bool:
+        return self.preempted is not None and self.preempted.is_set()
+
+    @property
+    def partial_path(self) -> str:
+        name = f"{self.base_filename}.{self.file_id}.part" if self.base_filename else f"{self.file_id}.part"
+        return os.path.join(self.partial_dir, name)
+
+    def filename(self, server_filename: str, content_type: str = "") -> str:
+        """The name of the finished file, given the name the server reported."""
+        server_filename = os.path.basename(server_filename)
+        if self.base_filename is None:
+            return server_filename or self.file_id
+        _, extension = os.path.splitext(server_filename)
+        if not extension and content_type:
+            mime_map = {"video/mp4": ".mp4", "video/x-matroska": ".mkv"}
+            extension = mime_map.get(content_type.split(";")[0], "")
+        return f"{self.base_filename}{extension}"
+
+    def request_headers(self, headers: dict[str, str]) -> dict[str, str]:
+        """The headers of a request for the file: those of the session, its cookies for the URL, then `headers`."""
+        if self.session is None:
+            return dict(headers)
+        merged = {
+            name: value
+            for name, value in self.session.headers.items()
+            # The transfer client decides about compression and connection reuse
+            if name.lower() not in ("accept-encoding", "connection")
+        }
+        request = urllib.request.Request(self.download_url)
+        self.session.cookies.add_cookie_header(request)
+        cookie = request.get_header("Cookie")
+        if cookie:
+            merged["Cookie"] = cookie
+        merged.update(headers)
+        return merged
+
+
+class TransferDownloader(BaseDownloader):
+    """
+    Base class for downloaders that stream files over plain HTTP.
+
+    Data goes to partial files in `Transfer.partial_dir` that survive failed attempts
+    and restarts; the next attempt continues them with Range requests. Large files of
+    known size are fetched over `segments` ranged connections at once. Subclasses find
+    the download URL and request headers, then run `_attempts`.
+
+    Attempts are coroutines on the shared `TRANSFER_LOOP`: every transfer and segment
+    of the process is a task on one thread, and the synchronous `download` methods
+    only wait for them. Memory per stream is bounded by the read buffer and the
+    chunks `FileWriter` lets wait for the disk.
+    """
+
+    # Parallel ranged connections used for large files of known size
+    segments = TRANSFER_SEGMENTS
+
+    async def _attempts(
+        self,
+        transfer: Transfer,
+        headers: dict[str, str],
+        retries: int,
+        retry_delay: float,
+        give_up: Collection[AttemptStatus] = (),
+    ) -> AttemptStatus | Literal["deferred"]:
+        """
+        Runs up to `retries` attempts, backing off between them.
+
+        Returns:
+            'success' or 'preempted' as soon as an attempt ends so, a status of
+            `give_up` as soon as an attempt ends with it, 'deferred' once the circuit
+            breaker of the host is open, and otherwise the status of the last attempt.
+        """
+        status: AttemptStatus = "failed"
+        for attempt in range(retries):
+            if not BREAKERS.allow(transfer.download_url):
+                self._deferred(transfer)
+                return "deferred"
+            log(f"🔄 Попытка {attempt + 1}/{retries}...", indent=3)
+            status = await self._perform_download(transfer, headers)
+            self._record_attempt(transfer.download_url, status)
+            if status in ("success", "preempted") or status in give_up:
+                return status
+            if attempt < retries - 1:
+                await self._sleep_before_retry(attempt, retry_delay)
+        return status
+
+    async def _perform_download(self, transfer: Transfer, headers: dict[str, str]) -> AttemptStatus:
+        """
+        Performs a single download attempt.
+        Returns 'success', 'low_speed', 'captcha', 'rate_limited', 'failed', 'rejected',
+        'write_failed' or 'preempted'.
+        """
+        remote_file = transfer.remote_file
+        segmented = (
+            self.segments > 1
+            and remote_file is not None
+            and remote_file.size >= 2 * TRANSFER_SEGMENT_MIN_BYTES
+            # An unfinished single-stream transfer is continued as it is
+            and not _size(transfer.partial_path)
+        )
+        try:
+            if segmented:
+                status = await self._perform_segmented_download(transfer, headers)
+                if status != "unsupported":
+                    return status
+            return await self._perform_stream_download(transfer, headers)
+        except OSError as e:
+            # Network errors arrive as HttpError; this one is about the partial or final file
+            log(f"❌ [{self.name}] Ошибка записи {transfer.label} на диск: {e}", indent=3, top=1)
+            return "write_failed"
+
+    async def _perform_stream_download(self, transfer: Transfer, headers: dict[str, str]) -> AttemptStatus:
+        """Downloads the file over a single connection."""
+        partial_path = transfer.partial_path
+        resume_from = _size(partial_path)
+
+        request_headers = dict(headers)
+        if resume_from:
+            request_headers["Range"] = f"bytes={resume_from}-"
+        downloaded_size = 0
+        start_time = time.time()
+        try:
+            async with await open_stream(transfer.download_url, transfer.request_headers(request_headers)) as r:
+                if r.status == 416:
+                    # The partial file does not fit the remote file (any more); start over
+                    os.remove(partial_path)
+                    log(f"⚠️ [{self.name}] Частично скачанный файл не подходит. Начинаю заново.", indent=3)
+                    return "rejected"
+                await r.raise_for_status()
+                if resume_from and r.status != 206:
+                    resume_from = 0
+                if resume_from:
+                    log(f"⏩ [{self.name}] Продолжаю скачивание с {resume_from / 1024 / 1024:.2f}MB.", indent=3)
+
+                server_filename = ""
+                content_disposition = r.headers.get("content-disposition")
+                if content_disposition:
+                    parts = content_disposition.split(";")
+                    for part in parts:
+                        if part.strip().startswith("filename="):
+                            server_filename = part.split("=")[1].strip().strip('"')
+                            break
+                if not server_filename and transfer.remote_file is not None:
+                    server_filename = transfer.remote_file.name
+                filename = transfer.filename(server_filename, r.headers.get("content-type", ""))
+
+                os.makedirs(transfer.partial_dir, exist_ok=True)
+                async with FileWriter(partial_path, resume_from, truncate=not resume_from) as partial_file:
+                    content_length = int(r.headers.get("content-length", 0))
+                    total_size = resume_from + content_length if content_length else 0
+                    speed_checked = False
+
+                    async for chunk in r.iter_chunks(CHUNK_SIZE):
+                        if transfer.is_preempted:
+                            self._paused(transfer)
+                            return "preempted"
+                        await partial_file.write(chunk)
+                        downloaded_size += len(chunk)
+                        if total_size > 0:
+                            elapsed_time = time.time() - start_time
+                            speed = downloaded_size / elapsed_time / 1024 if elapsed_time > 0 else 0
+
+                            if not speed_checked and elapsed_time > 5:
+                                speed_checked = True
+                                if self._too_slow(speed, headers):
+                                    return "low_speed"
+                            self._report_progress(transfer, resume_from + downloaded_size, total_size, speed)
+                    if transfer.progress is None:
+                        log("")
+
+            if total_size and resume_from + downloaded_size != total_size:
+                log(
+                    f"❌ [{self.name}] Передача {transfer.label} оборвалась. Продолжу со следующей попытки.",
+                    indent=3,
+                )
+                return "failed"
+            return await self._finish(transfer, filename, downloaded_size, start_time)
+
+        except HttpError as e:
+            return self._error_status(transfer, e)
+        except asyncio.CancelledError:
+            log("🛑 Скачивание прервано пользователем. Частично скачанный файл сохранен.", indent=3, top=1)
+            raise
+
+    async def _perform_segmented_download(
+        self, transfer: Transfer, headers: dict[str, str]
+    ) -> AttemptStatus | Literal["unsupported"]:
+        """
+        Downloads the file over several ranged connections at once.
+
+        Every segment has its own partial file, continued by the next attempt. Returns
+        'unsupported' if the server ignores ranges, so the caller falls back to one stream.
+        """
+        assert transfer.remote_file is not None
+        size = transfer.remote_file.size
+        count = min(self.segments, size // TRANSFER_SEGMENT_MIN_BYTES)
+        bounds = [(size * i // count, size * (i + 1) // count - 1) for i in range(count)]
+        paths = [f"{transfer.partial_path}.seg{i}of{count}" for i in range(count)]
+        os.makedirs(transfer.partial_dir, exist_ok=True)
+        present = sum(_size(path) for path in paths)
+        if present:
+            log(f"⏩ [{self.name}] Продолжаю скачивание с {present / 1024 / 1024:.2f}MB.", indent=3)
+
+        received = [0]
+        cancel = asyncio.Event()
+        low_speed = False
+        start_time = time.time()
+        tasks = [
+            asyncio.create_task(self._fetch_segment(transfer, headers, path, start, end, received, cancel))
+            for path, (start, end) in zip(paths, bounds, strict=True)
+        ]
+        speed_checked = False
+        try:
+            while True:
+                done, pending = await asyncio.wait(tasks, timeout=0.5)
+                elapsed_time = time.time() - start_time
+                downloaded_size = received[0]
+                speed = downloaded_size / elapsed_time / 1024 if elapsed_time > 0 else 0
+                self._report_progress(transfer, present + downloaded_size, size, speed)
+                if not speed_checked and elapsed_time > 5:
+                    speed_checked = True
+                    if self._too_slow(speed, headers):
+                        low_speed = True
+                        cancel.set()
+                if transfer.is_preempted:
+                    cancel.set()
+                if not pending or cancel.is_set():
+                    break
+                if any(task.result() != "success" for task in done):
+                    # One segment failed; the others are continued by the next attempt
+                    cancel.set()
+                    break
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            log("🛑 Скачивание прервано пользователем. Частично скачанный файл сохранен.", indent=3, top=1)
+            raise
+        finally:
+            # Stopped segments close their files before the attempt ends
+            cancel.set()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if transfer.progress is None:
+            log("")
+
+        if low_speed:
+            return "low_speed"
+        if transfer.is_preempted:
+            self._paused(transfer)
+            return "preempted"
+        results = [task.result() for task in tasks]
+        for status in ("unsupported", "rate_limited", "captcha", "failed", "rejected"):
+            if status in results:
+                if status == "unsupported":
+                    _remove_files(paths)
+                return status
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(TRANSFER_LOOP.writers, _join_segments, transfer.partial_path, paths)
+        return await self._finish(transfer, transfer.filename(transfer.remote_file.name), received[0], start_time)
+
+    async def _fetch_segment(
+        self,
+        transfer: Transfer,
+        headers: dict[str, str],
+        path: str,
+        start: int,
+        end: int,
+        received: list[int],
+        cancel: asyncio.Event,
+    ) -> AttemptStatus | Literal["unsupported"]:
+        """Downloads one byte range of the file into its partial file."""
+        present = _size(path)
+        offset = start + present
+        if offset > end:
+            return "success"
+        try:
+            request_headers = transfer.request_headers({**headers, "Range": f"bytes={offset}-{end}"})
+            async with await open_stream(transfer.download_url, request_headers) as r:
+                if r.status == 200:
+                    return "unsupported"
+                await r.raise_for_status()
+                async with FileWriter(path, present) as segment:
+                    async for chunk in r.iter_chunks(CHUNK_SIZE):
+                        if cancel.is_set():
+                            return "failed"
+                        await segment.write(chunk)
+                        received[0] += len(chunk)
+        except HttpError as e:
+            return self._error_status(transfer, e)
+        return "success" if _size(path) == end - start + 1 else "failed"
+
+    def _min_speed(self, headers: dict[str, str]) -> float | None:
+        """The speed (KB/s) below which an attempt is abandoned, or None to never abandon it."""
+        return None
+
+    def _too_slow(self, speed: float, headers: dict[str, str]) -> bool:
+        """Checks the speed of an attempt against `_min_speed`."""
+        min_speed = self._min_speed(headers)
+        if min_speed is None or speed >= min_speed:
+            return False
+        log(f"❌ [{self.name}] Низкая скорость скачивания (< {min_speed} KB/s).", indent=3, top=1)
+        return True
+
+    def _report_progress(self, transfer: Transfer, present: int, total_size: int, speed: float) -> None:
+        if transfer.progress is not None:
+            transfer.progress(present, total_size)
+            return
+        progress = present / total_size * 100
+        log(
+            f"[{self.name}] {progress:.1f}% of {total_size / 1024 / 1024:.2f}MB at {speed:.1f} KB/s",
+            indent=3,
+            carriage_return=True,
+        )
+
+    async def _finish(
+        self, transfer: Transfer, filename: str, downloaded_size: int, start_time: float
+    ) -> AttemptStatus:
+        """Moves the completed partial file to its final place."""
+        log(f"⌛ [{self.name}] Перемещение файла...", indent=3, top=1)
+        os.makedirs(transfer.folder, exist_ok=True)
+        transfer.final_path = os.path.join(transfer.folder, filename)
+        # A move to another volume is a copy; it must not stall the other transfers
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(TRANSFER_LOOP.writers, shutil.move, transfer.partial_path, transfer.final_path)
+        self.record_transfer(downloaded_size, time.time() - start_time)
+        log(f"✅ [{self.name}] Скачивание и перемещение {transfer.label} успешно завершено.", indent=3, top=1)
+        return "success"
+
+    def _error_status(self, transfer: Transfer, e: HttpError) -> AttemptStatus:
+        """Logs a failed request and classifies it."""
+        log(f"❌ [{self.name}] Ошибка при скачивании {transfer.label}: {e}", indent=3, top=1)
+        if e.status == 429:
+            return "rate_limited"
+        if e.status is not None and 400 <= e.status < 500:
+            return "rejected"
+        return "failed"
+
+    def _record_attempt(self, download_url: str, status: str) -> None:
+        """
+        Reports the outcome of an attempt to the circuit breaker of the host.
+
+        Only faults of the host count against it: a few dead files must not stop the
+        downloads of every other file on the host.
+        """
+        if status in ("success", "rejected"):
+            # A host that answers about a file is up
+            BREAKERS.success(download_url)
+        elif status in ("failed", "rate_limited"):
+            BREAKERS.failure(download_url, trip=status == "rate_limited")
+
+    async def _sleep_before_retry(self, attempt: int, retry_delay: float) -> None:
+        delay = backoff_delay(attempt, retry_delay)
+        log(f"❌ Ошибка. Повтор через {delay:.0f} секунд...", indent=3)
+        self.record_retry()
+        with span("sleep.retry", category="sleep"):
+            await asyncio.sleep(delay)
+
+    def _paused(self, transfer: Transfer) -> None:
+        log(
+            f"⏸️ [{self.name}] Скачивание {transfer.label} приостановлено ради более важной серии."
+            " Частично скачанный файл сохранен.",
+            indent=3,
+            top=1,
+        )
+
+    def _deferred(self, transfer: Transfer) -> None:
+        log(f"⏳ [{self.name}] Хост временно недоступен. Скачивание {transfer.label} отложено.", indent=3)
+
+
+def _size(path: str) -> int:
+    """The size of a partial file, 0 if there is none."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _remove_files(paths: list[str]) -> None:
+    for path in paths:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+def _join_segments(partial_path: str, paths: list[str]) -> None:
+    """Concatenates the finished segment files into the partial file and removes them."""
+    with open(partial_path, "wb") as partial_file:
+        for path in paths:
+            with open(path, "rb") as segment:
+                shutil.copyfileobj(segment, partial_file, 1024 * 1024)
+    for path in paths:
+        os.remove(path)
@@ -0,0 +1,147 @@
+"""The event loop shared by all HTTP transfers, and the bounded writes of their data."""
+
+import asyncio
+import os
+import threading
+from collections import deque
+from collections.abc import Coroutine
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_all
+from typing import Any
+
+from src.constants import (
+    TRANSFER_CANCEL_GRACE_SECONDS,
+    TRANSFER_WRITE_BYTES,
+    TRANSFER_WRITER_THREADS,
+    TRANSFER_WRITES_IN_FLIGHT,
+)
+
+
+class TransferLoop:
+    """
+    One asyncio event loop on a thread of its own that runs every transfer.
+
+    Any thread runs a coroutine on it with `run` and blocks until it is done, so the
+    synchronous downloader API stays as it was while the network I/O of all
+    transfers, however many run at once, shares this one thread. Disk writes go to a
+    small pool of writer threads, see `FileWriter`.
+    """
+
+    def __init__(self, writer_threads: int = TRANSFER_WRITER_THREADS):
+        self.writers = ThreadPoolExecutor(max_workers=writer_threads, thread_name_prefix="transfer-writer")
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running loop, started on first use."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                # A daemon, so an interrupted run exits without waiting for open connections
+                self._thread = threading.Thread(target=self._loop.run_forever, name="transfers", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def run[R](self, coroutine: Coroutine[Any, Any, R]) -> R:
+        """
+        Runs a coroutine on the loop and waits for its result.
+
+        On Ctrl+C the coroutine is cancelled and given `TRANSFER_CANCEL_GRACE_SECONDS`
+        to put its buffered data on disk, so partial files stay continuable.
+
+        Raises:
+            RuntimeError: If called from the loop's own thread; await the coroutine there.
+        """
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError("TransferLoop.run called on the transfer loop; await the coroutine instead")
+        finished = threading.Event()
+
+        async def guarded() -> R:
+            try:
+                return await coroutine
+            finally:
+                finished.set()
+
+        future = asyncio.run_coroutine_threadsafe(guarded(), self.loop)
+        try:
+            return future.result()
+        except KeyboardInterrupt:
+            future.cancel()
+            finished.wait(TRANSFER_CANCEL_GRACE_SECONDS)
+            raise
+
+
+class FileWriter:
+    """
+    Writes the data of a transfer to a file at its offsets, on the writer threads.
+
+    Chunks are gathered into blocks of `TRANSFER_WRITE_BYTES`, and up to
+    `TRANSFER_WRITES_IN_FLIGHT` blocks of a file may wait for the disk; `write` then
+    waits for the oldest of them. A disk slower than the network thereby slows the
+    reads down (and the sender with them, through TCP) instead of filling memory.
+    Write errors (e.g. a full disk) are raised by a later `write` or by `close`.
+    """
+
+    def __init__(self, path: str, offset: int = 0, truncate: bool = False):
+        flags = os.O_WRONLY | os.O_CREAT | getattr(os, "O_BINARY", 0) | (os.O_TRUNC if truncate else 0)
+        self.path = path
+        # Where the next chunk goes
+        self.offset = offset
+        self._fd = os.open(path, flags, 0o644)
+        self._buffer = bytearray()
+        self._pending: deque[Future[None]] = deque()
+        # Without pwrite, a seek and a write must not interleave with another chunk's
+        self._seek_lock = threading.Lock()
+
+    async def __aenter__(self) -> "FileWriter":
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        await self.close()
+
+    async def write(self, data: bytes) -> None:
+        """Appends a chunk, waiting while too many blocks are queued for the disk."""
+        self._buffer += data
+        if len(self._buffer) < TRANSFER_WRITE_BYTES:
+            return
+        while len(self._pending) >= TRANSFER_WRITES_IN_FLIGHT:
+            await asyncio.wrap_future(self._pending.popleft())
+        self._flush()
+
+    async def close(self) -> None:
+        """Writes the rest, waits for the queued blocks and closes the file, also when the transfer was cancelled."""
+        self._flush()
+        pending, self._pending = list(self._pending), deque()
+        # The file is closed by a writer thread after the queued chunks, even if this task is cancelled
+        closing = TRANSFER_LOOP.writers.submit(self._close_after, pending)
+        await asyncio.shield(asyncio.wrap_future(closing))
+        for future in pending:
+            future.result()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        block, self._buffer = bytes(self._buffer), bytearray()
+        self._pending.append(TRANSFER_LOOP.writers.submit(self._write_at, block, self.offset))
+        self.offset += len(block)
+
+    def _write_at(self, data: bytes, offset: int) -> None:
+        view = memoryview(data)
+        while view:
+            if hasattr(os, "pwrite"):
+                written = os.pwrite(self._fd, view, offset)
+            else:
+                with self._seek_lock:
+                    os.lseek(self._fd, offset, os.SEEK_SET)
+                    written = os.write(self._fd, view)
+            view, offset = view[written:], offset + written
+
+    def _close_after(self, pending: list[Future[None]]) -> None:
+        wait_all(pending)
+        os.close(self._fd)
+
+
+TRANSFER_LOOP = TransferLoop()
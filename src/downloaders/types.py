@@ -0,0 +1,14 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class RemoteFile:
+    """Metadata of a file on a file host, learned before downloading it."""
+
+    name: str
+    size: int
+    # False if the host reports the file as gone or not downloadable
+    available: bool = True
+    # True if downloading without an account requires solving a captcha
+    captcha: bool = False
+    sha256: str = ""
@@ -2,17 +2,21 @@ import glob
 import os
 import shutil
 import subprocess
-import tempfile
 import time
 from typing import Any
 
+from src.circuit import BREAKERS, backoff_delay
+from src.constants import PARTIAL_DIRECTORY
 from src.downloaders.base import BaseDownloader
+from src.tracing import span
 from src.utils import log
 
 
 class YtDlpDownloader(BaseDownloader):
     """Downloader that uses yt-dlp."""
 
+    name = "yt-dlp"
+
     def download(
         self,
         url: str,
@@ -28,70 +32,88 @@ class YtDlpDownloader(BaseDownloader):
         retry_delay = kwargs.get("retry_delay", 5)
 
         for attempt in range(retries):
+            if not BREAKERS.allow(url):
+                log(f"⏳ [yt-dlp] Хост временно недоступен. Скачивание серии {episode} отложено.", indent=3)
+                return False
             log(
                 f"🔽 [yt-dlp] Попытка скачивания серии {episode} (попытка {attempt + 1}/{retries})...",
                 indent=3,
             )
 
-            with tempfile.TemporaryDirectory() as temp_dir:
-                output_template = os.path.join(temp_dir, f"{series_name} - S{season:02d}E{episode:02d}.%(ext)s")
-
-                try:
-                    command = (
-                        [
-                            "uv",
-                            "run",
-                            "--",
-                            "yt-dlp",
-                            "--output",
-                            output_template,
-                            "--quiet",
-                            "--progress",
-                        ]
-                        + yt_dlp_args
-                        + [url]
-                    )
-
-                    subprocess.run(command, check=True)
-
-                    log("⌛ [yt-dlp] Перемещение файла...", indent=3, top=1)
-
-                    downloaded_files = glob.glob(os.path.join(temp_dir, "*"))
-                    if not downloaded_files:
-                        log(
-                            f"❌ [yt-dlp] Ошибка: скачанный файл не найден в {temp_dir}.",
-                            indent=3,
-                            top=1,
-                        )
-                        continue
+            # A work folder that outlives the attempt, so yt-dlp continues its .part files
+            base_filename = f"{series_name} - S{season:02d}E{episode:02d}"
+            work_dir = os.path.join(output_dir, PARTIAL_DIRECTORY, f"{base_filename}.yt-dlp")
+            os.makedirs(work_dir, exist_ok=True)
+            output_template = os.path.join(work_dir, f"{base_filename}.%(ext)s")
 
-                    downloaded_file = downloaded_files[0]
+            start_time = time.time()
+            try:
+                command = (
+                    [
+                        "uv",
+                        "run",
+                        "--",
+                        "yt-dlp",
+                        "--output",
+                        output_template,
+                        "--quiet",
+                        "--progress",
+                    ]
+                    + yt_dlp_args
+                    + [url]
+                )
 
-                    series_folder = os.path.join(output_dir, series_name)
-                    os.makedirs(series_folder, exist_ok=True)
+                subprocess.run(command, check=True)
+                BREAKERS.success(url)
 
-                    final_path = os.path.join(series_folder, os.path.basename(downloaded_file))
-                    shutil.move(downloaded_file, final_path)
+                log("⌛ [yt-dlp] Перемещение файла...", indent=3, top=1)
 
+                downloaded_files = [
+                    path for path in glob.glob(os.path.join(work_dir, "*")) if not path.endswith((".part", ".ytdl"))
+                ]
+                if not downloaded_files:
                     log(
-                        f"✅ [yt-dlp] Скачивание и перемещение серии {episode} успешно завершено.",
+                        f"❌ [yt-dlp] Ошибка: скачанный файл не найден в {work_dir}.",
                         indent=3,
                         top=1,
                     )
-                    return True
-                except subprocess.CalledProcessError:
-                    log(f"❌ [yt-dlp] Ошибка при скачивании серии {episode}.", indent=2, top=1)
-                    if attempt < retries - 1:
-                        log(f"▩ Повторная попытка через {retry_delay} секунд...", indent=3)
-                        time.sleep(retry_delay)
                     continue
-                except KeyboardInterrupt:
-                    log("🛑 Скачивание прервано пользователем.", indent=3, top=1)
-                    raise
+
+                downloaded_file = downloaded_files[0]
+
+                series_folder = os.path.join(output_dir, series_name)
+                os.makedirs(series_folder, exist_ok=True)
+
+                final_path = os.path.join(series_folder, os.path.basename(downloaded_file))
+                shutil.move(downloaded_file, final_path)
+                self.record_transfer(os.path.getsize(final_path), time.time() - start_time)
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+                log(
+                    f"✅ [yt-dlp] Скачивание и перемещение серии {episode} успешно завершено.",
+                    indent=3,
+                    top=1,
+                )
+                return True
+            except subprocess.CalledProcessError:
+                log(f"❌ [yt-dlp] Ошибка при скачивании серии {episode}.", indent=2, top=1)
+                # Not counted against the host: yt-dlp's exit status does not tell a
+                # removed video from a host that is down
+                if attempt < retries - 1:
+                    delay = backoff_delay(attempt, retry_delay)
+                    log(f"▩ Повторная попытка через {delay:.0f} секунд...", indent=3)
+                    self.record_retry()
+                    with span("sleep.retry", category="sleep"):
+                        time.sleep(delay)
+                continue
+            except KeyboardInterrupt:
+                log("🛑 Скачивание прервано пользователем. Частично скачанный файл сохранен.", indent=3, top=1)
+                raise
 
         log(
             f"❌ [yt-dlp] Не удалось скачать серию {episode} после {retries} попыток.",
             indent=3,
             top=1,
         )
+        self.record_failure()
         return False
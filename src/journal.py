@@ -0,0 +1,145 @@
+"""Write-ahead journal of download jobs, so an interrupted cycle can be resumed."""
+
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, cast
+
+from src.providers.types import Episode
+from src.utils import log
+
+
+@dataclass
+class Job:
+    """An episode queued for download, with every link it can be fetched from."""
+
+    series: str
+    season: int
+    episode: int
+    provider: str
+    links: list[Episode]
+    # Initial link -> final download URL, for the links resolved so far
+    resolved: dict[str, str] = field(default_factory=dict[str, str])
+    # Set when the job was postponed because its hosts were unavailable
+    deferred: bool = False
+    # When the episode was first queued (Unix time), kept across cycles
+    queued_at: float = 0.0
+
+    @property
+    def key(self) -> str:
+        return Journal.key(self.series, self.episode)
+
+
+class Journal:
+    """
+    An append-only log of download jobs.
+
+    Every state change (job queued, link resolved, job finished) is appended as one
+    JSON line and flushed to disk before the work it describes continues, so after a
+    crash the pending jobs can be replayed without scraping the providers again.
+    Finished jobs are dropped when the journal is compacted on open.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._replay()
+        self._compact()
+
+    @staticmethod
+    def key(series: str, episode: int) -> str:
+        """Builds the key of an episode's job."""
+        return f"{series}#{episode}"
+
+    def pending(self) -> list[Job]:
+        """Returns the jobs that were queued but never finished."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def add(self, job: Job) -> None:
+        """Records a queued job, replacing an older job for the same episode but keeping its `queued_at`."""
+        with self._lock:
+            previous = self._jobs.get(job.key)
+            if previous is not None and previous.queued_at:
+                job.queued_at = previous.queued_at
+            self._jobs[job.key] = job
+            self._append({"op": "job", **asdict(job)})
+
+    def resolved(self, series: str, episode: int, link: str, url: str) -> None:
+        """Records the final URL of one of a job's links."""
+        key = self.key(series, episode)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.resolved.get(link) == url:
+                return
+            job.resolved[link] = url
+            self._append({"op": "resolved", "key": key, "link": link, "url": url})
+
+    def defer(self, series: str, episode: int) -> None:
+        """Records that a job was postponed until its hosts recover."""
+        key = self.key(series, episode)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.deferred:
+                return
+            job.deferred = True
+            self._append({"op": "deferred", "key": key})
+
+    def done(self, series: str, episode: int) -> None:
+        """Records that a job finished and needs no replay."""
+        key = self.key(series, episode)
+        with self._lock:
+            if self._jobs.pop(key, None) is not None:
+                self._append({"op": "done", "key": key})
+
+    def _append(self, record: dict[str, Any]) -> None:
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            log(f"⚠️ Не удалось записать в журнал заданий: {e}", indent=1)
+
+    def _replay(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            log(f"⚠️ Не удалось прочитать журнал заданий: {e}")
+            return
+
+        for line in lines:
+            try:
+                record = cast(dict[str, Any], json.loads(line))
+                op = record.pop("op")
+                if op == "job":
+                    record["links"] = [Episode(**link) for link in record["links"]]
+                    job = Job(**record)
+                    self._jobs[job.key] = job
+                elif op == "resolved" and record["key"] in self._jobs:
+                    self._jobs[record["key"]].resolved[record["link"]] = record["url"]
+                elif op == "deferred" and record["key"] in self._jobs:
+                    self._jobs[record["key"]].deferred = True
+                elif op == "done":
+                    self._jobs.pop(record["key"], None)
+            except (ValueError, KeyError, TypeError):
+                # A torn last line from a crash mid-write; everything before it is intact
+                continue
+
+    def _compact(self) -> None:
+        """Rewrites the journal with only the pending jobs."""
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for job in self._jobs.values():
+                    f.write(json.dumps({"op": "job", **asdict(job)}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            log(f"⚠️ Не удалось сжать журнал заданий: {e}")
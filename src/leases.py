@@ -0,0 +1,211 @@
+"""Expiring leases that shard the watchlist between monitor instances."""
+
+import contextlib
+import math
+import os
+import threading
+import time
+from collections.abc import Generator, Sequence
+from typing import TYPE_CHECKING
+
+from src.constants import DEFAULT_LEASE_SECONDS
+from src.metrics import LEASE_CLAIMS, LEASES_HELD
+from src.utils import log
+
+if TYPE_CHECKING:
+    import sqlite3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, node TEXT NOT NULL, expires REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS nodes (node TEXT PRIMARY KEY, expires REAL NOT NULL);
+"""
+
+
+def default_node_id() -> str:
+    """The host name and process id, unique among the instances sharing a store."""
+    import socket
+
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseStore:
+    """
+    Leases of series and download jobs in a SQLite database shared by all instances.
+
+    Several monitors (e.g. on boxes with different egress IPs) can watch one
+    watchlist: each claims a fair share of the series, the number of series divided
+    by the number of live instances, and only scrapes its share. A lease expires
+    `ttl_seconds` after it was last renewed; a running instance renews its leases
+    from a heartbeat thread, so the leases of a dead instance are reclaimed by the
+    others within one lease period. Expiry uses wall-clock time, so the clocks of
+    the instances must be synchronized (NTP).
+
+    Without a database the store is disabled and every claim succeeds.
+    """
+
+    def __init__(self, path: str | None = None, node: str = "", ttl_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.path = path
+        # A disabled store needs no node id; it is looked up once a database is given
+        self.node = node or (default_node_id() if path is not None else "")
+        self.ttl_seconds = ttl_seconds
+        self._heartbeat: threading.Thread | None = None
+        self._stop = threading.Event()
+        if path is not None:
+            self._create_schema()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def configure(self, path: str | None, node: str, ttl_seconds: float) -> None:
+        """Opens the store at `path` (None disables it) and keeps its leases renewed."""
+        if path is not None:
+            node = node or default_node_id()
+        if (path, node, ttl_seconds) == (self.path, self.node, self.ttl_seconds):
+            return
+        self.close()
+        self.path, self.node, self.ttl_seconds = path, node, ttl_seconds
+        if path is None:
+            return
+        self._create_schema()
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._renew_until_stopped, name="leases", daemon=True)
+        self._heartbeat.start()
+
+    def claim(self, key: str) -> bool:
+        """Takes or renews the lease of `key`; False if another live instance holds it."""
+        if self.path is None:
+            return True
+        with self._transaction() as db:
+            claimed = self._claim(db, key, time.time())
+        LEASE_CLAIMS.inc(result="claimed" if claimed else "taken")
+        return claimed
+
+    def release(self, key: str) -> None:
+        """Gives up the lease of `key` if this instance holds it."""
+        if self.path is None:
+            return
+        with self._transaction() as db:
+            db.execute("DELETE FROM leases WHERE key = ? AND node = ?", (key, self.node))
+
+    def claim_share(self, group: str, names: Sequence[str]) -> list[str]:
+        """
+        Claims this instance's share of a group of work items.
+
+        Items already leased by this instance are kept first, so shards are stable
+        across cycles; leases beyond the share are released for instances that
+        joined since. Leases of the group on items no longer in `names` are dropped.
+
+        Args:
+            group: The kind of items, prefixed to the lease keys (e.g. "series").
+            names: All items of the group, in priority order.
+
+        Returns:
+            The names of the items this instance holds, in the order of `names`.
+        """
+        if self.path is None:
+            return list(names)
+        now = time.time()
+        keys = {f"{group}:{name}": name for name in names}
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO nodes VALUES (?, ?)", (self.node, now + self.ttl_seconds))
+            db.execute("DELETE FROM nodes WHERE expires <= ?", (now,))
+            (live,) = db.execute("SELECT COUNT(*) FROM nodes").fetchone()
+            share = math.ceil(len(keys) / max(1, live))
+
+            rows = db.execute("SELECT key, node, expires FROM leases WHERE key LIKE ?", (f"{group}:%",)).fetchall()
+            own = [key for key, node, _ in rows if node == self.node and key in keys]
+            free = [key for key in keys if key not in {k for k, _, expires in rows if expires > now}]
+            held = own[:share]
+            for key in free:
+                if len(held) >= share:
+                    break
+                if self._claim(db, key, now):
+                    held.append(key)
+            for key, node, _ in rows:
+                if node == self.node and key not in held:
+                    db.execute("DELETE FROM leases WHERE key = ?", (key,))
+            for key in held:
+                db.execute("UPDATE leases SET expires = ? WHERE key = ?", (now + self.ttl_seconds, key))
+        LEASES_HELD.set(len(held), group=group)
+        return [name for key, name in keys.items() if key in held]
+
+    @contextlib.contextmanager
+    def exclusive(self) -> Generator[None]:
+        """Holds the store's write lock, serializing a critical section across all instances."""
+        if self.path is None:
+            yield
+            return
+        with self._transaction("EXCLUSIVE"):
+            yield
+
+    def renew(self) -> None:
+        """Extends every lease of this instance and its liveness record."""
+        if self.path is None:
+            return
+        expires = time.time() + self.ttl_seconds
+        with self._transaction() as db:
+            db.execute("UPDATE leases SET expires = ? WHERE node = ?", (expires, self.node))
+            db.execute("INSERT OR REPLACE INTO nodes VALUES (?, ?)", (self.node, expires))
+
+    def close(self) -> None:
+        """Stops renewing and releases every lease of this instance."""
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        if self.path is None:
+            return
+        import sqlite3
+
+        with contextlib.suppress(sqlite3.Error), self._transaction() as db:
+            db.execute("DELETE FROM leases WHERE node = ?", (self.node,))
+            db.execute("DELETE FROM nodes WHERE node = ?", (self.node,))
+        self.path = None
+
+    def _claim(self, db: "sqlite3.Connection", key: str, now: float) -> bool:
+        row = db.execute("SELECT node, expires FROM leases WHERE key = ?", (key,)).fetchone()
+        if row is not None and row[0] != self.node and row[1] > now:
+            return False
+        db.execute("INSERT OR REPLACE INTO leases VALUES (?, ?, ?)", (key, self.node, now + self.ttl_seconds))
+        return True
+
+    def _create_schema(self) -> None:
+        import sqlite3
+
+        assert self.path is not None
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.executescript(_SCHEMA)
+        finally:
+            db.close()
+
+    @contextlib.contextmanager
+    def _transaction(self, mode: str = "IMMEDIATE") -> "Generator[sqlite3.Connection]":
+        """A write transaction on a connection of its own, usable from any thread."""
+        import sqlite3
+
+        assert self.path is not None
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            db.execute(f"BEGIN {mode}")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def _renew_until_stopped(self) -> None:
+        import sqlite3
+
+        while not self._stop.wait(self.ttl_seconds / 3):
+            try:
+                self.renew()
+            except sqlite3.Error as e:
+                log(f"⚠️ Не удалось продлить аренду сериалов: {e}")
+
+
+LEASES = LeaseStore()
@@ -0,0 +1,113 @@
+"""Persistent cache of resolved provider links."""
+
+import json
+import os
+import threading
+import time
+from typing import Any, cast
+
+from src.metrics import LINK_CACHE_LOOKUPS
+from src.utils import log
+
+
+class LinkCache:
+    """
+    Maps provider links to the file host URLs they resolved to.
+
+    Resolving a link costs a browser round trip and risks a captcha, while the file
+    host URL behind it rarely changes. Entries expire after `ttl_seconds`; callers
+    are expected to check that a cached URL is still alive before trusting it.
+    The cache is a JSON file that is rewritten atomically on `save`.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def key(provider: str, link: str) -> str:
+        """Builds the cache key of a link; links are only unique per provider."""
+        return f"{provider}:{link}"
+
+    def get(self, key: str) -> str | None:
+        """
+        Returns the cached URL of a link.
+
+        Args:
+            key: The cache key, see `key`.
+
+        Returns:
+            The resolved URL, or None if the link is unknown or its entry expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                LINK_CACHE_LOOKUPS.inc(result="miss")
+                return None
+            if time.time() - entry["resolved_at"] > self.ttl_seconds:
+                del self._entries[key]
+                self._dirty = True
+                LINK_CACHE_LOOKUPS.inc(result="expired")
+                return None
+        LINK_CACHE_LOOKUPS.inc(result="hit")
+        return entry["url"]
+
+    def put(self, key: str, url: str) -> None:
+        """Stores a freshly resolved URL."""
+        with self._lock:
+            self._entries[key] = {"url": url, "resolved_at": time.time()}
+            self._dirty = True
+
+    def discard(self, key: str) -> None:
+        """Drops an entry whose URL turned out to be dead."""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._dirty = True
+                LINK_CACHE_LOOKUPS.inc(result="dead")
+
+    def save(self) -> None:
+        """Writes the cache to disk if it changed, dropping expired entries."""
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            entries = {
+                key: entry for key, entry in self._entries.items() if now - entry["resolved_at"] <= self.ttl_seconds
+            }
+            self._entries = entries
+            self._dirty = False
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False, indent=1)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            log(f"⚠️ Не удалось сохранить кэш ссылок: {e}", indent=1)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log(f"⚠️ Кэш ссылок поврежден и будет пересоздан: {e}")
+            return
+        if isinstance(data, dict):
+            self._entries = {
+                key: entry
+                for key, entry in cast(dict[str, Any], data).items()
+                if isinstance(entry, dict) and "url" in entry and "resolved_at" in entry
+            }
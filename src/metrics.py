@@ -0,0 +1,400 @@
+"""Prometheus-style metrics for the long-running monitor."""
+
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Generator, Sequence
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from src.utils import log
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+LabelValues = tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    """Formats a sample value the way the Prometheus text format expects it."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    """Escapes a label value for the text exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric(ABC):
+    """Base class for a metric family with an optional set of labels."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        """Turns keyword labels into an ordered tuple, validating the label names."""
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric {self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _label_str(self, key: LabelValues, extra: dict[str, str] | None = None) -> str:
+        """Renders the `{name="value",...}` part of a sample line."""
+        pairs = list(zip(self.label_names, key, strict=True))
+        if extra:
+            pairs.extend(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    @abstractmethod
+    def _samples(self) -> list[str]:
+        """The sample lines of the family; called with the lock held."""
+
+    def render(self) -> str:
+        """Renders the metric family in the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        # Unlabelled series are exported from the start so they read 0 rather than absent
+        self._values: dict[LabelValues, float] = {} if self.label_names else {(): 0.0}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increments the counter for the given labels."""
+        if amount < 0:
+            raise ValueError("Counters can only be incremented by non-negative amounts.")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Returns the current value for the given labels."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{self._label_str(key)} {_format_value(v)}" for key, v in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        # Unlabelled series are exported from the start so they read 0 rather than absent
+        self._values: dict[LabelValues, float] = {} if self.label_names else {(): 0.0}
+
+    def set(self, value: float, **labels: str) -> None:
+        """Sets the gauge to the given value."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increments the gauge."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        """Decrements the gauge."""
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        """Returns the current value for the given labels."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{self._label_str(key)} {_format_value(v)}" for key, v in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """A histogram with fixed, cumulative buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60),
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Records a single observation."""
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels: str) -> Generator[None]:
+        """Context manager that observes the duration of its body in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        """Returns the number of observations for the given labels."""
+        with self._lock:
+            counts = self._counts.get(self._key(labels))
+            return counts[-1] if counts else 0
+
+    def _samples(self) -> list[str]:
+        lines: list[str] = []
+        for key, counts in sorted(self._counts.items()):
+            for bound, count in zip(self.buckets, counts, strict=True):
+                le = self._label_str(key, {"le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_sum{self._label_str(key)} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{self._label_str(key)} {counts[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """A collection of metrics that can be rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register[M: _Metric](self, metric: M) -> M:
+        """Registers a metric and returns it for convenient module-level assignment."""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Renders all registered metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+CYCLE_DURATION = REGISTRY.register(
+    Histogram(
+        "drama_cycle_duration_seconds",
+        "Duration of a full check cycle over all series.",
+        buckets=(30, 60, 120, 300, 600, 1200, 1800, 3600, 7200),
+    )
+)
+SCRAPE_LATENCY = REGISTRY.register(
+    Histogram(
+        "drama_provider_scrape_seconds",
+        "Latency of provider browser operations.",
+        ("provider", "stage"),
+        buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+    )
+)
+DOWNLOAD_BYTES = REGISTRY.register(
+    Counter("drama_download_bytes_total", "Bytes downloaded per source.", ("source",)),
+)
+DOWNLOAD_THROUGHPUT = REGISTRY.register(
+    Histogram(
+        "drama_download_throughput_bytes_per_second",
+        "Average throughput of completed transfers per source.",
+        ("source",),
+        buckets=(64 * 1024, 256 * 1024, 1024**2, 4 * 1024**2, 16 * 1024**2, 64 * 1024**2, 256 * 1024**2),
+    )
+)
+DOWNLOADS = REGISTRY.register(
+    Counter("drama_downloads_total", "Finished download attempts per source and result.", ("source", "result")),
+)
+DOWNLOAD_RETRIES = REGISTRY.register(
+    Counter("drama_download_retries_total", "Download retries per source.", ("source",)),
+)
+LOW_SPEED_FALLBACKS = REGISTRY.register(
+    Counter("drama_low_speed_fallbacks_total", "Transfers abandoned because of low speed.", ("source",)),
+)
+TRANSFER_STREAMS = REGISTRY.register(
+    Gauge("drama_transfer_streams", "HTTP streams open on the shared transfer event loop."),
+)
+QUEUE_DEPTH = REGISTRY.register(
+    Gauge("drama_download_queue_depth", "Episodes waiting to be downloaded."),
+)
+PREEMPTIONS = REGISTRY.register(
+    Counter("drama_download_preemptions_total", "Transfers paused for a download of higher priority."),
+)
+BROWSER_RESTARTS = REGISTRY.register(
+    Counter("drama_browser_restarts_total", "Number of times the browser was (re)started."),
+)
+BROWSER_RECYCLES = REGISTRY.register(
+    Counter(
+        "drama_browser_recycles_total",
+        "Browser recycles over its memory or page limits by scope (contexts, browser).",
+        ("scope",),
+    )
+)
+BROWSER_RSS_BYTES = REGISTRY.register(
+    Gauge("drama_browser_rss_bytes", "Resident memory of the browser processes at the last sample."),
+)
+BROWSER_PAGES = REGISTRY.register(
+    Gauge("drama_browser_pages", "Pages open in the browser at the last sample."),
+)
+BROWSER_RSS_PEAK_BYTES = REGISTRY.register(
+    Gauge("drama_browser_rss_peak_bytes", "Highest resident memory of the browser processes in the last cycle."),
+)
+
+BLOCKED_REQUESTS = REGISTRY.register(
+    Counter(
+        "drama_browser_blocked_requests_total",
+        "Requests blocked by the lean browsing profile.",
+        ("provider", "resource_type"),
+    )
+)
+PAGE_BYTES = REGISTRY.register(
+    Counter("drama_browser_page_bytes_total", "Bytes received by the browser per provider.", ("provider",)),
+)
+LINK_CACHE_LOOKUPS = REGISTRY.register(
+    Counter(
+        "drama_link_cache_lookups_total",
+        "Lookups in the resolved-link cache by result (hit, miss, expired, dead).",
+        ("result",),
+    )
+)
+PREFETCHED_LINKS = REGISTRY.register(
+    Counter(
+        "drama_prefetched_links_total",
+        "Links resolved speculatively during downloads by result (resolved, failed, used).",
+        ("result",),
+    )
+)
+STORAGE_STATE_LOADS = REGISTRY.register(
+    Counter(
+        "drama_storage_state_loads_total",
+        "Loads of a persisted browser storage state by result (hit, miss, expired).",
+        ("result",),
+    )
+)
+STORAGE_STATE_CHALLENGES = REGISTRY.register(
+    Counter(
+        "drama_storage_state_challenges_total",
+        "Challenge pages that made the browser storage state of a provider refresh.",
+        ("provider",),
+    )
+)
+
+LEASE_CLAIMS = REGISTRY.register(
+    Counter(
+        "drama_lease_claims_total",
+        "Claims of a download job lease shared between instances by result (claimed, taken).",
+        ("result",),
+    ),
+)
+LEASES_HELD = REGISTRY.register(
+    Gauge("drama_leases_held", "Work items of a group (series) leased by this instance.", ("group",)),
+)
+
+POSTPROCESS_SECONDS = REGISTRY.register(
+    Histogram(
+        "drama_postprocess_step_seconds",
+        "Duration of the post-processing steps of finished episodes.",
+        ("step",),
+        buckets=(0.1, 1, 5, 15, 60, 300, 900, 3600),
+    )
+)
+POSTPROCESS_JOBS = REGISTRY.register(
+    Counter(
+        "drama_postprocess_jobs_total",
+        "Post-processed episodes by result (done, failed, dropped).",
+        ("result",),
+    ),
+)
+POSTPROCESS_QUEUE = REGISTRY.register(
+    Gauge("drama_postprocess_queue_depth", "Finished episodes waiting for a post-processing worker."),
+)
+
+DISK_FREE_BYTES = REGISTRY.register(
+    Gauge("drama_disk_free_bytes", "Free bytes on a download volume at the last admission check.", ("volume",)),
+)
+DISK_RESERVED_BYTES = REGISTRY.register(
+    Gauge("drama_disk_reserved_bytes", "Bytes reserved on a download volume for running transfers.", ("volume",)),
+)
+DISK_ADMISSIONS = REGISTRY.register(
+    Counter(
+        "drama_disk_admissions_total",
+        "Transfers checked against free disk space by result (admitted, held).",
+        ("result",),
+    ),
+)
+
+CIRCUIT_TRIPS = REGISTRY.register(
+    Counter("drama_circuit_trips_total", "Times the circuit breaker of a host opened.", ("host",)),
+)
+CIRCUIT_OPEN = REGISTRY.register(
+    Gauge("drama_circuit_open", "Whether the circuit breaker of a host is open (1) or closed (0).", ("host",)),
+)
+
+
+def start_metrics_server(host: str = "127.0.0.1", port: int = 9108) -> "ThreadingHTTPServer":
+    """
+    Starts an HTTP server exposing the metrics registry in a daemon thread.
+
+    Args:
+        host: The interface to bind to.
+        port: The port to listen on. Use 0 to pick a free port.
+
+    Returns:
+        The running server; call `shutdown()` to stop it.
+    """
+    # http.server is only imported when the endpoint is enabled
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Serves the registry on `/metrics`."""
+
+        registry: MetricsRegistry = REGISTRY
+
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = self.registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            """Silences the default per-request stderr logging."""
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    log(f"📈 Метрики доступны на http://{host}:{server.server_address[1]}/metrics")
+    return server
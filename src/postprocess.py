@@ -0,0 +1,333 @@
+"""Post-processing of finished episodes (validation, remux, renaming) on a process pool."""
+
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+from functools import partial
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, cast
+
+from src.constants import (
+    DEFAULT_POSTPROCESS_WORKERS,
+    DEFAULT_RENAME_TEMPLATE,
+    POSTPROCESS_MAX_QUEUED,
+    POSTPROCESS_STEP_TIMEOUT_SECONDS,
+)
+from src.download_index import EPISODE_FILE_RE
+from src.metrics import POSTPROCESS_JOBS, POSTPROCESS_QUEUE, POSTPROCESS_SECONDS
+from src.utils import log
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+
+@dataclass(frozen=True)
+class EpisodeFile:
+    """A finished episode handed to post-processing."""
+
+    path: str
+    series: str
+    season: int
+    episode: int
+    # The download directory, the root of the naming template
+    download_dir: str
+
+
+class PostProcessError(Exception):
+    """A step rejected a file or could not process it."""
+
+
+# A step receives the file and its options from the config and returns the file's new path
+Step = Callable[[EpisodeFile, dict[str, Any]], str]
+
+# The built-in steps. Entries are import paths ("module:function"), like any custom step
+# given in the config, so a step is only imported by the worker process that runs it.
+STEP_REGISTRY: dict[str, str] = {
+    "validate": "src.postprocess:validate",
+    "remux": "src.postprocess:remux",
+    "rename": "src.postprocess:rename",
+}
+
+
+def load_step(name: str) -> Step:
+    """
+    Looks up a step by its name in `STEP_REGISTRY` or by its import path.
+
+    Raises:
+        PostProcessError: If the step cannot be imported.
+    """
+    module_name, _, function_name = STEP_REGISTRY.get(name, name).partition(":")
+    try:
+        return cast(Step, getattr(import_module(module_name), function_name))
+    except (ImportError, AttributeError, ValueError) as e:
+        raise PostProcessError(f"unknown step {name}: {e}") from e
+
+
+def validate(file: EpisodeFile, options: dict[str, Any]) -> str:
+    """Checks with ffprobe that the file has a video stream and a duration."""
+    ffprobe = options.get("ffprobe", "ffprobe")
+    output = _run(
+        [ffprobe, "-v", "error", "-show_entries", "format=duration:stream=codec_type", "-of", "json", file.path]
+    )
+    try:
+        probe = json.loads(output)
+        duration = float(probe.get("format", {}).get("duration", 0))
+    except ValueError as e:
+        raise PostProcessError(f"ffprobe returned unreadable output: {e}") from e
+    if duration <= 0 or not any(stream.get("codec_type") == "video" for stream in probe.get("streams", [])):
+        raise PostProcessError("the file has no video stream or no duration")
+    return file.path
+
+
+def remux(file: EpisodeFile, options: dict[str, Any]) -> str:
+    """
+    Copies all streams of the file into another container without re-encoding.
+
+    Options:
+        container: The extension of the target container (default "mkv").
+    """
+    container = options.get("container", "mkv").lstrip(".")
+    folder, name = os.path.split(file.path)
+    stem, extension = os.path.splitext(name)
+    if extension.lstrip(".").lower() == container.lower():
+        return file.path
+    target = os.path.join(folder, f"{stem}.{container}")
+    # Hidden, so the download index never mistakes the unfinished output for the episode
+    temp_path = os.path.join(folder, f".{stem}.remux.{container}")
+    ffmpeg = options.get("ffmpeg", "ffmpeg")
+    try:
+        _run([ffmpeg, "-v", "error", "-y", "-i", file.path, "-map", "0", "-c", "copy", temp_path])
+        os.replace(temp_path, target)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    os.remove(file.path)
+    return target
+
+
+def rename(file: EpisodeFile, options: dict[str, Any]) -> str:
+    """
+    Moves the file to the path given by a naming template, atomically.
+
+    The template is relative to the download directory and may use {series},
+    {season}, {episode}, {name} (the current file name without extension) and
+    {ext} (its extension with the dot). A file already at the target is an error.
+    When the target is on another volume, the file is copied next to the target
+    first, so the target never holds a partial file.
+
+    Options:
+        template: The naming template.
+    """
+    stem, extension = os.path.splitext(os.path.basename(file.path))
+    relative = options.get("template", DEFAULT_RENAME_TEMPLATE).format(
+        series=file.series, season=file.season, episode=file.episode, name=stem, ext=extension
+    )
+    target = os.path.join(file.download_dir, relative)
+    if os.path.abspath(target) == os.path.abspath(file.path):
+        return file.path
+    if os.path.exists(target):
+        raise PostProcessError(f"{target} already exists")
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    try:
+        os.link(file.path, target)
+    except FileExistsError as e:
+        raise PostProcessError(f"{target} already exists") from e
+    except OSError:
+        # Another volume, or no hard links: copy beside the target and move it into place
+        temp_path = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.tmp")
+        shutil.copy2(file.path, temp_path)
+        os.replace(temp_path, target)
+    os.remove(file.path)
+    return target
+
+
+def check_rename_template(template: str) -> None:
+    """
+    Checks that a rename template keeps episodes where the download index finds them,
+    at "<series>/<series> - SxxEyy<ext>" in the download directory.
+
+    Raises:
+        PostProcessError: If the template is malformed or leads elsewhere.
+    """
+    try:
+        relative = template.format(series="Series", season=1, episode=2, name="file", ext=".mkv")
+    except (KeyError, IndexError, ValueError) as e:
+        raise PostProcessError(f"malformed template {template!r}: {e}") from e
+    folder, name = os.path.split(os.path.normpath(relative))
+    match = EPISODE_FILE_RE.match(name)
+    if (
+        folder != "Series"
+        or match is None
+        or (match["series"], int(match["season"]), int(match["episode"])) != ("Series", 1, 2)
+    ):
+        raise PostProcessError(f"template {template!r} leaves the <series>/<series> - SxxEyy layout")
+
+
+def run_steps(file: EpisodeFile, steps: list[dict[str, Any]]) -> tuple[str, list[tuple[str, float]]]:
+    """
+    Runs the steps on a file, in the worker process.
+
+    Returns:
+        The final path of the file and the seconds each step took.
+
+    Raises:
+        PostProcessError: If a step failed; later steps are not run.
+    """
+    timings: list[tuple[str, float]] = []
+    for step in steps:
+        options = {key: value for key, value in step.items() if key != "name"}
+        start = time.perf_counter()
+        try:
+            path = load_step(step["name"])(file, options)
+        except (PostProcessError, OSError) as e:
+            raise PostProcessError(f"{step['name']}: {e}") from None
+        timings.append((step["name"], time.perf_counter() - start))
+        file = replace(file, path=path)
+    return file.path, timings
+
+
+class PostProcessor:
+    """
+    Runs the post-processing steps of `settings.postprocess` on finished episodes.
+
+    Steps run in a pool of worker processes at a lowered CPU priority, so remuxing or
+    a CPU-heavy custom step never slows down the downloads or the browser of the
+    monitor. Episodes wait in a queue of their own while every worker is busy;
+    beyond `POSTPROCESS_MAX_QUEUED` of them an episode is left as it is. Episodes
+    still queued when the monitor stops also stay as they were downloaded.
+    """
+
+    def __init__(self) -> None:
+        self._steps: list[dict[str, Any]] = []
+        self._workers = DEFAULT_POSTPROCESS_WORKERS
+        self._pool: ProcessPoolExecutor | None = None
+        self._pending: deque[tuple[EpisodeFile, float]] = deque()
+        self._running = 0
+        self._idle = threading.Condition()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._steps)
+
+    def configure(self, postprocess_settings: dict[str, Any]) -> None:
+        """Sets the steps and the number of worker processes from `settings.postprocess`."""
+        steps: list[dict[str, Any]] = []
+        if postprocess_settings.get("enable", False):
+            for entry in postprocess_settings.get("steps", []):
+                step: dict[str, Any] = {"name": entry} if isinstance(entry, str) else dict(entry)
+                if step["name"] == "rename":
+                    # A renamed episode must stay visible to the download index
+                    try:
+                        check_rename_template(step.get("template", DEFAULT_RENAME_TEMPLATE))
+                    except PostProcessError as e:
+                        log(f"❌ Шаг rename пропущен: {e}")
+                        continue
+                steps.append(step)
+        workers = max(1, int(postprocess_settings.get("workers", DEFAULT_POSTPROCESS_WORKERS)))
+        with self._idle:
+            if workers != self._workers and self._pool is not None:
+                # Running steps finish in the old pool
+                self._pool.shutdown(wait=False)
+                self._pool = None
+            self._steps, self._workers = steps, workers
+
+    def submit(self, file: EpisodeFile) -> None:
+        """Queues a finished episode; never blocks."""
+        with self._idle:
+            if not self._steps:
+                return
+            if len(self._pending) >= POSTPROCESS_MAX_QUEUED:
+                POSTPROCESS_JOBS.inc(result="dropped")
+                log(f"⚠️ Очередь постобработки переполнена, {os.path.basename(file.path)} оставлен как есть.", indent=1)
+                return
+            self._pending.append((file, time.perf_counter()))
+            self._start_next()
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """Waits until every queued episode was processed; False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending and not self._running, timeout)
+
+    def shutdown(self) -> None:
+        """Stops the workers; queued episodes are left as they are."""
+        with self._idle:
+            self._pending.clear()
+            POSTPROCESS_QUEUE.set(0)
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _start_next(self) -> None:
+        """Hands queued episodes to idle workers; called with the lock held."""
+        while self._pending and self._running < self._workers:
+            file, queued_at = self._pending.popleft()
+            if self._pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                # Spawned, not forked: a fork would copy the monitor's threads (browser, downloads) mid-state
+                self._pool = ProcessPoolExecutor(
+                    self._workers, mp_context=multiprocessing.get_context("spawn"), initializer=_lower_priority
+                )
+            try:
+                future = self._pool.submit(run_steps, file, self._steps)
+            except RuntimeError:
+                # A worker died and broke the pool (BrokenProcessPool); the next episode gets a new one
+                self._pool.shutdown(wait=False)
+                self._pool = None
+                raise
+            self._running += 1
+            future.add_done_callback(partial(self._finished, file, queued_at))
+        POSTPROCESS_QUEUE.set(len(self._pending))
+
+    def _finished(
+        self, file: EpisodeFile, queued_at: float, future: "Future[tuple[str, list[tuple[str, float]]]]"
+    ) -> None:
+        name = os.path.basename(file.path)
+        try:
+            path, timings = future.result()
+        except Exception as e:
+            POSTPROCESS_JOBS.inc(result="failed")
+            log(f"❌ Постобработка {name} не удалась: {e}", indent=1)
+        else:
+            POSTPROCESS_JOBS.inc(result="done")
+            for step, seconds in timings:
+                POSTPROCESS_SECONDS.observe(seconds, step=step)
+            waited = time.perf_counter() - queued_at - sum(seconds for _, seconds in timings)
+            summary = ", ".join(f"{step} {seconds:.1f} с" for step, seconds in timings)
+            log(f"🎞️ Постобработка {name} → {os.path.basename(path)}: {summary} (в очереди {waited:.1f} с)", indent=1)
+        with self._idle:
+            self._running -= 1
+            self._start_next()
+            self._idle.notify_all()
+
+
+def _run(command: list[str]) -> str:
+    """Runs a tool of a step and returns its output."""
+    import subprocess
+
+    try:
+        result = subprocess.run(
+            command, capture_output=True, text=True, timeout=POSTPROCESS_STEP_TIMEOUT_SECONDS, check=False
+        )
+    except FileNotFoundError as e:
+        raise PostProcessError(f"{command[0]} is not installed") from e
+    except subprocess.TimeoutExpired as e:
+        raise PostProcessError(f"{command[0]} timed out") from e
+    if result.returncode != 0:
+        raise PostProcessError(f"{command[0]} failed: {result.stderr.strip()[-500:]}")
+    return result.stdout
+
+
+def _lower_priority() -> None:
+    """Lets the monitor process win the CPU over post-processing."""
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+
+POSTPROCESS = PostProcessor()
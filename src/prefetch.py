@@ -0,0 +1,108 @@
+"""Speculative resolution of provider links while a download runs."""
+
+import time
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING, TypeVar
+
+from src.circuit import BREAKERS
+from src.constants import PREFETCH_BATCH_SIZE
+from src.download_queue import run_in_background
+from src.metrics import PREFETCHED_LINKS
+from src.tracing import span
+
+if TYPE_CHECKING:
+    from src.providers.base import BaseProvider
+
+T = TypeVar("T")
+
+
+class Prefetcher:
+    """
+    Resolves the links the download queue will need next, while a download runs.
+
+    Without it a fallback source is only resolved after the source before it failed,
+    and the next episode's link after the current episode finished, each paying a
+    browser round trip while nothing downloads. Here the download runs on a worker
+    thread and the monitor thread, which owns the browser, resolves the queued links
+    meanwhile. Results live for `ttl_seconds`, since redirect targets of some hosts
+    are signed and expire.
+    """
+
+    def __init__(
+        self,
+        provider: "BaseProvider",
+        series_url: str,
+        ttl_seconds: float,
+        on_resolved: Callable[[str, str], None] | None = None,
+    ):
+        self.provider = provider
+        self.series_url = series_url
+        self.ttl_seconds = ttl_seconds
+        self.on_resolved = on_resolved
+        self._pending: list[str] = []
+        self._resolved: dict[str, tuple[str, float]] = {}
+        self._attempted: set[str] = set()
+
+    def queue(self, links: Iterable[str]) -> None:
+        """Adds links to resolve, in the order they will be needed."""
+        for link in links:
+            if link not in self._attempted and link not in self._pending:
+                self._pending.append(link)
+
+    def take(self, link: str) -> str | None:
+        """Returns and forgets the prefetched URL of a link, unless it expired."""
+        entry = self._resolved.pop(link, None)
+        if entry is None or time.monotonic() - entry[1] > self.ttl_seconds:
+            return None
+        PREFETCHED_LINKS.inc(result="used")
+        return entry[0]
+
+    def run_while(self, work: Callable[[], T], idle: Callable[[], bool] | None = None) -> T:
+        """
+        Runs `work` on a worker thread and resolves queued links until it returns.
+
+        Args:
+            work: The download.
+            idle: Further browser work done once no link is left to resolve; it
+                returns False when it has nothing left to do.
+
+        Returns:
+            The result of `work`; its exception is raised here.
+        """
+
+        def step() -> bool:
+            if self._pending:
+                self._resolve_next()
+                return True
+            return idle is not None and idle()
+
+        return run_in_background(work, step)
+
+    def _resolve_next(self) -> None:
+        """Resolves the next batch of queued links in the browser."""
+        if not BREAKERS.allow(self.series_url):
+            self._pending.clear()
+            return
+        batch_size = PREFETCH_BATCH_SIZE if self.provider.capabilities.batch_resolve else 1
+        batch, self._pending = self._pending[:batch_size], self._pending[batch_size:]
+        self._attempted.update(batch)
+        with span("prefetch", provider=self.provider.name, links=len(batch)):
+            try:
+                # `scan_next` may have loaded another series into the shared page meanwhile
+                self.provider.show_series_page(self.series_url)
+                if len(batch) > 1:
+                    resolved = self.provider.resolve_download_urls(batch)
+                else:
+                    resolved = {batch[0]: self.provider.resolve_download_url(batch[0])}
+            except Exception:
+                # Speculative work; the link is resolved again when it is actually needed
+                PREFETCHED_LINKS.inc(len(batch), result="failed")
+                return
+        now = time.monotonic()
+        for link, url in resolved.items():
+            self._resolved[link] = (url, now)
+            if self.on_resolved is not None:
+                self.on_resolved(link, url)
+        PREFETCHED_LINKS.inc(len(resolved), result="resolved")
+        if len(resolved) < len(batch):
+            PREFETCHED_LINKS.inc(len(batch) - len(resolved), result="failed")
@@ -0,0 +1,95 @@
+"""Memory accounting of the browser processes Playwright starts below the monitor."""
+
+import os
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Playwright starts Chromium's browser process with this flag; its renderers and
+# helpers are started by the browser process without it
+BROWSER_PROCESS_FLAG = b"--remote-debugging-pipe"
+
+
+def _children_by_parent() -> dict[int, list[int]]:
+    """The child processes of every process, read from /proc; empty where /proc is missing."""
+    parents: dict[int, list[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return parents
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            # The process exited meanwhile
+            continue
+        # The command name in parentheses may itself contain spaces and parentheses
+        fields = stat[stat.rfind(")") + 2 :].split()
+        parents.setdefault(int(fields[1]), []).append(int(entry))
+    return parents
+
+
+def _descendants(parents: dict[int, list[int]], pid: int) -> list[int]:
+    found: list[int] = []
+    pending = [pid]
+    while pending:
+        children = parents.get(pending.pop(), [])
+        found.extend(children)
+        pending.extend(children)
+    return found
+
+
+def child_pids(pid: int) -> list[int]:
+    """All descendants of a process, read from /proc; empty where /proc is missing."""
+    return _descendants(_children_by_parent(), pid)
+
+
+def _browser_pids(parents: dict[int, list[int]], pid: int) -> list[int]:
+    """
+    The browser processes below a process.
+
+    The browser is not a child of the monitor but of the Playwright driver, and its
+    pid is not exposed by Playwright, so it is recognized by `BROWSER_PROCESS_FLAG`
+    on its command line.
+    """
+    found: list[int] = []
+    for child in _descendants(parents, pid):
+        try:
+            with open(f"/proc/{child}/cmdline", "rb") as f:
+                arguments = f.read().split(b"\0")
+        except OSError:
+            continue
+        if BROWSER_PROCESS_FLAG in arguments:
+            found.append(child)
+    return found
+
+
+def browser_rss_bytes(pid: int | None = None) -> int | None:
+    """
+    The resident memory of the browser processes below a process and their descendants.
+
+    Chromium runs as a browser process with one renderer per site and a few helper
+    processes, all started by the browser process, so the sum over that tree is what
+    the browser costs. The other processes of the monitor (the Playwright driver,
+    post-processing workers, ffmpeg, yt-dlp) are not counted.
+
+    Args:
+        pid: The process the browsers run below, by default the monitor itself.
+
+    Returns:
+        The bytes, or None where /proc is not available.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    parents = _children_by_parent()
+    total = 0
+    for browser in _browser_pids(parents, os.getpid() if pid is None else pid):
+        for process in [browser, *_descendants(parents, browser)]:
+            try:
+                with open(f"/proc/{process}/statm") as f:
+                    total += int(f.read().split()[1]) * _PAGE_SIZE
+            except (OSError, IndexError, ValueError):
+                continue
+    return total
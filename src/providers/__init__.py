@@ -1,31 +1,81 @@
-from playwright.sync_api import Page
+from collections.abc import Iterable, Iterator
+from urllib.parse import urlparse
 
 from src.providers.base import BaseProvider
 from src.providers.filecrypt import FileCryptProvider
 from src.providers.viewcrate import ViewCrateProvider
 
+
+class ProviderRegistry:
+    """
+    The available providers, indexed by the hostnames they serve.
+
+    A URL is matched by looking up its host, then each parent domain, in the index built
+    from the providers' `domains`; `can_handle_url` only decides between the providers
+    found there. Text elsewhere in the URL (a query parameter naming another site) never
+    selects a provider.
+    """
+
+    def __init__(self, providers: Iterable[type[BaseProvider]] = ()):
+        self._providers: list[type[BaseProvider]] = []
+        self._by_host: dict[str, list[type[BaseProvider]]] = {}
+        for provider_class in providers:
+            self.register(provider_class)
+
+    def register(self, provider_class: type[BaseProvider], first: bool = False) -> None:
+        """
+        Adds a provider.
+
+        Args:
+            provider_class: The provider class.
+            first: Give it precedence over the providers already registered for its hosts.
+        """
+        self._providers.insert(0 if first else len(self._providers), provider_class)
+        for domain in provider_class.domains:
+            candidates = self._by_host.setdefault(domain.lower(), [])
+            candidates.insert(0 if first else len(candidates), provider_class)
+
+    def unregister(self, provider_class: type[BaseProvider]) -> None:
+        """Removes a provider."""
+        self._providers.remove(provider_class)
+        for domain in provider_class.domains:
+            candidates = self._by_host.get(domain.lower(), [])
+            if provider_class in candidates:
+                candidates.remove(provider_class)
+
+    def find(self, url: str) -> type[BaseProvider] | None:
+        """Returns the provider class that handles a URL, or None."""
+        host = (urlparse(url).hostname or "").lower()
+        while host:
+            for provider_class in self._by_host.get(host, ()):
+                if provider_class.can_handle_url(url):
+                    return provider_class
+            _, _, host = host.partition(".")
+        return None
+
+    def by_name(self, name: str) -> type[BaseProvider] | None:
+        """Returns the provider class with the given `name`, or None."""
+        return next((p for p in self._providers if p.name == name), None)
+
+    def __iter__(self) -> Iterator[type[BaseProvider]]:
+        return iter(list(self._providers))
+
+    def __len__(self) -> int:
+        return len(self._providers)
+
+
 # A registry of all available providers
-PROVIDER_REGISTRY: list[type[BaseProvider]] = [
-    FileCryptProvider,
-    ViewCrateProvider,
-]
+PROVIDER_REGISTRY = ProviderRegistry([FileCryptProvider, ViewCrateProvider])
 
 
-def get_provider(url: str, page: Page) -> BaseProvider:
+def find_provider_class(url: str) -> type[BaseProvider] | None:
     """
-    Factory function to get a provider instance based on the URL.
+    Finds the provider class that handles the given URL.
 
     Args:
         url: The URL of the series.
-        page: The Playwright Page to use for the provider.
 
     Returns:
-        An instance of the appropriate provider.
-
-    Raises:
-        ValueError: If no suitable provider is found for the given URL.
+        The provider class, or None if no provider handles the URL.
     """
-    for provider_class in PROVIDER_REGISTRY:
-        if provider_class.can_handle_url(url):
-            return provider_class(page)
-    raise ValueError(f"No suitable provider found for URL: {url}")
+    return PROVIDER_REGISTRY.find(url)
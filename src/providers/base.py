@@ -1,33 +1,85 @@
 from abc import ABC, abstractmethod
 from collections.abc import Sequence
+from typing import TYPE_CHECKING, ClassVar
+from urllib.parse import urlparse
 
-from playwright.sync_api import Page
+from src.constants import CHALLENGE_PAGE_MARKERS, CHALLENGE_WAIT_SECONDS
+from src.metrics import SCRAPE_LATENCY
+from src.providers.types import EpisodeIndex, ProviderCapabilities
+from src.tracing import span
+from src.utils import host_matches
 
-from src.providers.types import Episode
+if TYPE_CHECKING:
+    from playwright.sync_api import Page
+
+
+class ChallengeError(ValueError):
+    """Raised when a provider page stays on an anti-bot challenge instead of its content."""
+
+
+def is_host_fault(error: BaseException) -> bool:
+    """
+    Whether a failed provider request is the fault of the provider's host.
+
+    A challenge, a connection error, a timed-out or failed navigation and a 5xx or 429
+    answer count against the host. A missing button, an unparsable page or a timeout
+    waiting for one link's element are about that link, and the host that served
+    the page is up.
+    """
+    import requests
+    from playwright.sync_api import Error as PlaywrightError
+
+    if isinstance(error, ChallengeError):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = error.response
+        return response is None or response.status_code >= 500 or response.status_code == 429
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, PlaywrightError):
+        # The message starts with the API call that failed, e.g. "Page.goto: Timeout 30000ms exceeded."
+        return "net::ERR_" in error.message or error.message.startswith(("Page.goto", "Page.reload"))
+    return False
 
 
 class BaseProvider(ABC):
     """Abstract base class for a series provider."""
 
-    def __init__(self, page: Page):
+    # Short provider name used in logs and metric labels
+    name: ClassVar[str] = "base"
+
+    # Domains the provider's own pages live on, including mirrors and aliases. Series
+    # URLs are matched to providers by these (and their subdomains).
+    domains: ClassVar[tuple[str, ...]] = ()
+
+    # What the provider supports, so work can be planned before a page is opened
+    capabilities: ClassVar[ProviderCapabilities] = ProviderCapabilities()
+
+    # Third-party hosts that must stay reachable in the lean browsing profile
+    allowed_hosts: ClassVar[tuple[str, ...]] = ()
+
+    def __init__(self, page: "Page"):
         self.page = page
+        # The series URL last loaded and the URL the page ended up on
+        self._series_page: tuple[str, str] | None = None
 
     @classmethod
-    @abstractmethod
     def can_handle_url(cls, url: str) -> bool:
         """
         Check if the provider can handle the given URL.
 
+        The default accepts URLs whose host is one of `domains` or a subdomain of one.
+
         Args:
             url: The URL to check.
 
         Returns:
             True if the provider can handle the URL, False otherwise.
         """
-        pass
+        return host_matches((urlparse(url).hostname or "").lower(), cls.domains)
 
     @abstractmethod
-    def get_series_episodes(self, url: str) -> Sequence[Episode]:
+    def get_series_episodes(self, url: str) -> EpisodeIndex:
         """
         Get the list of all episodes for a series.
 
@@ -35,9 +87,22 @@ class BaseProvider(ABC):
             url: The URL of the series page to fetch episodes from.
 
         Returns:
-            A list of dictionaries, where each dictionary represents an
-            episode and contains details like season, episode number, and
-            download link.
+            The episode links, grouped by episode and ordered by source priority.
+        """
+        pass
+
+    @classmethod
+    @abstractmethod
+    def parse_episodes(cls, html_content: str, page_url: str | None = None) -> EpisodeIndex:
+        """
+        Parse the episodes out of a fetched series page.
+
+        Args:
+            html_content: The HTML of the series page.
+            page_url: The URL the page was loaded from, used to build absolute links.
+
+        Returns:
+            The episode links found on the page.
         """
         pass
 
@@ -53,3 +118,87 @@ class BaseProvider(ABC):
             The final, direct download URL.
         """
         pass
+
+    def get_download_urls(self, episode_links: Sequence[str]) -> dict[str, str]:
+        """
+        Resolve the final download URLs for many episodes at once.
+
+        The default resolves the links one by one with `get_download_url`; providers
+        override it with something cheaper.
+
+        Args:
+            episode_links: The initial links of the episodes.
+
+        Returns:
+            A mapping of initial link to final URL. Links that could not be resolved
+            are left out, so the caller can retry them with `get_download_url`.
+        """
+        resolved: dict[str, str] = {}
+        for link in episode_links:
+            try:
+                resolved[link] = self.get_download_url(link)
+            except Exception:
+                continue
+        return resolved
+
+    def own_hosts(self) -> tuple[str, ...]:
+        """The provider's domains plus the host of the currently loaded page (which may be a mirror)."""
+        page_host = urlparse(self.page.url).hostname
+        return self.domains + ((page_host,) if page_host else ())
+
+    def on_challenge_page(self) -> bool:
+        """Checks whether the page shows an anti-bot challenge or captcha."""
+        html = self.page.content().lower()
+        return any(marker in html for marker in CHALLENGE_PAGE_MARKERS)
+
+    def fetch_series_episodes(self, url: str) -> EpisodeIndex:
+        """
+        Calls `get_series_episodes` and records its latency.
+
+        A page without episodes that shows a challenge is given `CHALLENGE_WAIT_SECONDS`
+        to clear by itself (non-interactive challenges redirect once they pass), then
+        loaded again.
+
+        Raises:
+            ChallengeError: The challenge did not clear.
+        """
+        with SCRAPE_LATENCY.time(provider=self.name, stage="episodes"), span("provider.episodes", provider=self.name):
+            episodes = self.get_series_episodes(url)
+            if episodes or not self.on_challenge_page():
+                self._series_page = (url, self.page.url)
+                return episodes
+            for _ in range(CHALLENGE_WAIT_SECONDS):
+                self.page.wait_for_timeout(1000)
+                if not self.on_challenge_page():
+                    episodes = self.get_series_episodes(url)
+                    self._series_page = (url, self.page.url)
+                    return episodes
+        raise ChallengeError(f"The page stayed on an anti-bot challenge: {self.page.url}")
+
+    def show_series_page(self, url: str) -> None:
+        """
+        Loads a series page again unless the page still shows it.
+
+        All series of a provider share one page, so by the time a link is resolved
+        another series (or, for some providers, the resolution of another link) may
+        have replaced the page it was found on. Providers with
+        `capabilities.series_page_resolve` need that page, the others do nothing.
+        """
+        if not self.capabilities.series_page_resolve or self._series_page == (url, self.page.url):
+            return
+        with span("provider.reload", provider=self.name, url=url):
+            self.get_series_episodes(url)
+        self._series_page = (url, self.page.url)
+
+    def resolve_download_url(self, episode_link: str) -> str:
+        """Calls `get_download_url` and records its latency."""
+        with SCRAPE_LATENCY.time(provider=self.name, stage="resolve"), span("provider.resolve", provider=self.name):
+            return self.get_download_url(episode_link)
+
+    def resolve_download_urls(self, episode_links: Sequence[str]) -> dict[str, str]:
+        """Calls `get_download_urls` and records its latency."""
+        with (
+            SCRAPE_LATENCY.time(provider=self.name, stage="resolve_batch"),
+            span("provider.resolve_batch", provider=self.name, links=len(episode_links)),
+        ):
+            return self.get_download_urls(episode_links)
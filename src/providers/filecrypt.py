@@ -1,29 +1,44 @@
 import re
+from collections.abc import Sequence
 from typing import cast
+from urllib.parse import urlparse
 
-from bs4 import BeautifulSoup, Tag
-
-from src.constants import FILECRYPT_LINK_URL_TEMPLATE
+from src.constants import FILECRYPT_BASE_URL, FILECRYPT_LINK_URL_TEMPLATE
 from src.downloaders import DOWNLOADER_REGISTRY
 from src.providers.base import BaseProvider
-from src.providers.types import Episode
+from src.providers.redirects import resolve_redirects
+from src.providers.types import Episode, EpisodeIndex, ProviderCapabilities
+from src.tracing import span
 
 
 class FileCryptProvider(BaseProvider):
     """Provider for filecrypt.cc links."""
 
-    @classmethod
-    def can_handle_url(cls, url: str) -> bool:
-        """Check if the provider can handle the given URL."""
-
-        return "filecrypt.cc" in url
+    name = "filecrypt"
+    domains = ("filecrypt.cc", "filecrypt.co")
+    allowed_hosts = ("challenges.cloudflare.com",)
+    # Link pages are opened with the container page as referrer
+    capabilities = ProviderCapabilities(http_resolve=True, batch_resolve=True, series_page_resolve=True)
 
-    def get_series_episodes(self, url: str) -> list[Episode]:
+    def get_series_episodes(self, url: str) -> EpisodeIndex:
         """Finds links to all episodes for a series from a filecrypt.cc page."""
-        self.page.goto(url)
-        html_content = self.page.content()
+        with span("provider.fetch", provider=self.name, url=url):
+            self.page.goto(url)
+            html_content = self.page.content()
+        with span("provider.parse", profile=True, provider=self.name):
+            return self.parse_episodes(html_content, url)
+
+    @classmethod
+    def parse_episodes(cls, html_content: str, page_url: str | None = None) -> EpisodeIndex:
+        """Parses the episode table of a filecrypt.cc container page."""
+        from bs4 import BeautifulSoup, Tag
+
+        base_url = FILECRYPT_BASE_URL
+        if page_url:
+            parsed = urlparse(page_url)
+            base_url = f"{parsed.scheme}://{parsed.netloc}"
         soup = BeautifulSoup(html_content, "html.parser")
-        all_episodes: list[Episode] = []
+        all_episodes = EpisodeIndex()
 
         for row in soup.find_all("tr", class_="kwj3"):
             row = cast(Tag, row)
@@ -62,8 +77,8 @@ class FileCryptProvider(BaseProvider):
                 )
                 if data_attribute is not None:
                     link_id = download_button.get(data_attribute)
-                    filecrypt_link = FILECRYPT_LINK_URL_TEMPLATE.format(link_id=link_id)
-                    all_episodes.append(
+                    filecrypt_link = FILECRYPT_LINK_URL_TEMPLATE.format(base_url=base_url, link_id=link_id)
+                    all_episodes.add(
                         Episode(
                             season=season_num,
                             episode=episode_num,
@@ -72,9 +87,28 @@ class FileCryptProvider(BaseProvider):
                             source=source,
                         )
                     )
-        return sorted(all_episodes, key=lambda x: x.episode)
+        return all_episodes
 
     def get_download_url(self, episode_link: str) -> str:
-        """Resolves the intermediate redirect to get the final download URL."""
-        self.page.goto(episode_link)
-        return self.page.url
+        """
+        Resolves the intermediate redirect to get the final download URL. The link is
+        followed in a scratch page, so the container page stays loaded for the next link.
+        """
+        scratch = self.page.context.new_page()
+        try:
+            scratch.goto(episode_link, referer=self.page.url)
+            return scratch.url
+        finally:
+            scratch.close()
+
+    def get_download_urls(self, episode_links: Sequence[str]) -> dict[str, str]:
+        """
+        Resolves the link pages concurrently over HTTP with the page's cookies, reading
+        the redirect target instead of rendering it. Links that need the browser (for
+        example behind a challenge) fall back to one navigation each.
+        """
+        resolved = resolve_redirects(self.page.context, episode_links, self.own_hosts())
+        missing = [link for link in episode_links if link not in resolved]
+        if missing:
+            resolved.update(super().get_download_urls(missing))
+        return resolved
@@ -0,0 +1,107 @@
+"""Resolution of provider redirect pages over plain HTTP."""
+
+import re
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+from urllib.parse import urljoin, urlparse
+
+from src.constants import (
+    BROWSER_USER_AGENT,
+    REDIRECT_MAX_HOPS,
+    REDIRECT_SNIFF_BYTES,
+    REDIRECT_TIMEOUT_SECONDS,
+    REDIRECT_WORKERS,
+)
+from src.utils import host_matches
+
+if TYPE_CHECKING:
+    import requests
+    from playwright.sync_api import BrowserContext
+
+# Script and meta-refresh redirects used by interstitial pages
+JS_REDIRECT_RE = re.compile(r"""(?:window\.|top\.|self\.|document\.)?location(?:\.href)?\s*=\s*["']([^"']+)["']""")
+META_REFRESH_RE = re.compile(r"""<meta[^>]+http-equiv=["']?refresh["']?[^>]*url=([^"'>\s]+)""", re.IGNORECASE)
+
+
+def find_html_redirect(html: str) -> str | None:
+    """Returns the target of a script or meta-refresh redirect in an HTML page, if any."""
+    match = META_REFRESH_RE.search(html) or JS_REDIRECT_RE.search(html)
+    return match.group(1) if match else None
+
+
+def follow_redirects(session: "requests.Session", url: str, own_hosts: Sequence[str]) -> str | None:
+    """
+    Follows a provider redirect chain without rendering anything.
+
+    HTTP `Location` headers and script/meta redirects are followed while they stay on
+    the provider's own hosts. The first URL that leaves them is returned without
+    being requested, so the file host's page is never downloaded.
+
+    Args:
+        session: The HTTP session, carrying the browser's cookies.
+        url: The provider link to resolve.
+        own_hosts: The hosts that belong to the provider.
+
+    Returns:
+        The final URL, or None if the chain ended on a page without a redirect
+        (a captcha or a page that needs JavaScript).
+    """
+    current = url
+    for hops in range(REDIRECT_MAX_HOPS + 1):
+        if hops and not host_matches(urlparse(current).hostname or "", own_hosts):
+            return current
+        with session.get(current, allow_redirects=False, stream=True, timeout=REDIRECT_TIMEOUT_SECONDS) as r:
+            location = r.headers.get("location")
+            if r.is_redirect and location:
+                current = urljoin(current, location)
+                continue
+            if r.status_code != 200:
+                return None
+            body = r.raw.read(REDIRECT_SNIFF_BYTES, decode_content=True).decode(r.encoding or "utf-8", "replace")
+        target = find_html_redirect(body)
+        if target:
+            current = urljoin(current, target)
+            continue
+        # A page without a redirect is only a result if we got there by redirecting
+        return current if hops else None
+    return None
+
+
+def resolve_redirects(context: "BrowserContext", urls: Sequence[str], own_hosts: Sequence[str]) -> dict[str, str]:
+    """
+    Resolves many provider links concurrently, reusing the browser context's cookies.
+
+    Args:
+        context: The browser context whose cookies (and clearance) are reused.
+        urls: The links to resolve.
+        own_hosts: The hosts that belong to the provider.
+
+    Returns:
+        A mapping of link to final URL for every link that could be resolved.
+    """
+    if not urls:
+        return {}
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    import requests
+    from requests.cookies import RequestsCookieJar
+
+    cookies = RequestsCookieJar()
+    for cookie in context.cookies():
+        cookies.set(
+            cookie.get("name", ""), cookie.get("value", ""), domain=cookie.get("domain"), path=cookie.get("path")
+        )
+
+    def resolve(url: str) -> str | None:
+        with requests.Session() as session:
+            session.headers["User-Agent"] = BROWSER_USER_AGENT
+            session.cookies.update(cookies)
+            try:
+                return follow_redirects(session, url, own_hosts)
+            except requests.RequestException:
+                return None
+
+    with ThreadPoolExecutor(max_workers=min(REDIRECT_WORKERS, len(urls))) as pool:
+        results = dict(zip(urls, pool.map(resolve, urls), strict=True))
+    return {url: final for url, final in results.items() if final}
@@ -1,12 +1,94 @@
+import bisect
+import sys
+from collections.abc import Iterable, Iterator, Sequence
 from dataclasses import dataclass
 
+from src.constants import SOURCE_PRIORITY
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class Episode:
-    """Represents a single episode."""
+    """Represents a single episode link."""
 
     season: int
     episode: int
     link: str
     filename: str
     source: str
+
+    def __post_init__(self) -> None:
+        # Thousands of links share a handful of source names; keep one copy of each
+        object.__setattr__(self, "source", sys.intern(self.source))
+
+
+@dataclass(frozen=True, slots=True)
+class ProviderCapabilities:
+    """What a provider can do, readable from its class without creating it."""
+
+    # Its episode links resolve over plain HTTP redirects, without a browser
+    http_resolve: bool = False
+    # It resolves many links at once cheaper than one by one
+    batch_resolve: bool = False
+    # Its links resolve on the series page they were found on, which must be loaded
+    series_page_resolve: bool = False
+
+
+def source_priority(episode: Episode) -> int:
+    """The download priority of an episode link's source; lower is tried first."""
+    return SOURCE_PRIORITY.get(episode.source, 999)
+
+
+class EpisodeIndex:
+    """
+    The links of a series' episodes, grouped by (season, episode).
+
+    Providers add links while parsing. Each group stays ordered by source priority as
+    links are inserted (links of equal priority keep page order), and a link already in
+    its group is ignored, so the index is ready to download from without sorting.
+    Iterating yields every link, in episode order.
+    """
+
+    __slots__ = ("_groups", "_keys", "_size")
+
+    def __init__(self, episodes: Iterable[Episode] = ()):
+        self._groups: dict[tuple[int, int], list[Episode]] = {}
+        # The group keys in ascending order
+        self._keys: list[tuple[int, int]] = []
+        self._size = 0
+        for episode in episodes:
+            self.add(episode)
+
+    def add(self, episode: Episode) -> bool:
+        """
+        Inserts an episode link into its group.
+
+        Returns:
+            False if the link was already in the index.
+        """
+        key = (episode.season, episode.episode)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = []
+            bisect.insort(self._keys, key)
+        elif any(existing.link == episode.link for existing in group):
+            return False
+        bisect.insort_right(group, episode, key=source_priority)
+        self._size += 1
+        return True
+
+    def get(self, season: int, episode: int) -> Sequence[Episode]:
+        """Returns the links of an episode, best source first."""
+        return self._groups.get((season, episode), ())
+
+    def groups(self) -> Iterator[tuple[tuple[int, int], Sequence[Episode]]]:
+        """Yields ((season, episode), links) in episode order, links best source first."""
+        for key in self._keys:
+            yield key, self._groups[key]
+
+    def __iter__(self) -> Iterator[Episode]:
+        for key in self._keys:
+            yield from self._groups[key]
+
+    def __len__(self) -> int:
+        """The number of links."""
+        return self._size
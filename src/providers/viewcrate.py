@@ -1,32 +1,54 @@
 import re
-
-from bs4 import BeautifulSoup, Tag
+from collections.abc import Generator, Sequence
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
 
 from src.downloaders import DOWNLOADER_REGISTRY
 from src.providers.base import BaseProvider
-from src.providers.types import Episode
+from src.providers.redirects import resolve_redirects
+from src.providers.types import Episode, EpisodeIndex, ProviderCapabilities
+from src.tracing import span
+from src.utils import host_matches
+
+if TYPE_CHECKING:
+    from playwright.sync_api import Page, Request, Route
 
 
 class ViewCrateProvider(BaseProvider):
     """Provider for viewcrate.cc links."""
 
-    @classmethod
-    def can_handle_url(cls, url: str) -> bool:
-        """Check if the provider can handle the given URL."""
+    name = "viewcrate"
+    domains = ("viewcrate.cc",)
+    allowed_hosts = ("challenges.cloudflare.com",)
+    # Links are captured from button clicks on the rendered page, all in one pass
+    capabilities = ProviderCapabilities(batch_resolve=True, series_page_resolve=True)
 
-        return "viewcrate.cc" in url
+    # How long the page gets to run its JavaScript before it is parsed
+    render_wait_ms = 10000
 
-    def get_series_episodes(self, url: str) -> list[Episode]:
+    def get_series_episodes(self, url: str) -> EpisodeIndex:
         """Finds links to all episodes for a series from a viewcrate.cc page."""
 
-        self.page.goto(url)
+        with span("provider.fetch", provider=self.name, url=url):
+            self.page.goto(url)
         # Give the page time to run its JavaScript
-        self.page.wait_for_timeout(10000)
+        with span("provider.wait", category="sleep", provider=self.name):
+            self.page.wait_for_timeout(self.render_wait_ms)
+
+        with span("provider.fetch", provider=self.name, url=url):
+            html_content = self.page.content()
+        with span("provider.parse", profile=True, provider=self.name):
+            return self.parse_episodes(html_content, url)
+
+    @classmethod
+    def parse_episodes(cls, html_content: str, page_url: str | None = None) -> EpisodeIndex:
+        """Parses the episode blocks of a rendered viewcrate.cc page."""
+        from bs4 import BeautifulSoup, Tag
 
-        html_content = self.page.content()
         soup = BeautifulSoup(html_content, "html.parser")
 
-        all_episodes: list[Episode] = []
+        all_episodes = EpisodeIndex()
 
         episode_containers = soup.select("#x_r > div")
 
@@ -86,7 +108,7 @@ class ViewCrateProvider(BaseProvider):
                 if isinstance(link_data_z, list):
                     link_data_z = link_data_z[0]
 
-                all_episodes.append(
+                all_episodes.add(
                     Episode(
                         season=season_num,
                         episode=episode_num,
@@ -96,13 +118,62 @@ class ViewCrateProvider(BaseProvider):
                     )
                 )
 
-        return sorted(all_episodes, key=lambda x: x.episode)
+        return all_episodes
 
     def get_download_url(self, episode_link: str) -> str:
         """
         Resolves the intermediate redirect by clicking the button corresponding
-        to the episode_link (which is a data-z value).
+        to the episode_link (which is a data-z value). The navigation the click starts
+        is intercepted, so the series page stays loaded for the next link.
+        """
+        with self._intercepting_navigations():
+            target = self._click_for_target(episode_link)
+        resolved = self._finish_resolving({episode_link: target})
+        if episode_link not in resolved:
+            raise ValueError(f"Could not resolve the redirect target: {target}")
+        return resolved[episode_link]
+
+    def get_download_urls(self, episode_links: Sequence[str]) -> dict[str, str]:
         """
+        Clicks the buttons of all episodes on the one loaded series page, capturing the
+        navigation each click starts, then follows the captured targets concurrently.
+        """
+        from playwright.sync_api import Error as PlaywrightError
+
+        targets: dict[str, str] = {}
+        with self._intercepting_navigations():
+            for link in episode_links:
+                try:
+                    targets[link] = self._click_for_target(link)
+                except (ValueError, PlaywrightError):
+                    continue
+        return self._finish_resolving(targets)
+
+    @contextmanager
+    def _intercepting_navigations(self) -> Generator[None]:
+        """Aborts navigations of the series page and closes popups opened meanwhile."""
+        main_frame = self.page.main_frame
+
+        def intercept(route: "Route", request: "Request") -> None:
+            if request.is_navigation_request() and request.frame == main_frame:
+                route.abort("aborted")
+            else:
+                route.fallback()
+
+        existing_pages = list(self.page.context.pages)
+        self.page.route("**/*", intercept)
+        try:
+            yield
+        finally:
+            self.page.unroute("**/*", intercept)
+            for popup in self.page.context.pages:
+                if popup not in existing_pages:
+                    popup.close()
+
+    def _click_for_target(self, episode_link: str) -> str:
+        """Clicks the button of an episode and returns the URL the click navigates to."""
+        from playwright.sync_api import Error as PlaywrightError
+
         # The episode_link is the data-z attribute
         button_selector = f"div[role='button'][data-z='{episode_link}']"
 
@@ -115,10 +186,48 @@ class ViewCrateProvider(BaseProvider):
             "() => { document.querySelectorAll('iframe[style*=\"z-index: 2147483647\"]').forEach(e => e.remove()); }"
         )
 
-        # Force click to bypass any overlays
-        button.click(force=True, timeout=10000)
+        series_url = self.page.url
 
-        # Wait for the new page to load after the click
-        self.page.wait_for_load_state("domcontentloaded")
+        def is_target(request: "Request") -> bool:
+            try:
+                top_level = request.frame.parent_frame is None
+            except PlaywrightError:
+                return False
+            return top_level and request.is_navigation_request() and request.url not in (series_url, "about:blank")
 
-        return self.page.url
+        # Force click to bypass any overlays
+        with self.page.context.expect_event("request", predicate=is_target, timeout=10000) as request_info:
+            button.click(force=True, timeout=10000, no_wait_after=True)
+        return request_info.value.url
+
+    def _finish_resolving(self, targets: dict[str, str]) -> dict[str, str]:
+        """Follows the captured targets to the file hosts, over HTTP where possible."""
+        from playwright.sync_api import Error as PlaywrightError
+
+        own_hosts = self.own_hosts()
+        resolved: dict[str, str] = {}
+        pending: dict[str, str] = {}
+        for link, target in targets.items():
+            if host_matches(urlparse(target).hostname or "", own_hosts):
+                pending[link] = target
+            else:
+                resolved[link] = target
+
+        finals = resolve_redirects(self.page.context, sorted(set(pending.values())), own_hosts)
+        scratch: Page | None = None
+        try:
+            for link, target in pending.items():
+                if target in finals:
+                    resolved[link] = finals[target]
+                    continue
+                # The redirect needs a browser: follow it in a scratch page so the series page stays put
+                scratch = scratch or self.page.context.new_page()
+                try:
+                    scratch.goto(target, wait_until="domcontentloaded")
+                    resolved[link] = scratch.url
+                except PlaywrightError:
+                    continue
+        finally:
+            if scratch is not None:
+                scratch.close()
+        return resolved
@@ -0,0 +1,115 @@
+"""Persisted browser storage state (cookies, local storage) per provider host."""
+
+import contextlib
+import json
+import os
+import re
+import time
+from typing import Any, cast
+
+from src.metrics import STORAGE_STATE_LOADS
+from src.utils import host_matches, log
+
+
+class StorageStateStore:
+    """
+    Keeps the Playwright storage state of each provider host between runs.
+
+    A fresh browser context has to earn anti-bot clearance, session tokens and
+    consent cookies again, which is often the slowest part of loading a series page.
+    After a page loaded fine its host's cookies and local storage are saved to
+    `<directory>/<host>.json` and handed to the next context created for that host.
+
+    A saved state is considered expired once it is older than `max_age_seconds` or
+    any of its persistent cookies ran out, since a partly expired clearance is more
+    likely to earn a challenge than no state at all. Files hold session cookies and
+    are only readable by their owner.
+    """
+
+    def __init__(self, directory: str, max_age_seconds: float):
+        self.directory = directory
+        self.max_age_seconds = max_age_seconds
+
+    def path(self, host: str) -> str:
+        """The file the state of a host is saved in."""
+        return os.path.join(self.directory, f"{re.sub(r'[^\w.-]', '_', host)}.json")
+
+    def load(self, host: str) -> dict[str, Any] | None:
+        """
+        Returns the saved state of a host for `browser.new_context(storage_state=...)`.
+
+        Returns:
+            The state, or None if there is none or it expired (an expired state is removed).
+        """
+        try:
+            with open(self.path(host), encoding="utf-8") as f:
+                data = cast(dict[str, Any], json.load(f))
+            saved_at = float(data["saved_at"])
+            state = cast(dict[str, Any], data["state"])
+            cookies = cast(list[dict[str, Any]], state.get("cookies", []))
+        except FileNotFoundError:
+            STORAGE_STATE_LOADS.inc(result="miss")
+            return None
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            log(f"⚠️ Сохраненное состояние браузера для {host} повреждено и будет пересоздано: {e}", indent=1)
+            self.discard(host)
+            STORAGE_STATE_LOADS.inc(result="miss")
+            return None
+
+        now = time.time()
+        # Session cookies carry an expiry of -1
+        expired = any(0 < float(cookie.get("expires", -1)) <= now for cookie in cookies)
+        if expired or now - saved_at > self.max_age_seconds:
+            self.discard(host)
+            STORAGE_STATE_LOADS.inc(result="expired")
+            return None
+        STORAGE_STATE_LOADS.inc(result="hit")
+        return state
+
+    def save(self, host: str, state: dict[str, Any]) -> None:
+        """
+        Saves the part of a context's storage state that belongs to a host.
+
+        Args:
+            host: The provider host the state was earned on.
+            state: The result of `context.storage_state()`; cookies and origins of
+                other hosts (file hosts visited by redirects) are left out.
+        """
+        cookies = [
+            cookie
+            for cookie in cast(list[dict[str, Any]], state.get("cookies", []))
+            if _same_site(host, str(cookie.get("domain", "")).lstrip("."))
+        ]
+        origins = [
+            origin
+            for origin in cast(list[dict[str, Any]], state.get("origins", []))
+            if _same_site(host, _origin_host(str(origin.get("origin", ""))))
+        ]
+        if not cookies and not origins:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(host)
+        temp_path = f"{path}.tmp"
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, "w", encoding="utf-8") as f:
+                json.dump({"saved_at": time.time(), "state": {"cookies": cookies, "origins": origins}}, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            log(f"⚠️ Не удалось сохранить состояние браузера для {host}: {e}", indent=1)
+
+    def discard(self, host: str) -> None:
+        """Removes the saved state of a host, e.g. after it led to a challenge page."""
+        with contextlib.suppress(OSError):
+            os.remove(self.path(host))
+
+
+def _origin_host(origin: str) -> str:
+    """The host of an origin such as `https://filecrypt.cc`."""
+    return origin.partition("://")[2].partition(":")[0]
+
+
+def _same_site(host: str, other: str) -> bool:
+    """Checks whether two hosts are the same or one is a subdomain of the other."""
+    return bool(other) and (host_matches(host, (other,)) or host_matches(other, (host,)))
@@ -0,0 +1,150 @@
+"""Span-based tracing of a check cycle with Chrome trace output."""
+
+import json
+import os
+import threading
+import time
+from collections.abc import Generator
+from contextlib import AbstractContextManager, contextmanager
+from typing import TYPE_CHECKING, Any
+
+from src.constants import DEFAULT_PROFILE_DIRECTORY
+from src.utils import log
+
+if TYPE_CHECKING:
+    import cProfile
+
+
+class Tracer:
+    """
+    Collects timed spans for a single check cycle.
+
+    Spans are recorded as Chrome trace "complete" events, so a dumped cycle can be
+    opened in `chrome://tracing` or https://ui.perfetto.dev. While disabled, `span`
+    costs a single attribute check.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.profile_parse = False
+        self.directory = DEFAULT_PROFILE_DIRECTORY
+        self._events: list[dict[str, Any]] = []
+        self._thread_names: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._profiler: cProfile.Profile | None = None
+
+    def configure(
+        self,
+        enabled: bool,
+        profile_parse: bool = False,
+        directory: str = DEFAULT_PROFILE_DIRECTORY,
+    ) -> None:
+        """
+        Enables or disables tracing.
+
+        Args:
+            enabled: Whether spans are recorded at all.
+            profile_parse: Whether the parse stages additionally run under cProfile.
+            directory: Where `finish_cycle` writes the per-cycle files.
+        """
+        self.enabled = enabled
+        self.profile_parse = enabled and profile_parse
+        self.directory = directory
+
+    def start_cycle(self) -> None:
+        """Drops the events of the previous cycle and starts a fresh timeline."""
+        import cProfile
+
+        with self._lock:
+            self._events = []
+            self._thread_names = {}
+            self._origin = time.perf_counter()
+            self._profiler = cProfile.Profile() if self.profile_parse else None
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", profile: bool = False, **args: Any) -> Generator[None]:
+        """
+        Records the duration of the enclosed block as a span.
+
+        Args:
+            name: The span name shown on the timeline.
+            category: The span category, used for filtering in the trace viewer.
+            profile: If True and parse profiling is on, the block runs under cProfile.
+            **args: Extra attributes attached to the span.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        profiler = self._profiler if profile else None
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            end = time.perf_counter()
+            thread = threading.current_thread()
+            event: dict[str, Any] = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self._origin) * 1_000_000,
+                "dur": (end - start) * 1_000_000,
+                "pid": os.getpid(),
+                "tid": thread.ident or 0,
+            }
+            if args:
+                event["args"] = {key: str(value) for key, value in args.items()}
+            with self._lock:
+                self._events.append(event)
+                self._thread_names.setdefault(thread.ident or 0, thread.name)
+
+    def events(self) -> list[dict[str, Any]]:
+        """Returns the recorded events of the current cycle, including thread names."""
+        with self._lock:
+            metadata: list[dict[str, Any]] = [
+                {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                for tid, name in self._thread_names.items()
+            ]
+            return metadata + list(self._events)
+
+    def finish_cycle(self) -> str | None:
+        """
+        Writes the timeline (and parse profile, if enabled) of the current cycle.
+
+        Returns:
+            The path of the trace file, or None if tracing is disabled.
+        """
+        if not self.enabled:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        trace_path = os.path.join(self.directory, f"cycle-{stamp}.trace.json")
+        with open(trace_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, f)
+        log(f"🧭 Трассировка цикла сохранена: {trace_path}")
+
+        if self._profiler is not None:
+            import pstats
+
+            profile_path = os.path.join(self.directory, f"cycle-{stamp}.parse.prof")
+            try:
+                pstats.Stats(self._profiler).dump_stats(profile_path)
+                log(f"🧭 Профиль разбора страниц сохранен: {profile_path}")
+            except TypeError:
+                # pstats refuses to load a profiler that never recorded anything
+                pass
+        return trace_path
+
+
+TRACER = Tracer()
+
+
+def span(name: str, category: str = "stage", profile: bool = False, **args: Any) -> AbstractContextManager[None]:
+    """Shortcut for `TRACER.span` on the global tracer."""
+    return TRACER.span(name, category, profile, **args)
@@ -1,6 +1,10 @@
 """Utility functions for the application."""
 
-import logging
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import logging
 
 
 def log(message: str, indent: int = 0, top: int = 0, bottom: int = 0, carriage_return: bool = False) -> None:
@@ -39,6 +43,13 @@ def log(message: str, indent: int = 0, top: int = 0, bottom: int = 0, carriage_r
         print("\n" * (bottom - 1))
 
 
-def get_logger(name: str) -> logging.Logger:
+def get_logger(name: str) -> "logging.Logger":
     """Get a logger with the specified name."""
+    import logging
+
     return logging.getLogger(name)
+
+
+def host_matches(host: str, domains: Sequence[str]) -> bool:
+    """Checks whether `host` is one of `domains` or a subdomain of one of them."""
+    return any(host == domain or host.endswith(f".{domain}") for domain in domains)
@@ -0,0 +1,101 @@
+import json
+import threading
+from collections.abc import Generator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from src.downloaders.aio_http import HttpError, open_stream
+from src.downloaders.transfer_loop import TRANSFER_LOOP, FileWriter
+
+BODY = bytes(range(256)) * 1000
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        if self.path == "/moved":
+            self.send_response(302)
+            self.send_header("Location", "/file")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.path == "/file":
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+        elif self.path == "/chunked":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for start in range(0, len(BODY), 70000):
+                chunk = BODY[start : start + 70000]
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            error = json.dumps({"value": "not_found"}).encode()
+            self.send_response(404)
+            self.send_header("Content-Length", str(len(error)))
+            self.end_headers()
+            self.wfile.write(error)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@contextmanager
+def server() -> Generator[str]:
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+async def fetch(url: str) -> tuple[int, bytes]:
+    async with await open_stream(url) as response:
+        await response.raise_for_status()
+        body = b""
+        async for chunk in response.iter_chunks(64 * 1024):
+            body += chunk
+        return response.status, body
+
+
+def test_streams_sized_chunked_and_redirected_bodies():
+    """
+    Tests that bodies with a length, chunked bodies and redirected requests are read
+    in full, and that an error status raises `HttpError` with the body of the answer.
+    """
+    with server() as base:
+        assert TRANSFER_LOOP.run(fetch(f"{base}/file")) == (200, BODY)
+        assert TRANSFER_LOOP.run(fetch(f"{base}/chunked")) == (200, BODY)
+        assert TRANSFER_LOOP.run(fetch(f"{base}/moved")) == (200, BODY)
+        try:
+            TRANSFER_LOOP.run(fetch(f"{base}/missing"))
+        except HttpError as e:
+            assert e.status == 404
+            assert e.json() == {"value": "not_found"}
+        else:
+            raise AssertionError("a 404 answer was not raised")
+
+
+def test_file_writer_writes_at_offsets(tmp_path: Path):
+    """
+    Tests that a writer continues a file at the given offset and that everything
+    written is on disk once it is closed.
+    """
+    path = tmp_path / "file.part"
+    path.write_bytes(b"a" * 10)
+
+    async def write() -> int:
+        async with FileWriter(str(path), offset=10) as writer:
+            for _ in range(3):
+                await writer.write(BODY)
+        return writer.offset
+
+    assert TRANSFER_LOOP.run(write()) == 10 + 3 * len(BODY)
+    assert path.read_bytes() == b"a" * 10 + BODY * 3
@@ -1,7 +1,21 @@
+# pyright: reportPrivateUsage=false
+from pathlib import Path
+from types import SimpleNamespace
 from typing import Any
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
-from src.app import run_check
+from src.app import (
+    _finish_journaled_jobs,
+    _order_episodes,
+    _preflight,
+    _process_episodes,
+    _save_last_episode,
+    run_check,
+)
+from src.downloaders.types import RemoteFile
+from src.journal import Job, Journal
+from src.providers.types import Episode, EpisodeIndex
+from src.tracing import TRACER
 
 
 def test_run_check_no_config():
@@ -13,11 +27,186 @@ def test_run_check_no_config():
         assert interval == 10
 
 
-def test_run_check_no_series():
+def test_run_check_no_series(tmp_path: Path):
     """
-    Tests that run_check returns the configured interval when no series are found.
+    Tests that run_check returns the configured interval when no series are found,
+    without creating the job journal.
     """
-    config: dict[str, Any] = {"settings": {"check_interval_minutes": 15}, "series": []}
+    journal_path = tmp_path / "journal.jsonl"
+    config: dict[str, Any] = {
+        "settings": {"check_interval_minutes": 15, "journal": {"path": str(journal_path)}},
+        "series": [],
+    }
     with patch("src.app.load_config", return_value=config):
         interval = run_check()
         assert interval == 15
+    assert not journal_path.exists()
+
+
+def test_run_check_writes_trace_of_failed_cycle(tmp_path: Path):
+    """
+    Tests that the trace of a cycle is written even when the cycle fails.
+    """
+    config: dict[str, Any] = {
+        "settings": {
+            "download_directory": str(tmp_path),
+            "journal": {"enable": False},
+            "link_cache": {"enable": False},
+        },
+        "series": [{"name": "Show", "url": "https://filecrypt.cc/Container/ABC.html"}],
+    }
+    session = MagicMock()
+    session.browser.side_effect = RuntimeError("browser did not start")
+    with patch("src.app.load_config", return_value=config), patch.object(TRACER, "finish_cycle") as finish_cycle:
+        try:
+            run_check(session=session)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("the failure of the cycle was swallowed")
+    finish_cycle.assert_called_once_with()
+
+
+def test_counter_waits_for_earlier_episodes():
+    """
+    Tests that the series counter does not pass an episode still outstanding, and
+    moves over the episodes that finished out of order once it is downloaded.
+    """
+    config: dict[str, Any] = {"series": [{"name": "Show", "url": "https://example.test/show", "series": 10}]}
+    on_disk = {12}
+    with patch("src.app.load_config", return_value=config), patch("src.app.save_config") as save_config:
+        assert _save_last_episode("Show", 12, {11, 13}, on_disk.__contains__)
+        assert config["series"][0]["series"] == 10
+        save_config.assert_not_called()
+
+        on_disk.add(11)
+        assert _save_last_episode("Show", 11, {13}, on_disk.__contains__)
+        assert config["series"][0]["series"] == 12
+
+        assert _save_last_episode("Show", 9, set(), on_disk.__contains__)
+        assert config["series"][0]["series"] == 12
+
+
+def test_failed_older_episode_survives_a_restart(tmp_path: Path):
+    """
+    Tests that when the newest episode finishes first and an older one fails, the
+    counter stays below the failed episode, and that after a restart its journal job
+    is downloaded again instead of being dropped as counted.
+    """
+    config: dict[str, Any] = {
+        "settings": {"download_directory": str(tmp_path / "downloads")},
+        "series": [{"name": "Show", "url": "https://example.test/show", "series": 1}],
+    }
+    path = str(tmp_path / "journal.jsonl")
+    journal = Journal(path)
+    for num in (2, 3):
+        journal.add(Job("Show", 1, num, "filecrypt", [Episode(1, num, f"https://example.test/{num}", "", "gofile")]))
+
+    on_disk: set[int] = set()
+    with patch("src.app.load_config", return_value=config), patch("src.app.save_config"):
+        # The newest episode goes first and succeeds; the older one then fails and stays pending
+        on_disk.add(3)
+        assert _save_last_episode("Show", 3, {2}, on_disk.__contains__)
+        journal.done("Show", 3)
+    assert config["series"][0]["series"] == 1
+
+    restarted = Journal(path)
+    with patch("src.app._finish_journaled_job") as finish:
+        _finish_journaled_jobs(restarted, config)
+    finish.assert_called_once()
+    job: Job = finish.call_args.args[0]
+    assert (job.series, job.episode) == ("Show", 2)
+    assert [job.episode for job in restarted.pending()] == [2]
+
+    with patch("src.app.load_config", return_value=config), patch("src.app.save_config"):
+        on_disk.add(2)
+        assert _save_last_episode("Show", 2, set(), on_disk.__contains__)
+    assert config["series"][0]["series"] == 3
+
+
+def test_process_episodes_skips_queues_and_orders_fallbacks():
+    """
+    Tests that episodes up to the counter and those already on disk are skipped, that
+    the new ones keep their links best source first, and that the same number in
+    two seasons merges into one list of fallbacks in source priority order.
+    """
+    index = EpisodeIndex(
+        [
+            Episode(1, 1, "p1", "", "pixeldrain"),
+            Episode(1, 2, "p2", "", "pixeldrain"),
+            Episode(1, 3, "p3", "", "pixeldrain"),
+            Episode(1, 3, "g3", "", "gofile"),
+            Episode(1, 4, "p4", "", "pixeldrain"),
+            Episode(2, 4, "g4", "", "gofile.io"),
+            Episode(1, 5, "p5", "", "pixeldrain.com"),
+        ]
+    )
+
+    new = _process_episodes(index, 1, is_owned=lambda episode: episode.episode == 5)
+    assert {num: [link.link for link in links] for num, links in new.items()} == {
+        2: ["p2"],
+        3: ["g3", "p3"],
+        4: ["g4", "p4"],
+    }
+    assert list(_process_episodes(index, 3)) == [4, 5]
+
+
+def test_order_episodes_by_availability_and_size():
+    """
+    Tests that an unavailable primary file moves behind the other sources and that
+    `download_order: smallest` puts the episodes of known size smallest first.
+    """
+    links = {
+        num: [
+            Episode(1, num, f"https://example.test/p{num}", "", "pixeldrain"),
+            Episode(1, num, f"https://example.test/g{num}", "", "gofile"),
+        ]
+        for num in (1, 2, 3)
+    }
+    resolved = {f"https://example.test/p{num}": f"https://pixeldrain.test/u/{num}" for num in (1, 2)}
+    remote_files = {
+        "https://pixeldrain.test/u/1": RemoteFile("one.mkv", 900),
+        "https://pixeldrain.test/u/2": RemoteFile("two.mkv", 0, available=False),
+    }
+
+    by_episode = _order_episodes(links, resolved, remote_files, "episode")
+    assert list(by_episode) == [1, 2, 3]
+    assert [link.source for link in by_episode[2]] == ["gofile", "pixeldrain"]
+    assert [link.source for link in by_episode[1]] == ["pixeldrain", "gofile"]
+
+    resolved["https://example.test/g2"] = "https://gofile.test/d/2"
+    remote_files["https://gofile.test/d/2"] = RemoteFile("two.mkv", 300)
+    assert list(_order_episodes(links, resolved, remote_files, "smallest")) == [2, 1, 3]
+
+
+def test_preflight_groups_urls_by_source():
+    """
+    Tests that the resolved files are looked up in one batch per source and that a
+    source without metadata lookups is skipped.
+    """
+    episodes = [
+        Episode(1, 1, "https://example.test/p1", "", "pixeldrain"),
+        Episode(1, 2, "https://example.test/p2", "", "pixeldrain"),
+        Episode(1, 3, "https://example.test/g3", "", "gofile"),
+        Episode(1, 4, "https://example.test/p4", "", "pixeldrain"),
+    ]
+    resolved = {
+        "https://example.test/p1": "https://pixeldrain.test/u/1",
+        "https://example.test/p2": "https://pixeldrain.test/u/2",
+        "https://example.test/g3": "https://gofile.test/d/3",
+    }
+    batches: dict[str, list[str]] = {}
+
+    def get_downloader(source: str) -> Any:
+        def preflight(urls: list[str]) -> dict[str, RemoteFile]:
+            if source == "gofile":
+                raise ValueError("no metadata")
+            batches[source] = urls
+            return {url: RemoteFile(url.rsplit("/", 1)[1], 1) for url in urls}
+
+        return SimpleNamespace(preflight=preflight)
+
+    with patch("src.app.get_downloader", get_downloader):
+        remote_files = _preflight(episodes, resolved)
+    assert batches == {"pixeldrain": ["https://pixeldrain.test/u/1", "https://pixeldrain.test/u/2"]}
+    assert set(remote_files) == {"https://pixeldrain.test/u/1", "https://pixeldrain.test/u/2"}
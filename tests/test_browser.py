@@ -0,0 +1,32 @@
+from src.browser import BrowserUsage, ResourceBlocker, recycle_scope
+
+
+def test_resource_blocker_allowlist():
+    """
+    Tests that the lean profile keeps first-party and allowlisted requests and drops the rest.
+    """
+    blocker = ResourceBlocker("filecrypt.cc", ("challenges.cloudflare.com",))
+
+    assert not blocker.should_block("https://filecrypt.cc/js/app.js", "script", False)
+    assert not blocker.should_block("https://challenges.cloudflare.com/turnstile/v0/api.js", "script", False)
+    assert blocker.should_block("https://filecrypt.cc/img/banner.jpg", "image", False)
+    assert blocker.should_block("https://filecrypt.cc/fonts/inter.woff2", "font", False)
+    assert blocker.should_block("https://ads.example.net/frame.html", "document", False)
+    assert blocker.should_block("https://www.google-analytics.com/analytics.js", "script", False)
+    # Redirects of the top-level page to the file hosts must go through
+    assert not blocker.should_block("https://pixeldrain.com/u/abc", "document", True)
+
+
+def test_recycle_scope_limits():
+    """
+    Tests that memory over the limits recycles the contexts or the browser, and that
+    too many pages recycle the contexts even when memory cannot be measured.
+    """
+    mb = 1024 * 1024
+    settings = {"browser_limits": {"context_rss_mb": 100, "restart_rss_mb": 200, "max_pages": 3}}
+
+    assert recycle_scope(BrowserUsage(50 * mb, 2), settings) is None
+    assert recycle_scope(BrowserUsage(150 * mb, 2), settings) == "contexts"
+    assert recycle_scope(BrowserUsage(250 * mb, 2), settings) == "browser"
+    assert recycle_scope(BrowserUsage(None, 4), settings) == "contexts"
+    assert recycle_scope(BrowserUsage(250 * mb, 4), {"browser_limits": {"enable": False}}) is None
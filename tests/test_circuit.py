@@ -0,0 +1,33 @@
+import time
+
+from src.circuit import CircuitBreaker, backoff_delay
+
+
+def test_circuit_breaker_trips_and_recovers():
+    """
+    Tests that a breaker opens after consecutive failures or a rate limit, and closes
+    again after a successful request once the cooldown elapsed.
+    """
+    breaker = CircuitBreaker("pixeldrain.com", failure_threshold=2, cooldown_seconds=0.05, max_cooldown_seconds=1)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half-open" and breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+    breaker.record_failure(trip=True)
+    assert not breaker.allow()
+
+
+def test_backoff_delay_grows_with_jitter():
+    """
+    Tests that retry pauses double per attempt, stay within the jitter band and are capped.
+    """
+    for attempt in range(4):
+        delay = backoff_delay(attempt, base=5, cap=30)
+        expected = min(30, 5 * 2**attempt)
+        assert expected / 2 <= delay <= expected
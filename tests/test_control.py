@@ -0,0 +1,78 @@
+import json
+import os
+import stat
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from src.control import Command, Controller, control_token, start_control_server
+
+TOKEN = "secret"
+
+
+def _post(url: str, headers: dict[str, str] | None = None) -> int:
+    headers = {"Authorization": f"Bearer {TOKEN}"} if headers is None else headers
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method="POST", headers=headers)) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_control_api_queues_commands():
+    """
+    Tests that the control API pauses downloads and queues checks of known series only.
+    """
+    controller = Controller()
+    server = start_control_server("127.0.0.1", 0, controller, series_names=lambda: ["Show"], token=TOKEN)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        assert _post(f"{base}/pause") == 200
+        with urllib.request.urlopen(f"{base}/status") as response:
+            assert json.load(response)["paused"] is True
+        assert _post(f"{base}/resume") == 200
+        assert not controller.paused
+
+        assert _post(f"{base}/check?series=Show") == 202
+        assert controller.next_command(timeout=1) == Command("check", "Show")
+        assert _post(f"{base}/check?series=Unknown") == 404
+        assert controller.next_command(timeout=0) is None
+    finally:
+        server.shutdown()
+
+
+def test_control_api_refuses_unauthorized_requests():
+    """
+    Tests that commands without the token or sent from a web page are refused and
+    change nothing.
+    """
+    controller = Controller()
+    server = start_control_server("127.0.0.1", 0, controller, token=TOKEN)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        assert _post(f"{base}/pause", headers={}) == 401
+        assert _post(f"{base}/pause", headers={"Authorization": "Bearer wrong"}) == 401
+        cross_site = {"Authorization": f"Bearer {TOKEN}", "Origin": "https://example.test"}
+        assert _post(f"{base}/reload", headers=cross_site) == 403
+        assert not controller.paused
+        assert controller.next_command(timeout=0) is None
+    finally:
+        server.shutdown()
+
+
+def test_control_token_is_generated_once(tmp_path: Path):
+    """
+    Tests that a configured token is used as is, and that otherwise a token is
+    generated into a file only its owner can read and reused from there.
+    """
+    path = str(tmp_path / "control.token")
+    assert control_token("configured", path) == "configured"
+    assert not os.path.exists(path)
+
+    token = control_token("", path)
+    assert len(token) >= 32
+    assert control_token("", path) == token
+    if os.name == "posix":
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
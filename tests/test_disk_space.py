@@ -0,0 +1,40 @@
+import os
+import shutil
+from pathlib import Path
+
+from src.disk_space import DiskSpace, partial_bytes
+
+MIB = 1024 * 1024
+
+
+def test_reservations_count_against_free_space(tmp_path: Path):
+    """
+    Tests that running reservations count as used space, are given back on exit, and
+    that bytes already in partial files are not reserved again.
+    """
+    free = shutil.disk_usage(tmp_path).free
+    disk = DiskSpace(min_free_bytes=free - 100 * MIB)
+    folders = (str(tmp_path / ".partial"), str(tmp_path / "Series"))
+
+    first = disk.reserve(60 * MIB, folders)
+    assert first is not None
+    with first:
+        assert disk.reserve(60 * MIB, folders) is None
+        assert disk.reserve(60 * MIB, folders, present=40 * MIB) is not None
+    assert disk.reserve(60 * MIB, folders) is not None
+    assert disk.reserve(200 * MIB, folders) is None
+
+
+def test_partial_bytes_sums_partial_files(tmp_path: Path):
+    """
+    Tests that the partial files and yt-dlp work folder of an episode are counted,
+    and those of other episodes are not.
+    """
+    (tmp_path / "Show - S01E02.abc.part").write_bytes(b"x" * 10)
+    (tmp_path / "Show - S01E02.abc.part.seg1of4").write_bytes(b"x" * 5)
+    os.makedirs(tmp_path / "Show - S01E02.yt-dlp")
+    (tmp_path / "Show - S01E02.yt-dlp" / "Show - S01E02.mp4.part").write_bytes(b"x" * 7)
+    (tmp_path / "Show - S01E12.abc.part").write_bytes(b"x" * 100)
+
+    assert partial_bytes(str(tmp_path), "Show - S01E02") == 22
+    assert partial_bytes(str(tmp_path / "missing"), "Show - S01E02") == 0
@@ -0,0 +1,35 @@
+import os
+from pathlib import Path
+
+from src.download_index import DownloadIndex
+from src.providers.types import Episode
+
+
+def test_download_index_tracks_folder_changes(tmp_path: Path):
+    """
+    Tests that the index finds downloaded episodes and picks up new files after a restart.
+    """
+    folder = tmp_path / "Show"
+    folder.mkdir()
+    (folder / "Show - S01E01.mkv").write_bytes(b"x" * 10)
+    (folder / "notes.txt").write_text("not an episode")
+    episode_1 = Episode(season=1, episode=1, link="a", filename="", source="pixeldrain")
+    episode_2 = Episode(season=1, episode=2, link="b", filename="", source="pixeldrain")
+
+    index = DownloadIndex(str(tmp_path))
+    index.refresh("Show")
+    assert index.owns("Show", episode_1)
+    assert not index.owns("Show", episode_2)
+    assert index.get("Show", 1, 1) is not None
+    index.save()
+
+    (folder / "Show - S01E02.mp4").write_bytes(b"y" * 5)
+    # Make sure the folder's modification time moves even on coarse-grained file systems
+    stat = os.stat(folder)
+    os.utime(folder, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    reopened = DownloadIndex(str(tmp_path))
+    assert not reopened.owns("Show", episode_2)
+    reopened.refresh("Show")
+    assert reopened.owns("Show", episode_2)
+    assert not reopened.owns("Missing", episode_1)
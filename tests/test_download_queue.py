@@ -0,0 +1,37 @@
+from src.download_queue import DownloadQueue, episode_priority
+
+
+def test_priority_favours_series_setting_recency_and_age():
+    """
+    Tests that the series priority outweighs recency, that the newest episodes go
+    before a backlog, and that waiting raises the priority.
+    """
+    assert episode_priority(1, behind=20, waiting_seconds=0) > episode_priority(0, behind=0, waiting_seconds=0)
+    assert episode_priority(0, behind=0, waiting_seconds=0) > episode_priority(0, behind=5, waiting_seconds=0)
+    assert episode_priority(0, behind=5, waiting_seconds=6 * 3600) > episode_priority(0, behind=0, waiting_seconds=0)
+
+
+def test_queue_orders_and_preempts():
+    """
+    Tests that jobs run by priority, in push order among equals, and that only a job
+    that clearly outranks the running one preempts it.
+    """
+    queue: DownloadQueue[str] = DownloadQueue(preempt_margin=10)
+    queue.push("backlog 1", 0)
+    queue.push("backlog 2", 0)
+    queue.push("new", 5)
+    assert queue.items() == ["new", "backlog 1", "backlog 2"]
+
+    running = queue.pop()
+    assert running is not None and running.item == "new"
+    queue.finish(running)
+    running = queue.pop()
+    assert running is not None and running.item == "backlog 1"
+    queue.push("slightly better", 5)
+    assert not running.preempted.is_set()
+    queue.push("favourite", 10)
+    assert running.preempted.is_set()
+
+    queue.requeue(running)
+    assert not running.preempted.is_set()
+    assert queue.items() == ["favourite", "slightly better", "backlog 1", "backlog 2"]
@@ -0,0 +1,18 @@
+from src.providers.types import Episode, EpisodeIndex
+
+
+def test_episode_index_groups_sorts_and_dedupes():
+    """
+    Tests that links are grouped per episode, ordered by source priority on insert and
+    that repeated links are ignored.
+    """
+    pixeldrain = Episode(season=1, episode=2, link="p2", filename="", source="pixeldrain")
+    gofile = Episode(season=1, episode=2, link="g2", filename="", source="gofile")
+    first = Episode(season=1, episode=1, link="p1", filename="", source="pixeldrain")
+
+    index = EpisodeIndex([pixeldrain, gofile, first])
+    assert not index.add(Episode(season=1, episode=2, link="p2", filename="again", source="pixeldrain"))
+    assert len(index) == 3
+    assert list(index) == [first, gofile, pixeldrain]
+    assert index.get(1, 2) == [gofile, pixeldrain]
+    assert {first, first} == {first}
@@ -0,0 +1,134 @@
+# pyright: reportPrivateUsage=false
+from typing import Any
+from unittest.mock import patch
+
+import requests
+
+from src.circuit import BreakerBoard
+from src.downloaders.gofile import ApiUnavailableError, GofileDownloader
+from src.downloaders.types import RemoteFile
+
+FOLDER = {
+    "type": "folder",
+    "children": {
+        "a": {"type": "file", "id": "sub", "name": "Show - S01E01.srt", "size": 10, "link": "https://store.test/sub"},
+        "b": {"type": "file", "id": "vid", "name": "Show - S01E01.mkv", "size": 900, "link": "https://store.test/vid"},
+        "c": {"type": "folder", "name": "extras"},
+    },
+}
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body: dict[str, Any]):
+        self.status_code = status_code
+        self.body = body
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            response: Any = self
+            raise requests.exceptions.HTTPError(f"{self.status_code} error", response=response)
+
+    def json(self) -> Any:
+        return self.body
+
+
+class FakeApi:
+    """Answers the account and content requests, by the content id in the URL."""
+
+    def __init__(self) -> None:
+        self.accounts = 0
+        self.tokens: list[str] = []
+        self.answers: dict[str, FakeResponse] = {
+            "folder": FakeResponse(200, {"status": "ok", "data": FOLDER}),
+            "gone": FakeResponse(404, {"status": "error-notFound"}),
+            "expired": FakeResponse(401, {"status": "error-token"}),
+            "private": FakeResponse(200, {"status": "error-notPremium"}),
+            "empty": FakeResponse(200, {"status": "ok", "data": {"type": "folder", "children": {}}}),
+            "down": FakeResponse(502, {}),
+        }
+
+    def post(self, url: str, timeout: float) -> FakeResponse:
+        self.accounts += 1
+        return FakeResponse(200, {"status": "ok", "data": {"token": f"token{self.accounts}"}})
+
+    def get(self, url: str, params: dict[str, str], headers: dict[str, str], timeout: float) -> FakeResponse:
+        self.tokens.append(headers["Authorization"])
+        return self.answers[url.split("/")[-1]]
+
+
+class LocalGofileDownloader(GofileDownloader):
+    api_url = "https://api.test"
+
+
+def _downloader() -> LocalGofileDownloader:
+    LocalGofileDownloader._token = None
+    return LocalGofileDownloader(source="gofile")
+
+
+def _failure(call: Any, error: type[Exception]) -> Exception:
+    try:
+        call()
+    except error as e:
+        return e
+    raise AssertionError(f"{error.__name__} was not raised")
+
+
+def test_resolve_picks_the_episode_of_a_folder():
+    """
+    Tests that a guest account is created once, and that the largest file of a folder
+    is the episode, with the token its direct link is requested with.
+    """
+    downloader = _downloader()
+    api: Any = FakeApi()
+    with patch("src.downloaders.gofile.BREAKERS", BreakerBoard()):
+        content = downloader._resolve("https://gofile.io/d/folder", api)
+        assert downloader._resolve("https://gofile.io/d/folder/", api) == content
+    assert content.remote_file == RemoteFile("Show - S01E01.mkv", 900)
+    assert (content.file_id, content.link, content.token) == ("vid", "https://store.test/vid", "token1")
+    assert api.accounts == 1
+    assert api.tokens == ["Bearer token1", "Bearer token1"]
+
+
+def test_resolve_error_statuses():
+    """
+    Tests that a missing folder is an unavailable file, that a rejected token is
+    dropped for a new account, and that refusals and empty folders raise ValueError.
+    """
+    downloader = _downloader()
+    api: Any = FakeApi()
+    with patch("src.downloaders.gofile.BREAKERS", BreakerBoard()):
+        assert downloader._resolve("https://gofile.io/d/gone", api).remote_file == RemoteFile("", 0, available=False)
+        assert "error-notPremium" in str(
+            _failure(lambda: downloader._resolve("https://gofile.io/d/private", api), ValueError)
+        )
+        _failure(lambda: downloader._resolve("https://gofile.io/d/empty", api), ValueError)
+
+        _failure(lambda: downloader._resolve("https://gofile.io/d/expired", api), requests.exceptions.HTTPError)
+        api.answers["expired"] = FakeResponse(200, {"status": "error-token"})
+        _failure(lambda: downloader._resolve("https://gofile.io/d/expired", api), ValueError)
+        assert LocalGofileDownloader._token is None
+        downloader._resolve("https://gofile.io/d/folder", api)
+    assert api.accounts == 2
+
+
+def test_open_breaker_defers_instead_of_falling_back():
+    """
+    Tests that API outages open the breaker of gofile, a refused folder does not, and
+    that with the breaker open an episode is deferred instead of handed to yt-dlp.
+    """
+    downloader = _downloader()
+    api: Any = FakeApi()
+    board = BreakerBoard()
+    board.configure(failure_threshold=2)
+    with patch("src.downloaders.gofile.BREAKERS", board):
+        for _ in range(3):
+            _failure(lambda: downloader._resolve("https://gofile.io/d/expired", api), requests.exceptions.HTTPError)
+        assert board.allow("https://gofile.io/d/folder")
+        for _ in range(2):
+            _failure(lambda: downloader._resolve("https://gofile.io/d/down", api), requests.exceptions.HTTPError)
+        assert not board.allow("https://gofile.io/d/folder")
+
+        _failure(lambda: downloader._resolve("https://gofile.io/d/folder", api), ApiUnavailableError)
+        with patch.object(LocalGofileDownloader, "_fallback") as fallback, patch("src.downloaders.gofile.log"):
+            assert not downloader.download("https://gofile.io/d/folder", "Show", 1, 1, "downloads")
+        fallback.assert_not_called()
@@ -0,0 +1,29 @@
+import os
+from pathlib import Path
+
+from src.journal import Job, Journal
+from src.providers.types import Episode
+
+
+def test_journal_replays_pending_jobs(tmp_path: Path):
+    """
+    Tests that unfinished jobs and their resolved links survive a restart, finished
+    jobs are compacted away and a torn last line is ignored.
+    """
+    path = os.path.join(tmp_path, "journal.jsonl")
+    link = Episode(season=1, episode=5, link="abc123", filename="", source="pixeldrain")
+
+    journal = Journal(path)
+    journal.add(Job("Show", 1, 5, "filecrypt", [link]))
+    journal.add(Job("Show", 1, 6, "filecrypt", [link]))
+    journal.resolved("Show", 5, "abc123", "https://pixeldrain.com/u/xyz")
+    journal.done("Show", 6)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op": "done", "key": "Sh')
+
+    reopened = Journal(path)
+    [job] = reopened.pending()
+    assert (job.series, job.episode, job.links) == ("Show", 5, [link])
+    assert job.resolved == {"abc123": "https://pixeldrain.com/u/xyz"}
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 1
@@ -0,0 +1,42 @@
+import time
+from pathlib import Path
+
+from src.leases import LeaseStore
+
+NAMES = ["A", "B", "C", "D"]
+
+
+def test_instances_split_the_series(tmp_path: Path):
+    """
+    Tests that a joining instance gets its share once the first one gave it up, and
+    that the shards do not overlap.
+    """
+    path = str(tmp_path / "leases.sqlite3")
+    first = LeaseStore(path, "first", 60)
+    second = LeaseStore(path, "second", 60)
+
+    assert first.claim_share("series", NAMES) == NAMES
+    assert second.claim_share("series", NAMES) == []
+    assert first.claim_share("series", NAMES) == ["A", "B"]
+    assert second.claim_share("series", NAMES) == ["C", "D"]
+    assert second.claim("job:C#1")
+    assert not first.claim("job:C#1")
+    second.release("job:C#1")
+    assert first.claim("job:C#1")
+
+
+def test_expired_leases_are_reclaimed(tmp_path: Path):
+    """
+    Tests that the leases of an instance that stopped renewing are taken over, and
+    that closing an instance hands its leases over at once.
+    """
+    path = str(tmp_path / "leases.sqlite3")
+    dead = LeaseStore(path, "dead", 0.1)
+    survivor = LeaseStore(path, "survivor", 60)
+
+    assert dead.claim_share("series", NAMES) == NAMES
+    time.sleep(0.2)
+    assert survivor.claim_share("series", NAMES) == NAMES
+
+    survivor.close()
+    assert LeaseStore(path, "next", 60).claim_share("series", NAMES) == NAMES
@@ -0,0 +1,25 @@
+import os
+from pathlib import Path
+
+from src.link_cache import LinkCache
+
+
+def test_link_cache_expiry_and_persistence(tmp_path: Path):
+    """
+    Tests that resolved links survive a restart and expire after the TTL.
+    """
+    path = os.path.join(tmp_path, "link_cache.json")
+    key = LinkCache.key("filecrypt", "abc123")
+
+    cache = LinkCache(path, ttl_seconds=3600)
+    assert cache.get(key) is None
+    cache.put(key, "https://pixeldrain.com/u/xyz")
+    cache.save()
+
+    reopened = LinkCache(path, ttl_seconds=3600)
+    assert reopened.get(key) == "https://pixeldrain.com/u/xyz"
+    reopened.discard(key)
+    assert reopened.get(key) is None
+
+    expired = LinkCache(path, ttl_seconds=-1)
+    assert expired.get(key) is None
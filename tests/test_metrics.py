@@ -0,0 +1,40 @@
+import urllib.request
+
+from src.metrics import Counter, Histogram, MetricsRegistry, start_metrics_server
+
+
+def test_counter_and_histogram_render():
+    """
+    Tests that counters and histograms are rendered in the Prometheus text format.
+    """
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("test_bytes_total", "Bytes.", ("source",)))
+    histogram = registry.register(Histogram("test_seconds", "Seconds.", buckets=(1, 5)))
+
+    counter.inc(10, source="pixeldrain")
+    counter.inc(5, source="pixeldrain")
+    histogram.observe(0.5)
+    histogram.observe(3)
+
+    text = registry.render()
+    assert "# TYPE test_bytes_total counter" in text
+    assert 'test_bytes_total{source="pixeldrain"} 15.0' in text
+    assert 'test_seconds_bucket{le="1.0"} 1' in text
+    assert 'test_seconds_bucket{le="5.0"} 2' in text
+    assert 'test_seconds_bucket{le="+Inf"} 2' in text
+    assert "test_seconds_count 2" in text
+
+
+def test_metrics_server_serves_registry():
+    """
+    Tests that the metrics server exposes the global registry on /metrics.
+    """
+    server = start_metrics_server("127.0.0.1", 0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            body = response.read().decode("utf-8")
+        assert "drama_cycle_duration_seconds" in body
+        assert "drama_browser_restarts_total" in body
+    finally:
+        server.shutdown()
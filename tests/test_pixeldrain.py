@@ -0,0 +1,82 @@
+# pyright: reportPrivateUsage=false
+from typing import Any
+from unittest.mock import patch
+
+import requests
+
+from src.downloaders.pixeldrain import PixeldrainDownloader
+from src.downloaders.types import RemoteFile
+
+INFO = {
+    "name": "Show - S01E01.mkv",
+    "size": 1234,
+    "can_download": True,
+    "availability": "file_rate_limited_captcha_required",
+    "hash_sha256": "abc",
+}
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, body: dict[str, Any] | str):
+        self.status_code = status_code
+        self.body = body
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error")
+
+    def json(self) -> Any:
+        if isinstance(self.body, str):
+            raise ValueError("not JSON")
+        return self.body
+
+
+class FakeSession:
+    """Answers the file-info API by the id in the URL."""
+
+    answers: dict[str, FakeResponse] = {
+        "ok": FakeResponse(200, INFO),
+        "gone": FakeResponse(404, {"value": "not_found"}),
+        "broken": FakeResponse(500, {}),
+        "garbled": FakeResponse(200, "<html>"),
+    }
+
+    def __enter__(self) -> "FakeSession":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        pass
+
+    def get(self, url: str, timeout: float) -> FakeResponse:
+        return self.answers[url.split("/")[-2]]
+
+
+def test_fetch_info_reads_the_file_info():
+    """
+    Tests that the file info becomes a RemoteFile, a 404 an unavailable file, and
+    that errors and unreadable answers describe nothing.
+    """
+    downloader = PixeldrainDownloader()
+    session: Any = FakeSession()
+
+    assert downloader._fetch_info(session, "https://pixeldrain.com/u/ok") == RemoteFile(
+        "Show - S01E01.mkv", 1234, available=True, captcha=True, sha256="abc"
+    )
+    assert downloader._fetch_info(session, "https://pixeldrain.com/u/gone") == RemoteFile("", 0, available=False)
+    assert downloader._fetch_info(session, "https://pixeldrain.com/u/broken") is None
+    assert downloader._fetch_info(session, "https://pixeldrain.com/u/garbled") is None
+
+
+def test_preflight_leaves_out_undescribed_files():
+    """
+    Tests that the preflight maps every described URL to its file and leaves out
+    the URLs whose info could not be fetched.
+    """
+    downloader = PixeldrainDownloader()
+    urls = ["https://pixeldrain.com/u/ok", "https://pixeldrain.com/u/broken", "https://pixeldrain.com/u/gone"]
+
+    with patch.object(requests, "Session", FakeSession):
+        remote_files = downloader.preflight(urls)
+    assert set(remote_files) == {"https://pixeldrain.com/u/ok", "https://pixeldrain.com/u/gone"}
+    assert not remote_files["https://pixeldrain.com/u/gone"].available
+    assert downloader.preflight([]) == {}
@@ -0,0 +1,115 @@
+import io
+import os
+import sys
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import requests
+
+from pixeldrain_downloader import expand_inputs, main, parse_args, read_inputs
+from src.constants import PARTIAL_DIRECTORY, PIXELDRAIN_BATCH_JOBS
+from src.downloaders.pixeldrain import PixeldrainDownloader
+from src.downloaders.types import RemoteFile
+
+
+def test_parse_args_reads_inputs_and_flags():
+    """
+    Tests the defaults of the command line and that the flags and inputs are read.
+    """
+    with patch.object(sys, "argv", ["pixeldrain_downloader.py"]):
+        args = parse_args()
+    assert (args.inputs, args.output_dir, args.jobs, args.api_key) == ([], ".", PIXELDRAIN_BATCH_JOBS, None)
+
+    argv = [
+        "pixeldrain_downloader.py",
+        "-o",
+        "out",
+        "-j",
+        "2",
+        "--api-key",
+        "key",
+        "abc",
+        "https://pixeldrain.com/l/xyz",
+    ]
+    with patch.object(sys, "argv", argv):
+        args = parse_args()
+    assert (args.inputs, args.output_dir, args.jobs, args.api_key) == (
+        ["abc", "https://pixeldrain.com/l/xyz"],
+        "out",
+        2,
+        "key",
+    )
+
+
+def test_inputs_come_from_stdin_without_arguments():
+    """
+    Tests that without inputs in the arguments the links are read from stdin, several
+    per line, skipping comment lines.
+    """
+    with patch.object(sys, "argv", ["pixeldrain_downloader.py"]):
+        args = parse_args()
+    stdin = io.StringIO("abc def\n# a comment\n\n  https://pixeldrain.com/u/ghi\n")
+    with patch.object(sys, "stdin", stdin):
+        assert read_inputs(args) == ["abc", "def", "https://pixeldrain.com/u/ghi"]
+
+
+def test_expand_inputs_resolves_lists_and_ids():
+    """
+    Tests that list links become their files, bare ids become file links, duplicates
+    are dropped, and a list that could not be fetched is skipped.
+    """
+    downloader = PixeldrainDownloader()
+
+    def list_file_urls(list_url: str, session: Any = None) -> list[str]:
+        if list_url.endswith("broken"):
+            raise requests.exceptions.ConnectionError("no connection")
+        return ["https://pixeldrain.com/u/one", "https://pixeldrain.com/u/two"]
+
+    inputs = [
+        "https://pixeldrain.com/l/album/",
+        "two",
+        "https://pixeldrain.com/l/broken",
+        "https://pixeldrain.com/u/three",
+    ]
+    with patch.object(downloader, "list_file_urls", list_file_urls), patch("pixeldrain_downloader.log"):
+        urls = expand_inputs(downloader, inputs, requests.Session())
+    assert urls == ["https://pixeldrain.com/u/one", "https://pixeldrain.com/u/two", "https://pixeldrain.com/u/three"]
+
+
+def test_main_downloads_the_missing_files(tmp_path: Path):
+    """
+    Tests that the batch skips files already in the output folder, downloads the rest
+    and exits with 1 when a download failed, and with 2 without any input.
+    """
+    (tmp_path / "done.mkv").write_bytes(b"x" * 10)
+    remote_files = {
+        "https://pixeldrain.com/u/done": RemoteFile("done.mkv", 10),
+        "https://pixeldrain.com/u/new": RemoteFile("new.mkv", 20),
+        "https://pixeldrain.com/u/bad": RemoteFile("bad.mkv", 30),
+    }
+    downloaded: list[str] = []
+
+    async def download_file_async(self: PixeldrainDownloader, url: str, folder: str, **kwargs: Any) -> str | None:
+        downloaded.append(url)
+        return None if url.endswith("bad") else os.path.join(folder, "new.mkv")
+
+    argv = ["pixeldrain_downloader.py", "-o", str(tmp_path), "--api-key", "key", "done", "new", "bad"]
+    with (
+        patch.object(sys, "argv", argv),
+        patch("pixeldrain_downloader.load_config", return_value={}),
+        patch("pixeldrain_downloader.log"),
+        patch.object(PixeldrainDownloader, "preflight", return_value=remote_files),
+        patch.object(PixeldrainDownloader, "download_file_async", download_file_async),
+    ):
+        assert main() == 1
+    assert sorted(downloaded) == ["https://pixeldrain.com/u/bad", "https://pixeldrain.com/u/new"]
+    assert not os.path.exists(tmp_path / PARTIAL_DIRECTORY)
+
+    with (
+        patch.object(sys, "argv", ["pixeldrain_downloader.py"]),
+        patch.object(sys, "stdin", io.StringIO("")),
+        patch("pixeldrain_downloader.load_config", return_value={}),
+        patch("pixeldrain_downloader.log"),
+    ):
+        assert main() == 2
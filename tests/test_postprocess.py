@@ -0,0 +1,87 @@
+from pathlib import Path
+
+from src.postprocess import EpisodeFile, PostProcessError, PostProcessor, check_rename_template, rename, run_steps
+
+TEMPLATE = "{series}/{series} - S{season:02d}E{episode:02d}{ext}"
+
+
+def _episode(tmp_path: Path, name: str, episode: int = 2) -> EpisodeFile:
+    folder = tmp_path / "Show"
+    folder.mkdir(exist_ok=True)
+    (folder / name).write_bytes(b"video")
+    return EpisodeFile(str(folder / name), "Show", 1, episode, str(tmp_path))
+
+
+def test_rename_moves_to_template_and_refuses_collisions(tmp_path: Path):
+    """Tests that rename moves a file to its template path and never overwrites another file."""
+    file = _episode(tmp_path, "download.mp4")
+    target = rename(file, {"template": TEMPLATE})
+    assert target == str(tmp_path / "Show" / "Show - S01E02.mp4")
+    assert Path(target).read_bytes() == b"video"
+    assert not Path(file.path).exists()
+
+    other = _episode(tmp_path, "again.mp4")
+    try:
+        rename(other, {"template": TEMPLATE})
+    except PostProcessError:
+        pass
+    else:
+        raise AssertionError("rename overwrote an existing episode")
+    assert Path(other.path).exists()
+
+
+def test_failed_step_stops_the_steps(tmp_path: Path):
+    """Tests that an unknown step fails the run before the steps after it."""
+    file = _episode(tmp_path, "download.mp4")
+    try:
+        run_steps(file, [{"name": "no_such_module:step"}, {"name": "rename"}])
+    except PostProcessError:
+        pass
+    else:
+        raise AssertionError("an unknown step was accepted")
+    assert Path(file.path).exists()
+
+
+def test_processor_runs_steps_in_workers(tmp_path: Path):
+    """Tests that submitted episodes are processed by the worker processes."""
+    processor = PostProcessor()
+    processor.configure({"enable": True, "workers": 1, "steps": [{"name": "rename", "template": TEMPLATE}]})
+    try:
+        processor.submit(_episode(tmp_path, "a.mp4"))
+        processor.submit(_episode(tmp_path, "b.mp4", episode=3))
+        assert processor.drain(timeout=60)
+    finally:
+        processor.shutdown()
+    assert sorted(p.name for p in (tmp_path / "Show").iterdir()) == ["Show - S01E02.mp4", "Show - S01E03.mp4"]
+
+
+def test_disabled_processor_ignores_episodes(tmp_path: Path):
+    """Tests that episodes are left as they are while post-processing is disabled."""
+    processor = PostProcessor()
+    processor.configure({"enable": False, "steps": ["rename"]})
+    file = _episode(tmp_path, "download.mp4")
+    processor.submit(file)
+    assert processor.drain(timeout=1)
+    assert Path(file.path).exists()
+
+
+def test_rename_templates_must_keep_the_index_layout():
+    """
+    Tests that only rename templates that keep episodes visible to the download index
+    are accepted, and that a processor leaves out a rename step with any other.
+    """
+    check_rename_template(TEMPLATE)
+    check_rename_template("{series}/{series} - S{season}E{episode:03d}{ext}")
+    for template in ("{name}.done{ext}", "{series} - S{season:02d}E{episode:02d}{ext}", "{series}/{title}{ext}"):
+        try:
+            check_rename_template(template)
+        except PostProcessError:
+            pass
+        else:
+            raise AssertionError(f"{template} was accepted")
+
+    processor = PostProcessor()
+    processor.configure({"enable": True, "steps": ["validate", {"name": "rename", "template": "{name}{ext}"}]})
+    assert processor.enabled
+    processor.configure({"enable": True, "steps": [{"name": "rename", "template": "{name}{ext}"}]})
+    assert not processor.enabled
@@ -0,0 +1,63 @@
+import time
+from typing import Any
+
+from src.prefetch import Prefetcher
+from src.providers.base import BaseProvider
+from src.providers.types import EpisodeIndex
+
+
+class RedirectingProvider(BaseProvider):
+    name = "stub"
+
+    def get_series_episodes(self, url: str) -> EpisodeIndex:
+        return EpisodeIndex()
+
+    @classmethod
+    def parse_episodes(cls, html_content: str, page_url: str | None = None) -> EpisodeIndex:
+        return EpisodeIndex()
+
+    def get_download_url(self, episode_link: str) -> str:
+        if "broken" in episode_link:
+            raise ValueError("no redirect")
+        return episode_link.replace("/go/", "/file/")
+
+
+def test_prefetcher_resolves_while_work_runs():
+    """
+    Tests that queued links are resolved while the work runs, failures are skipped,
+    and prefetched URLs are handed out once and only until they expire.
+    """
+    remembered: dict[str, str] = {}
+    page: Any = None
+    prefetcher = Prefetcher(RedirectingProvider(page), "https://stub.test/series", 60, remembered.__setitem__)
+    prefetcher.queue(["https://stub.test/go/1", "https://stub.test/go/broken", "https://stub.test/go/2"])
+
+    assert prefetcher.run_while(lambda: time.sleep(0.2) or "done") == "done"
+    assert remembered == {
+        "https://stub.test/go/1": "https://stub.test/file/1",
+        "https://stub.test/go/2": "https://stub.test/file/2",
+    }
+    assert prefetcher.take("https://stub.test/go/1") == "https://stub.test/file/1"
+    assert prefetcher.take("https://stub.test/go/1") is None
+    assert prefetcher.take("https://stub.test/go/broken") is None
+
+    prefetcher.ttl_seconds = -1
+    assert prefetcher.take("https://stub.test/go/2") is None
+
+
+def test_prefetcher_reraises_work_errors():
+    """
+    Tests that an exception of the work is raised in the calling thread.
+    """
+    page: Any = None
+    prefetcher = Prefetcher(RedirectingProvider(page), "https://stub.test/series", 60)
+
+    def fail() -> bool:
+        raise OSError("disk full")
+
+    try:
+        prefetcher.run_while(fail)
+    except OSError as e:
+        assert str(e) == "disk full"
+    else:
+        raise AssertionError("the error of the work was swallowed")
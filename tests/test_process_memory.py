@@ -0,0 +1,46 @@
+import os
+import signal
+import subprocess
+import sys
+
+from src.process_memory import BROWSER_PROCESS_FLAG, browser_rss_bytes, child_pids
+
+MIB = 1024 * 1024
+
+
+def _holding(mib: int) -> str:
+    """Code of a process that holds `mib` MiB resident, says so and sleeps."""
+    return f"import time; data = b'x' * ({mib} * {MIB}); print('ready', flush=True); time.sleep(30)"
+
+
+def test_browser_rss_counts_only_the_browser_tree():
+    """
+    Tests that the processes below a browser process are counted with it, and that
+    other child processes of the monitor (workers, tools) are not.
+    """
+    if not os.path.isdir("/proc"):
+        assert browser_rss_bytes() is None
+        return
+    assert browser_rss_bytes() == 0
+
+    # A "browser" whose "renderer" holds 64 MiB, next to a worker holding 256 MiB
+    browser_code = (
+        f"import subprocess, sys, time; subprocess.Popen([sys.executable, '-c', {_holding(64)!r}]); time.sleep(30)"
+    )
+    browser = subprocess.Popen(
+        [sys.executable, "-c", browser_code, BROWSER_PROCESS_FLAG.decode()], stdout=subprocess.PIPE
+    )
+    worker = subprocess.Popen([sys.executable, "-c", _holding(256)], stdout=subprocess.PIPE)
+    try:
+        assert browser.stdout is not None and worker.stdout is not None
+        assert browser.stdout.readline() == b"ready\n" and worker.stdout.readline() == b"ready\n"
+        assert {browser.pid, worker.pid} <= set(child_pids(os.getpid()))
+
+        rss = browser_rss_bytes()
+        assert rss is not None and 64 * MIB <= rss < 256 * MIB
+    finally:
+        for process in (browser, worker):
+            for child in child_pids(process.pid):
+                os.kill(child, signal.SIGKILL)
+            process.kill()
+            process.communicate()
@@ -0,0 +1,96 @@
+from typing import Any, cast
+
+import requests
+from playwright.sync_api import Error as PlaywrightError
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from src.providers import PROVIDER_REGISTRY, find_provider_class
+from src.providers.base import ChallengeError, is_host_fault
+from src.providers.filecrypt import FileCryptProvider
+from src.providers.viewcrate import ViewCrateProvider
+
+
+def test_find_provider_class_matches_hosts():
+    """
+    Tests that series URLs are matched by their host, including mirrors and subdomains,
+    and that a provider's name elsewhere in a URL does not select it.
+    """
+    assert find_provider_class("https://filecrypt.cc/Container/ABC.html") is FileCryptProvider
+    assert find_provider_class("https://www.filecrypt.co/Container/ABC.html") is FileCryptProvider
+    assert find_provider_class("https://viewcrate.cc/v/abc") is ViewCrateProvider
+    assert find_provider_class("https://example.com/?u=filecrypt.cc") is None
+    assert find_provider_class("not a url") is None
+
+
+def test_provider_capabilities_and_names():
+    """
+    Tests that capabilities are readable from the classes and providers are found by name.
+    """
+    assert FileCryptProvider.capabilities.http_resolve
+    assert not ViewCrateProvider.capabilities.http_resolve
+    assert PROVIDER_REGISTRY.by_name("viewcrate") is ViewCrateProvider
+    assert PROVIDER_REGISTRY.by_name("missing") is None
+    assert len(PROVIDER_REGISTRY) == 2
+
+
+class FakePage:
+    """A page that records the URLs it was sent to."""
+
+    def __init__(self) -> None:
+        self.url = "about:blank"
+        self.visited: list[str] = []
+
+    def goto(self, url: str) -> None:
+        self.url = url
+        self.visited.append(url)
+
+    def content(self) -> str:
+        return "<html></html>"
+
+
+def test_series_page_is_reloaded_once_it_moved_on():
+    """
+    Tests that a provider that resolves on the series page loads it again only when
+    the shared page shows another series or has navigated away.
+    """
+    page = FakePage()
+    provider = FileCryptProvider(cast(Any, page))
+    first = "https://filecrypt.cc/Container/A.html"
+    second = "https://filecrypt.cc/Container/B.html"
+
+    provider.fetch_series_episodes(first)
+    provider.show_series_page(first)
+    assert page.visited == [first]
+
+    provider.fetch_series_episodes(second)
+    provider.show_series_page(first)
+    assert page.visited == [first, second, first]
+
+    page.url = "https://filecrypt.cc/Link/X.html"
+    provider.show_series_page(first)
+    assert page.visited == [first, second, first, first]
+
+
+def _http_error(status_code: int) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(response=response)
+
+
+def test_is_host_fault_separates_host_and_link_errors():
+    """
+    Tests that challenges, connection errors, navigation failures and 5xx/429 answers
+    count against the host, and errors about a single link do not.
+    """
+    assert is_host_fault(ChallengeError("challenge"))
+    assert is_host_fault(requests.exceptions.ConnectionError())
+    assert is_host_fault(requests.exceptions.ReadTimeout())
+    assert is_host_fault(_http_error(503))
+    assert is_host_fault(_http_error(429))
+    assert is_host_fault(PlaywrightTimeoutError("Page.goto: Timeout 30000ms exceeded."))
+    assert is_host_fault(PlaywrightError("Locator.click: net::ERR_CONNECTION_RESET"))
+
+    assert not is_host_fault(_http_error(404))
+    assert not is_host_fault(requests.exceptions.InvalidURL())
+    assert not is_host_fault(PlaywrightTimeoutError("Locator.click: Timeout 30000ms exceeded."))
+    assert not is_host_fault(ValueError("Кнопка загрузки не найдена"))
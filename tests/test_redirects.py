@@ -0,0 +1,15 @@
+from src.providers.redirects import find_html_redirect
+
+
+def test_find_html_redirect():
+    """
+    Tests that script and meta-refresh redirects of interstitial pages are recognised.
+    """
+    assert find_html_redirect('<script>window.location.href = "https://pixeldrain.com/u/abc";</script>') == (
+        "https://pixeldrain.com/u/abc"
+    )
+    assert find_html_redirect("<script>top.location='https://gofile.io/d/xyz'</script>") == "https://gofile.io/d/xyz"
+    assert find_html_redirect('<meta http-equiv="refresh" content="0; url=https://pixeldrain.com/u/abc">') == (
+        "https://pixeldrain.com/u/abc"
+    )
+    assert find_html_redirect("<html><body>Please solve the captcha</body></html>") is None
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+from pathlib import Path
+
+
+def test_import_main_is_slim():
+    """
+    Tests that importing the CLI entry point does not load the browser, parsing or HTTP backends.
+    """
+    heavy = ("playwright", "playwright_stealth", "browser_cookie3", "bs4", "requests", "yaml")
+    loaded = subprocess.run(
+        [sys.executable, "-c", f"import sys, main; print(' '.join(m for m in {heavy!r} if m in sys.modules))"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    assert loaded == []
+
+
+def test_run_check_without_cluster_skips_lease_backends(tmp_path: Path):
+    """
+    Tests that a cycle with clustering off loads neither the lease database nor the
+    socket module used to name the node.
+    """
+    (tmp_path / "config.yaml").write_text(
+        "settings:\n"
+        "  journal:\n"
+        "    enable: false\n"
+        "  link_cache:\n"
+        "    enable: false\n"
+        "series:\n"
+        "  - name: Show\n"
+        "    url: https://filecrypt.cc/Container/ABC.html\n",
+        encoding="utf-8",
+    )
+    # The cycle is stopped where it would launch the browser, past the lease setup
+    script = (
+        f"import sys; sys.path.insert(0, {str(Path(__file__).resolve().parent.parent)!r})\n"
+        "from src import app\n"
+        "app.BrowserSession = None\n"
+        "try:\n"
+        "    app.run_check()\n"
+        "except TypeError:\n"
+        "    pass\n"
+        "print(' '.join(m for m in ('socket', 'sqlite3') if m in sys.modules))\n"
+    )
+    loaded = subprocess.run(
+        [sys.executable, "-c", script], cwd=tmp_path, capture_output=True, text=True, check=True
+    ).stdout.split()
+    assert loaded == []
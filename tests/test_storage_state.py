@@ -0,0 +1,52 @@
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+from src.storage_state import StorageStateStore
+
+
+def _cookie(name: str, domain: str, expires: float = -1) -> dict[str, Any]:
+    return {"name": name, "value": "1", "domain": domain, "path": "/", "expires": expires}
+
+
+def test_storage_state_keeps_only_the_host(tmp_path: Path):
+    """
+    Tests that a saved state survives a restart and keeps only the cookies and origins
+    of its host.
+    """
+    store = StorageStateStore(str(tmp_path), max_age_seconds=3600)
+    assert store.load("filecrypt.cc") is None
+    store.save(
+        "filecrypt.cc",
+        {
+            "cookies": [
+                _cookie("cf_clearance", ".filecrypt.cc", time.time() + 3600),
+                _cookie("PHPSESSID", "www.filecrypt.cc"),
+                _cookie("tracking", ".pixeldrain.com"),
+            ],
+            "origins": [
+                {"origin": "https://filecrypt.cc", "localStorage": [{"name": "consent", "value": "1"}]},
+                {"origin": "https://pixeldrain.com", "localStorage": []},
+            ],
+        },
+    )
+
+    state = StorageStateStore(str(tmp_path), max_age_seconds=3600).load("filecrypt.cc")
+    assert state is not None
+    assert [cookie["name"] for cookie in state["cookies"]] == ["cf_clearance", "PHPSESSID"]
+    assert [origin["origin"] for origin in state["origins"]] == ["https://filecrypt.cc"]
+
+
+def test_storage_state_expiry(tmp_path: Path):
+    """
+    Tests that a state is dropped once a persistent cookie expired or it is too old.
+    """
+    store = StorageStateStore(str(tmp_path), max_age_seconds=3600)
+    store.save("viewcrate.cc", {"cookies": [_cookie("cf_clearance", ".viewcrate.cc", time.time() - 1)]})
+    assert store.load("viewcrate.cc") is None
+    assert not os.path.exists(store.path("viewcrate.cc"))
+
+    store.save("viewcrate.cc", {"cookies": [_cookie("session", "viewcrate.cc")]})
+    assert store.load("viewcrate.cc") is not None
+    assert StorageStateStore(str(tmp_path), max_age_seconds=-1).load("viewcrate.cc") is None
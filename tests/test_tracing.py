@@ -0,0 +1,71 @@
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+from main import parse_args
+from src.tracing import Tracer
+
+
+def test_nested_spans_are_written_as_chrome_trace(tmp_path: Path):
+    """
+    Tests that nested spans become complete events inside each other's time range,
+    with their attributes and the thread name, in a Chrome trace file.
+    """
+    tracer = Tracer()
+    tracer.configure(True, directory=str(tmp_path))
+    tracer.start_cycle()
+    with tracer.span("cycle"), tracer.span("series", series="Show"), tracer.span("sleep", category="sleep"):
+        pass
+
+    trace_path = tracer.finish_cycle()
+    assert trace_path is not None
+    with open(trace_path, encoding="utf-8") as f:
+        trace: dict[str, Any] = json.load(f)
+    assert trace["displayTimeUnit"] == "ms"
+    events = {event["name"]: event for event in trace["traceEvents"] if event["ph"] == "X"}
+    assert [event["name"] for event in trace["traceEvents"] if event["ph"] == "M"] == ["thread_name"]
+    assert events["series"]["args"] == {"series": "Show"}
+    assert events["sleep"]["cat"] == "sleep"
+    for outer, inner in (("cycle", "series"), ("series", "sleep")):
+        assert events[outer]["ts"] <= events[inner]["ts"]
+        assert events[inner]["ts"] + events[inner]["dur"] <= events[outer]["ts"] + events[outer]["dur"]
+
+
+def test_profile_files_of_a_cycle(tmp_path: Path):
+    """
+    Tests that --profile-parse turns on tracing, and that a cycle writes a trace and
+    a parse profile of the same stamp into the profile directory.
+    """
+    profile_dir = str(tmp_path / "profiles")
+    with patch.object(sys, "argv", ["main.py", "--profile-parse", "--profile-dir", profile_dir]):
+        args = parse_args()
+    assert (args.profile, args.profile_parse, args.profile_dir) == (False, True, profile_dir)
+
+    tracer = Tracer()
+    tracer.configure(args.profile or args.profile_parse, args.profile_parse, args.profile_dir)
+    tracer.start_cycle()
+    with tracer.span("provider.parse", profile=True):
+        sorted(range(1000), reverse=True)
+    trace_path = tracer.finish_cycle()
+
+    assert trace_path is not None
+    stamp = os.path.basename(trace_path).removesuffix(".trace.json")
+    assert stamp.startswith("cycle-")
+    assert sorted(os.listdir(profile_dir)) == [f"{stamp}.parse.prof", f"{stamp}.trace.json"]
+
+
+def test_disabled_tracer_records_nothing(tmp_path: Path):
+    """
+    Tests that spans of a disabled tracer are not recorded and no files are written.
+    """
+    tracer = Tracer()
+    tracer.configure(False, directory=str(tmp_path / "profiles"))
+    tracer.start_cycle()
+    with tracer.span("cycle"):
+        pass
+    assert tracer.events() == []
+    assert tracer.finish_cycle() is None
+    assert not os.path.exists(tmp_path / "profiles")
@@ -0,0 +1,75 @@
+# pyright: reportPrivateUsage=false
+import errno
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+from src.circuit import BreakerBoard
+from src.downloaders.aio_http import HttpError
+from src.downloaders.pixeldrain import PixeldrainDownloader
+from src.downloaders.transfer import Transfer
+from src.downloaders.transfer_loop import TRANSFER_LOOP
+
+
+def test_only_host_faults_count_against_the_breaker():
+    """
+    Tests that answers about single files (404, 410) leave the breaker of the host
+    closed, while 5xx answers and lost connections open it.
+    """
+    downloader = PixeldrainDownloader()
+    board = BreakerBoard()
+    board.configure(failure_threshold=2)
+    url = "https://pixeldrain.com/api/file/abc"
+    transfer = Transfer(url, "abc", "", "", None, "файла abc")
+
+    with patch("src.downloaders.transfer.BREAKERS", board), patch("src.downloaders.transfer.log"):
+        for status in (404, 410, 404):
+            downloader._record_attempt(url, downloader._error_status(transfer, HttpError("gone", status)))
+        assert board.allow(url)
+
+        for error in (HttpError("server error", 503), HttpError("timed out")):
+            downloader._record_attempt(url, downloader._error_status(transfer, error))
+        assert not board.allow(url)
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", "1024")
+        self.end_headers()
+        self.wfile.write(b"x" * 1024)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def test_disk_errors_fail_the_attempt_not_the_host(tmp_path: Path):
+    """
+    Tests that an error writing the partial file ends the attempt as 'write_failed'
+    instead of escaping, and leaves the breaker of the host closed.
+    """
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FileHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/file"
+    transfer = Transfer(url, "file", str(tmp_path), str(tmp_path / "partial"), "Show - S01E01", "серии 1")
+    downloader = PixeldrainDownloader()
+    board = BreakerBoard()
+    board.configure(failure_threshold=1)
+
+    async def full_disk(self: object, data: bytes) -> None:
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    try:
+        with (
+            patch("src.downloaders.transfer.BREAKERS", board),
+            patch("src.downloaders.transfer.FileWriter.write", full_disk),
+            patch("src.downloaders.transfer.log"),
+        ):
+            assert TRANSFER_LOOP.run(downloader._attempts(transfer, {}, 2, 0)) == "write_failed"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    assert board.allow(url)